@@ -1,18 +1,86 @@
-from flask import Flask, render_template, redirect, url_for, request, flash
+"""
+Address Book Flask Application
+
+create_app() builds the app; views, forms and models live at module
+level and are registered on each app it creates. Run the development
+server with `python app.py`, or several worker processes with serve.py.
+"""
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, abort, current_app
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField
+from flask_wtf.file import FileField, FileRequired
+from wtforms import StringField, SelectField, SubmitField
 from wtforms.validators import DataRequired, Email
+from sqlalchemy import and_, or_, event, select
+import base64
+import click
+import json
 import os
+import sys
+
+# The modules the three apps share live in ../common (see common/__init__.py).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import assets, dbconfig, export, metrics
+import importer
+import search
+
+db = SQLAlchemy(session_options=dbconfig.session_options())
+
+# (rule, view, options) for every view; create_app() registers them.
+ROUTES = []
+
+
+def route(rule, **options):
+    """Like app.route(), for the apps create_app() builds."""
+    def decorator(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return decorator
+
+
+def create_app(config=None):
+    """
+    Build and configure the Address Book app.
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///addresses.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    Args:
+        config: Mapping of settings that override the defaults below
 
-# Set static folder for custom styling
-app.static_folder = 'static'
-db = SQLAlchemy(app)
+    Returns:
+        Flask application
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your-secret-key'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['PEOPLE_PER_PAGE'] = int(os.environ.get('PEOPLE_PER_PAGE', 50))
+    app.config['PEOPLE_MAX_PER_PAGE'] = 500
+    app.config['SEARCH_MAX_RESULTS'] = 25
+    # Request metrics at /metrics (see common/metrics.py); slow requests are in seconds.
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+    app.config['METRICS_SLOW_REQUEST'] = float(os.environ.get('METRICS_SLOW_REQUEST', 0.5))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['IMPORT_BATCH_SIZE'] = int(os.environ.get('IMPORT_BATCH_SIZE', importer.DEFAULT_BATCH_SIZE))
+    app.config.update(config or {})
+
+    # Set static folder for custom styling
+    app.static_folder = 'static'
+    # DATABASE_URL overrides the SQLite file; see common/dbconfig.py for the tuning.
+    dbconfig.configure(app, 'sqlite:///addresses.db')
+    db.init_app(app)
+    dbconfig.init_app(app, db)
+    metrics.init_app(app, db)
+    assets.init_app(app)
+    for rule, view, options in ROUTES:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.cli.add_command(rebuild_search_index)
+    return app
+
+
+def warmup(app):
+    """Open a database connection and render the first page once (see serve.py)."""
+    with app.test_client() as client:
+        client.get('/')
 
 class Person(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -21,6 +89,97 @@ class Person(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     phone = db.Column(db.String(15), nullable=False)
 
+    # (name, id) backs the keyset ordering of the list page; email is already
+    # indexed through its unique constraint.
+    __table_args__ = (
+        db.Index('ix_person_name_id', 'name', 'id'),
+        db.Index('ix_person_phone', 'phone'),
+    )
+
+# Keep the FTS index alongside the person table whenever create_all()/drop_all() run.
+@event.listens_for(Person.__table__, 'after_create')
+def create_search_index(target, connection, **kw):
+    search.install(connection)
+
+@event.listens_for(Person.__table__, 'before_drop')
+def drop_search_index(target, connection, **kw):
+    search.uninstall(connection)
+
+SEARCH_FIELDS = {
+    'name': Person.name,
+    'email': Person.email,
+    'phone': Person.phone,
+}
+
+def encode_cursor(person):
+    raw = json.dumps([person.name, person.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    try:
+        name, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(name), int(id)
+    except (ValueError, TypeError):
+        return None
+
+def prefix_upper_bound(prefix):
+    """Return the first string after every string starting with prefix, or None."""
+    # Appending '\uffff' is not enough: characters outside the BMP (emoji)
+    # sort after it, so bump the last character instead.
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    following = ord(stripped[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        # Surrogates cannot be stored; the next real character is U+E000.
+        following = 0xE000
+    return stripped[:-1] + chr(following)
+
+def prefix_filter(column, prefix):
+    # A half-open range instead of LIKE so SQLite can seek the index.
+    upper = prefix_upper_bound(prefix)
+    if upper is None:
+        return column >= prefix
+    return and_(column >= prefix, column < upper)
+
+def people_page(q='', field='name', after=None, before=None, per_page=50):
+    """Return one page of people ordered by (name, id) plus neighbour cursors."""
+    query = Person.query
+    if q:
+        query = query.filter(prefix_filter(SEARCH_FIELDS[field], q))
+
+    backwards = False
+    cursor = decode_cursor(after) if after else None
+    if cursor is None and before:
+        cursor = decode_cursor(before)
+        backwards = cursor is not None
+    if cursor:
+        name, id = cursor
+        if backwards:
+            query = query.filter(or_(Person.name < name, and_(Person.name == name, Person.id < id)))
+        else:
+            query = query.filter(or_(Person.name > name, and_(Person.name == name, Person.id > id)))
+
+    if backwards:
+        query = query.order_by(Person.name.desc(), Person.id.desc())
+    else:
+        query = query.order_by(Person.name, Person.id)
+
+    # Fetch one extra row to learn whether another page exists.
+    people = query.limit(per_page + 1).all()
+    has_more = len(people) > per_page
+    people = people[:per_page]
+    if backwards:
+        people.reverse()
+
+    next_cursor = prev_cursor = None
+    if people:
+        if has_more or backwards:
+            next_cursor = encode_cursor(people[-1])
+        if (cursor and not backwards) or (backwards and has_more):
+            prev_cursor = encode_cursor(people[0])
+    return people, prev_cursor, next_cursor
+
 class PersonForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     address = StringField('Address', validators=[DataRequired()])
@@ -28,12 +187,107 @@ class PersonForm(FlaskForm):
     phone = StringField('Phone', validators=[DataRequired()])
     submit = SubmitField('Submit')
 
-@app.route('/')
+class ImportForm(FlaskForm):
+    file = FileField('CSV or vCard file', validators=[FileRequired()])
+    conflict = SelectField(
+        'When the email already exists',
+        choices=[('skip', 'Skip the row'), ('upsert', 'Update the existing contact')],
+        default='skip'
+    )
+    submit = SubmitField('Import')
+
+@route('/')
 def index():
-    people = Person.query.all()
-    return render_template('list.html', people=people)
+    q = request.args.get('q', '').strip()
+    field = request.args.get('field', 'name')
+    if field not in SEARCH_FIELDS:
+        field = 'name'
+    per_page = request.args.get('per_page', current_app.config['PEOPLE_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['PEOPLE_MAX_PER_PAGE']))
+
+    people, prev_cursor, next_cursor = people_page(
+        q=q,
+        field=field,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=per_page
+    )
+    return render_template(
+        'list.html',
+        people=people,
+        q=q,
+        field=field,
+        fields=SEARCH_FIELDS.keys(),
+        per_page=per_page,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor
+    )
+
+@route('/search')
+def search_people():
+    q = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 10, type=int)
+    limit = max(1, min(limit, current_app.config['SEARCH_MAX_RESULTS']))
+    connection = db.session.connection()
+    if search.is_supported(connection) and search.index_exists(connection):
+        results = search.search(connection, q, limit=limit)
+    else:
+        # Without FTS5, or on a database created before the index existed
+        # (until rebuild-search-index runs), use the indexed name-prefix lookup.
+        people = people_page(q=q, per_page=limit)[0] if q else []
+        results = [
+            {'id': p.id, 'name': p.name, 'address': p.address, 'email': p.email, 'phone': p.phone}
+            for p in people
+        ]
+    return jsonify(query=q, results=results)
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index():
+    """Create the contact full-text index if needed and refill it from the person table."""
+    with db.engine.begin() as connection:
+        if not search.is_supported(connection):
+            click.echo("Full-text search needs SQLite; nothing to rebuild.")
+            return
+        search.install(connection)
+        search.rebuild(connection)
+    click.echo("✅ Contact search index rebuilt.")
+
+@route('/import', methods=['GET', 'POST'])
+def import_people():
+    form = ImportForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            reader = importer.reader_for(upload.filename or '')
+            report = importer.import_people(
+                db.session,
+                Person.__table__,
+                reader(importer.text_stream(upload.stream)),
+                policy=form.conflict.data,
+                batch_size=current_app.config['IMPORT_BATCH_SIZE']
+            )
+        except importer.ImportFormatError as e:
+            db.session.rollback()
+            flash(str(e))
+            return render_template('import.html', form=form, report=None)
+
+        if request.args.get('format') == 'json':
+            return jsonify(report.to_dict())
+        flash(f'Imported {report.inserted} new and {report.updated} updated contacts.')
+    return render_template('import.html', form=form, report=report)
+
+@route('/export.<fmt>')
+def export_people(fmt):
+    if fmt not in export.FORMATS:
+        abort(404)
+    statement = select(
+        Person.id, Person.name, Person.address, Person.email, Person.phone
+    ).order_by(Person.id)
+    return export.stream_rows(db.session, statement, fmt, 'contacts')
 
-@app.route('/add', methods=['GET', 'POST'])
+@route('/add', methods=['GET', 'POST'])
 def add():
     form = PersonForm()
     if form.validate_on_submit():
@@ -49,7 +303,7 @@ def add():
         return redirect(url_for('index'))
     return render_template('add.html', form=form)
 
-@app.route('/edit/<int:id>', methods=['GET', 'POST'])
+@route('/edit/<int:id>', methods=['GET', 'POST'])
 def edit(id):
     person = Person.query.get_or_404(id)
     form = PersonForm(obj=person)
@@ -64,7 +318,14 @@ def edit(id):
     return render_template('edit.html', form=form)
 
 if __name__ == '__main__':
+    app = create_app()
     os.makedirs(app.static_folder, exist_ok=True)
     with app.app_context():
         db.create_all()
+        # create_all() skips indexes on tables that already exist.
+        for index in Person.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        with db.engine.begin() as connection:
+            if search.install(connection):
+                search.rebuild(connection)
     app.run(debug=True)
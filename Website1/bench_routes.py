@@ -0,0 +1,79 @@
+"""
+Address Book Route Benchmark
+
+Drives the contact list and the add and edit forms through the Flask
+test client against a throwaway SQLite database grown with generate.py
+to each --sizes row count, and writes throughput, latency, SQL and
+memory figures as JSON (see common/benchmark.py).
+
+Usage:
+    python bench_routes.py --sizes 1000,100000,1000000 --output bench.json
+    python bench_routes.py --sizes 1000,100000 --baseline bench.json
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix='bench_routes_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+os.environ.setdefault('METRICS_SLOW_REQUEST', '60')
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import create_app, db, Person  # noqa: E402  (must follow DATABASE_URL)
+from common.benchmark import Route  # noqa: E402
+from common import benchmark  # noqa: E402
+import generate  # noqa: E402
+
+app = create_app({'WTF_CSRF_ENABLED': False})
+_serial = itertools.count()
+
+
+def populate(size):
+    """Append generated contacts until the database holds `size`."""
+    with app.app_context():
+        db.create_all()
+        current = db.session.scalar(select(func.count(Person.id)))
+        db.session.remove()
+        if size > current:
+            generate.generate_people(size - current, seed=42)
+
+
+def routes():
+    """Build the routes to drive at the current database size."""
+    client = app.test_client()
+    with app.app_context():
+        ids = db.session.scalars(select(Person.id).order_by(Person.id).limit(1000)).all()
+        db.session.remove()
+
+    def person(i, email):
+        return {
+            'name': f'Bench Person {i}',
+            'address': f'{i} Bench Street',
+            'email': email,
+            'phone': f'555{i % 10000000:07d}',
+        }
+
+    def add(i):
+        # Emails are unique, so every add across all sizes gets a new one.
+        serial = next(_serial)
+        return client.post('/add', data=person(i, f'bench-add-{serial}@example.com'))
+
+    def edit(i):
+        person_id = ids[i % len(ids)]
+        return client.post(f'/edit/{person_id}', data=person(i, f'bench-edit-{person_id}@example.com'))
+
+    return [
+        Route('index', lambda i: client.get('/'), 200),
+        Route('index_search', lambda i: client.get('/?q=Jo&field=name'), 200),
+        Route('add', add, 302),
+        Route('edit', edit, 302),
+    ]
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        engines = list(db.engines.values())
+    sys.exit(benchmark.main('Address Book', engines, populate, routes))
@@ -0,0 +1,112 @@
+# generate.py
+"""
+Synthetic contact generator for load testing.
+
+Appends N deterministic Person rows (the same --seed, --start and
+--batch-size always give the same rows) using executemany Core inserts,
+one transaction per batch, and reports the insert rate. Unlike seed.py it
+never drops existing data.
+
+    python generate.py --rows 1000000 --seed 42
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import func, select
+
+from app import create_app, db, Person
+import search
+
+FIRST_NAMES = [
+    "Olivia", "Liam", "Ava", "Noah", "Isla", "Jack", "Mia", "William", "Charlotte",
+    "Oliver", "Amelia", "Leo", "Grace", "Henry", "Chloe", "Thomas", "Zoe", "Lucas",
+    "Ruby", "James", "Matilda", "Ethan", "Sophie", "Harrison", "Ella", "Lachlan",
+]
+LAST_NAMES = [
+    "Smith", "Jones", "Williams", "Brown", "Wilson", "Taylor", "Johnson", "White",
+    "Martin", "Anderson", "Thompson", "Nguyen", "Thomas", "Walker", "Harris", "Lee",
+    "Ryan", "Robinson", "Kelly", "King", "Davis", "Wright", "Evans", "Roberts",
+]
+STREETS = [
+    "Collins Street", "George Street", "St Georges Terrace", "King William Street",
+    "Ann Street", "Bourke Street", "Pitt Street", "Queen Street", "Murray Street",
+    "Elizabeth Street", "Flinders Lane", "Hay Street", "Rundle Mall", "Adelaide Street",
+]
+CITIES = [
+    ("Melbourne", "VIC", 3000), ("Sydney", "NSW", 2000), ("Perth", "WA", 6000),
+    ("Adelaide", "SA", 5000), ("Brisbane", "QLD", 4000), ("Hobart", "TAS", 7000),
+    ("Canberra", "ACT", 2600), ("Darwin", "NT", 800),
+]
+DOMAINS = ["example.com", "example.org", "example.net", "mail.example.com"]
+
+
+def person_row(rng, index):
+    """Build one contact; `index` keeps the email unique across runs."""
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    city, state, postcode = rng.choice(CITIES)
+    return {
+        'name': f"{first} {last}",
+        'address': f"{rng.randint(1, 400)} {rng.choice(STREETS)}, {city} {state} {postcode:04d}",
+        'email': f"{first}.{last}.{index}@{rng.choice(DOMAINS)}".lower(),
+        'phone': f"04{rng.randint(0, 99):02d} {rng.randint(0, 999):03d} {rng.randint(0, 999):03d}",
+    }
+
+
+def generate_people(rows, seed=0, batch_size=10000, start=None):
+    """
+    Append `rows` generated contacts in batches of `batch_size`.
+
+    Each batch draws from its own Random seeded with (seed, first index),
+    so reruns with the same arguments reproduce the same data.
+    """
+    table = Person.__table__
+    db.create_all()
+    with db.engine.begin() as connection:
+        if start is None:
+            start = (connection.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+        # Per-row FTS triggers dominate a bulk load; drop them and rebuild once.
+        had_index = search.is_supported(connection) and search.index_exists(connection)
+        if had_index:
+            search.uninstall(connection)
+
+    started = time.perf_counter()
+    written = 0
+    with db.engine.connect() as connection:
+        while written < rows:
+            count = min(batch_size, rows - written)
+            first = start + written
+            rng = random.Random(f"{seed}:{first}")
+            batch = [person_row(rng, first + i) for i in range(count)]
+            with connection.begin():
+                connection.execute(table.insert(), batch)
+            written += count
+            elapsed = time.perf_counter() - started
+            print(f"  {written:>12,} / {rows:,} people  ({written / elapsed:,.0f} rows/s)")
+
+    if had_index:
+        with db.engine.begin() as connection:
+            search.install(connection)
+            search.rebuild(connection)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Generated {written:,} people in {elapsed:.1f}s ({written / elapsed:,.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append synthetic contacts for load testing.")
+    parser.add_argument('--rows', type=int, default=10000, help='contacts to add')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows per transaction')
+    parser.add_argument('--start', type=int, default=None,
+                        help='index of the first generated row (default: after the current max id)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        generate_people(args.rows, seed=args.seed, batch_size=args.batch_size, start=args.start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+# importer.py
+"""
+Streaming bulk import of contacts from CSV or vCard uploads.
+
+Records are parsed one at a time from the uploaded stream, validated with
+the same rules as PersonForm, and written with multi-row INSERT statements
+in fixed-size batches, one transaction per batch. Nothing here holds more
+than one batch of rows (plus a capped error list) in memory, so the cost of
+an import grows with the file size only in time, not in memory.
+"""
+import csv
+import functools
+import io
+import re
+
+import email_validator
+from sqlalchemy import select
+
+FIELDS = ('name', 'address', 'email', 'phone')
+CONFLICT_POLICIES = ('skip', 'upsert')
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_MAX_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    """Raised when an upload cannot be parsed at all (e.g. missing CSV columns)."""
+
+
+class ImportReport:
+    """Counters and per-row problems collected during an import."""
+
+    def __init__(self, max_errors=DEFAULT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = []
+        self.errors_truncated = False
+
+    def add_error(self, row, message):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'error': message})
+        else:
+            self.errors_truncated = True
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'errors_truncated': self.errors_truncated,
+        }
+
+
+# ---------------------------------------------------------------- parsing
+def text_stream(binary):
+    """Wrap an uploaded binary stream for incremental text decoding."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def read_csv(stream):
+    """Yield (row_number, record) pairs from a CSV with a header row."""
+    reader = csv.reader(stream)
+    try:
+        header = [column.strip().lower() for column in next(reader)]
+    except StopIteration:
+        return
+    missing = [field for field in FIELDS if field not in header]
+    if missing:
+        raise ImportFormatError(f"CSV is missing column(s): {', '.join(missing)}")
+    positions = {field: header.index(field) for field in FIELDS}
+
+    for row_number, row in enumerate(reader, start=1):
+        if not any(cell.strip() for cell in row):
+            continue
+        yield row_number, {
+            field: row[index] if index < len(row) else ''
+            for field, index in positions.items()
+        }
+
+
+def _unescape_vcard(value):
+    return (value.replace('\\n', ' ').replace('\\N', ' ')
+                 .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def _unfolded_lines(stream):
+    # RFC 6350 folds long lines by starting the continuation with whitespace.
+    pending = None
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+def _vcard_record(properties):
+    name = properties.get('FN', '')
+    if not name and 'N' in properties:
+        # N is "family;given;additional;prefix;suffix".
+        parts = properties['N'].split(';')
+        name = ' '.join(p for p in (parts[1:2] + parts[:1]) if p)
+    address = properties.get('ADR', '')
+    if address:
+        # ADR is "pobox;ext;street;locality;region;code;country".
+        address = ', '.join(part.strip() for part in address.split(';') if part.strip())
+    return {
+        'name': _unescape_vcard(name),
+        'address': _unescape_vcard(address),
+        'email': _unescape_vcard(properties.get('EMAIL', '')),
+        'phone': _unescape_vcard(properties.get('TEL', '')),
+    }
+
+
+def read_vcard(stream):
+    """Yield (card_number, record) pairs from a vCard (.vcf) file."""
+    card_number = 0
+    properties = None
+    for line in _unfolded_lines(stream):
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        # Drop parameters ("TEL;TYPE=cell") and group prefixes ("item1.EMAIL").
+        name = key.split(';', 1)[0].split('.')[-1].upper()
+        if name == 'BEGIN' and value.strip().upper() == 'VCARD':
+            properties = {}
+        elif name == 'END' and value.strip().upper() == 'VCARD':
+            if properties is not None:
+                card_number += 1
+                yield card_number, _vcard_record(properties)
+            properties = None
+        elif properties is not None:
+            # Keep the first value of repeated properties (preferred email etc.).
+            properties.setdefault(name, value)
+
+
+READERS = {
+    'csv': read_csv,
+    'vcf': read_vcard,
+}
+
+
+def reader_for(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'vcard':
+        extension = 'vcf'
+    try:
+        return READERS[extension]
+    except KeyError:
+        raise ImportFormatError('Upload a .csv or .vcf file.')
+
+
+# ------------------------------------------------------------- validation
+# Plain ASCII dot-atom local parts are always accepted by email_validator, so
+# only unusual addresses pay for a full validate_email() call. Domains repeat
+# heavily in bulk uploads and are checked once each.
+_DOT_ATOM = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*\Z")
+
+
+@functools.lru_cache(maxsize=4096)
+def _valid_domain(domain):
+    try:
+        email_validator.validate_email(f'a@{domain}', check_deliverability=False)
+    except email_validator.EmailNotValidError:
+        return False
+    return True
+
+
+def valid_email(address):
+    """Same verdict as wtforms' Email() validator, memoizing the domain part."""
+    local, _, domain = address.rpartition('@')
+    if local and len(local) <= 64 and _DOT_ATOM.match(local):
+        return _valid_domain(domain)
+    try:
+        email_validator.validate_email(address, check_deliverability=False)
+    except email_validator.EmailNotValidError:
+        return False
+    return True
+
+
+def validate(record, max_lengths):
+    """
+    Apply PersonForm's rules (every field required, email well-formed) plus
+    the column lengths of the person table. Returns a list of messages.
+    """
+    errors = []
+    for field in FIELDS:
+        value = record[field] = (record.get(field) or '').strip()
+        if not value:
+            errors.append(f'{field}: This field is required.')
+        elif max_lengths.get(field) and len(value) > max_lengths[field]:
+            errors.append(f'{field}: Longer than {max_lengths[field]} characters.')
+    if record['email'] and not valid_email(record['email']):
+        errors.append('email: Invalid email address.')
+    return errors
+
+
+# ---------------------------------------------------------------- writing
+def _insert_statement(session, table, policy):
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise ImportFormatError(f'Bulk import does not support the {dialect} dialect.')
+
+    stmt = insert(table)
+    if policy == 'upsert':
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.email],
+            set_={field: stmt.excluded[field] for field in FIELDS if field != 'email'}
+        )
+    return stmt.on_conflict_do_nothing(index_elements=[table.c.email])
+
+
+def _flush(session, table, stmt, batch, policy, report):
+    """Write one batch in its own transaction and account for every row."""
+    emails = [record['email'] for _, record in batch]
+    existing = set(session.execute(
+        select(table.c.email).where(table.c.email.in_(emails))
+    ).scalars())
+
+    for row_number, record in batch:
+        if record['email'] in existing:
+            if policy == 'upsert':
+                report.updated += 1
+            else:
+                report.skipped += 1
+                report.add_error(row_number, f"email: {record['email']} already exists, skipped.")
+        else:
+            report.inserted += 1
+
+    session.execute(stmt, [record for _, record in batch])
+    session.commit()
+
+
+def import_people(session, table, records, policy='skip',
+                  batch_size=DEFAULT_BATCH_SIZE, max_errors=DEFAULT_MAX_ERRORS):
+    """
+    Validate and insert `records` (an iterable of (row_number, dict)) into
+    `table` in batches of `batch_size`, resolving duplicate emails with
+    `policy` ('skip' or 'upsert'). Returns an ImportReport.
+    """
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f'Unknown conflict policy: {policy}')
+
+    stmt = _insert_statement(session, table, policy)
+    max_lengths = {field: table.c[field].type.length for field in FIELDS}
+    report = ImportReport(max_errors=max_errors)
+
+    # Rows are keyed by email so a file that repeats an address only writes
+    # it once per batch; later batches see it through the existing-email lookup.
+    batch = {}
+    for row_number, record in records:
+        report.rows += 1
+        problems = validate(record, max_lengths)
+        if problems:
+            report.invalid += 1
+            report.add_error(row_number, '; '.join(problems))
+            continue
+
+        record = {field: record[field] for field in FIELDS}
+        if record['email'] in batch:
+            if policy == 'upsert':
+                report.updated += 1
+                batch[record['email']] = (batch[record['email']][0], record)
+            else:
+                report.skipped += 1
+                report.add_error(row_number, f"email: {record['email']} repeated in file, skipped.")
+            continue
+
+        batch[record['email']] = (row_number, record)
+        if len(batch) >= batch_size:
+            _flush(session, table, stmt, list(batch.values()), policy, report)
+            batch = {}
+
+    if batch:
+        _flush(session, table, stmt, list(batch.values()), policy, report)
+    return report
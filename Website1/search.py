@@ -0,0 +1,110 @@
+# search.py
+"""
+Full-text contact search backed by an SQLite FTS5 index.
+
+person_fts is an external-content FTS5 table over person(name, address,
+email, phone). Triggers on the person table keep it in sync, so every
+writer (the add/edit forms, seed scripts, raw SQL) updates the index in
+the same transaction as the row itself.
+"""
+from sqlalchemy import text
+
+FTS_TABLE = 'person_fts'
+MIN_QUERY_CHARS = 2
+
+# Column weights for bm25(): a hit on the name outranks email/phone,
+# which outrank the address.
+RANK_WEIGHTS = (10.0, 1.0, 5.0, 5.0)
+
+SCHEMA = [
+    # prefix='2 3 4' keeps short type-ahead prefixes to a single index seek.
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, address, email, phone,
+        content='person', content_rowid='id',
+        tokenize='unicode61', prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON person BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, address, email, phone)
+        VALUES (new.id, new.name, new.address, new.email, new.phone);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON person BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, address, email, phone)
+        VALUES ('delete', old.id, old.name, old.address, old.email, old.phone);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON person BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, address, email, phone)
+        VALUES ('delete', old.id, old.name, old.address, old.email, old.phone);
+        INSERT INTO {FTS_TABLE}(rowid, name, address, email, phone)
+        VALUES (new.id, new.name, new.address, new.email, new.phone);
+    END""",
+]
+
+
+def is_supported(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def index_exists(connection):
+    row = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first()
+    return row is not None
+
+
+def install(connection):
+    """
+    Create the FTS table and its sync triggers if they are missing.
+
+    Returns True when the index was newly created, in which case the
+    caller should rebuild() it to pick up rows that already exist.
+    """
+    if not is_supported(connection):
+        return False
+    created = not index_exists(connection)
+    for statement in SCHEMA:
+        connection.execute(text(statement))
+    return created
+
+
+def uninstall(connection):
+    if not is_supported(connection):
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+def rebuild(connection):
+    """Re-read every row of the person table into the index."""
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def match_query(raw):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so user input can never be
+    parsed as FTS5 syntax, and all words must match.
+    """
+    terms = [word.replace('"', '""') for word in raw.split()]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+def search(connection, raw, limit=10):
+    """Return up to `limit` contacts matching `raw`, best match first."""
+    query = match_query(raw)
+    if len(raw.strip()) < MIN_QUERY_CHARS or not query:
+        return []
+    weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+    rows = connection.execute(
+        text(
+            f"SELECT p.id, p.name, p.address, p.email, p.phone "
+            f"FROM {FTS_TABLE} JOIN person AS p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :query "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT :limit"
+        ),
+        {'query': query, 'limit': limit}
+    )
+    return [dict(row._mapping) for row in rows]
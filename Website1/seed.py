@@ -1,5 +1,5 @@
 # seed.py
-from app import app, db
+from app import create_app, db
 from app import Person  # adjust if needed
 from werkzeug.exceptions import InternalServerError
 
@@ -49,5 +49,6 @@ def seed_people():
         raise InternalServerError(f"❌ Error seeding data: {e}")
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         seed_people()
@@ -0,0 +1,19 @@
+# serve.py
+"""
+Run the Address Book with gunicorn worker processes and threads.
+
+See common/serve.py for the options, warmup and graceful reloads.
+
+Usage:
+    python serve.py --bind 0.0.0.0:8000 --workers 4 --threads 8
+"""
+import os
+import sys
+
+# The modules the three apps share live in ../common (see common/__init__.py).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import serve  # noqa: E402
+
+if __name__ == '__main__':
+    serve.main()
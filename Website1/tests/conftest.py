@@ -0,0 +1,33 @@
+"""
+Shared fixtures: a fresh app on a throwaway SQLite database.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, Person  # noqa: E402
+from common import testing  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = testing.build_app(create_app, db, tmp_path)
+    with app.app_context():
+        yield app
+    testing.dispose_app(app, db)
+
+
+def add_people(*names):
+    """Add one person per name and return their ids, in the order given."""
+    start = Person.query.count()
+    people = [
+        Person(name=name, address=f'{number} Main Street',
+               email=f'person{number}@example.com', phone=f'0400 000 {number:03d}')
+        for number, name in enumerate(names, start=start)
+    ]
+    db.session.add_all(people)
+    db.session.commit()
+    return [person.id for person in people]
@@ -0,0 +1,141 @@
+"""CSV / vCard imports: validation and the skip/upsert conflict policies."""
+import io
+
+import pytest
+
+import importer
+from app import db, Person
+from conftest import add_people
+
+HEADER = 'name,address,email,phone\n'
+
+
+def upload(app, body, filename='people.csv', conflict='skip'):
+    response = app.test_client().post(
+        '/import?format=json',
+        data={'file': (io.BytesIO(body.encode()), filename), 'conflict': conflict},
+        content_type='multipart/form-data',
+    )
+    assert response.status_code == 200
+    return response
+
+
+def people():
+    db.session.expire_all()
+    return {person.email: person.name for person in Person.query}
+
+
+@pytest.fixture
+def existing(app):
+    """One contact already in the book, at person0@example.com."""
+    add_people('Old Name')
+
+
+def test_skip_keeps_the_existing_contact(app, existing):
+    report = upload(app, HEADER + (
+        'New Name,1 Main St,person0@example.com,1\n'
+        'Ava Wilson,2 Main St,ava@example.com,2\n'
+    )).get_json()
+    assert (report['inserted'], report['updated'], report['skipped']) == (1, 0, 1)
+    assert report['errors'] == [{'row': 1, 'error': 'email: person0@example.com already exists, skipped.'}]
+    assert people() == {'person0@example.com': 'Old Name', 'ava@example.com': 'Ava Wilson'}
+
+
+def test_upsert_updates_the_existing_contact(app, existing):
+    report = upload(app, HEADER + 'New Name,1 Main St,person0@example.com,1\n', conflict='upsert').get_json()
+    assert (report['inserted'], report['updated'], report['skipped']) == (0, 1, 0)
+    assert report['errors'] == []
+    assert people() == {'person0@example.com': 'New Name'}
+
+
+@pytest.mark.parametrize('conflict, name, updated, skipped', [
+    ('skip', 'First', 0, 1),
+    ('upsert', 'Second', 1, 0),
+])
+@pytest.mark.parametrize('batch_size', [1, 100])
+def test_email_repeated_in_the_file(app, conflict, name, updated, skipped, batch_size):
+    # With batch_size 1 the repeat lands in a later batch than the first row.
+    app.config['IMPORT_BATCH_SIZE'] = batch_size
+    report = upload(app, HEADER + (
+        'First,1 Main St,same@example.com,1\n'
+        'Second,2 Main St,same@example.com,2\n'
+    ), conflict=conflict).get_json()
+    assert (report['inserted'], report['updated'], report['skipped']) == (1, updated, skipped)
+    assert people() == {'same@example.com': name}
+
+
+def test_invalid_rows_are_reported_and_the_rest_imported(app):
+    report = upload(app, HEADER + (
+        ',1 Main St,blank@example.com,1\n'
+        'Bad Email,2 Main St,not-an-email,2\n'
+        'Long Phone,3 Main St,long@example.com,0123456789012345\n'
+        '\n'
+        'Short Row,4 Main St\n'
+        'Ava Wilson,5 Main St,ava@example.com,5\n'
+    )).get_json()
+    assert report['rows'] == 5
+    assert (report['inserted'], report['invalid']) == (1, 4)
+    errors = {error['row']: error['error'] for error in report['errors']}
+    assert errors[1] == 'name: This field is required.'
+    assert errors[2] == 'email: Invalid email address.'
+    assert errors[3] == 'phone: Longer than 15 characters.'
+    # The blank line is skipped but still counted as a row of the file.
+    assert 'email: This field is required.' in errors[5]
+    assert people() == {'ava@example.com': 'Ava Wilson'}
+
+
+def test_csv_columns_may_come_in_any_order_with_extras(app):
+    # A byte order mark from Excel must not end up in the first column name.
+    upload(app, '\ufeffPhone, Email ,Notes,Name,Address\n1,ava@example.com,x,Ava Wilson,1 Main St\n')
+    assert people() == {'ava@example.com': 'Ava Wilson'}
+
+
+@pytest.mark.parametrize('body, filename, message', [
+    ('name,email\nAva,ava@example.com\n', 'people.csv', 'CSV is missing column(s): address, phone'),
+    (HEADER, 'people.txt', 'Upload a .csv or .vcf file.'),
+])
+def test_unreadable_upload_imports_nothing(app, body, filename, message):
+    page = upload(app, body, filename=filename).get_data(as_text=True)
+    assert message in page
+    assert people() == {}
+
+
+def test_vcard_import(app, existing):
+    cards = (
+        'BEGIN:VCARD\r\n'
+        'VERSION:3.0\r\n'
+        'N:Wilson;Ava;;;\r\n'
+        'ADR;TYPE=home:;;5 St Georges\r\n'
+        '  Terrace;Perth;WA;6000;\r\n'
+        'item1.EMAIL;TYPE=internet:ava@example.com\r\n'
+        'EMAIL:second@example.com\r\n'
+        'TEL;TYPE=cell:0423 456 789\r\n'
+        'END:VCARD\r\n'
+        'BEGIN:VCARD\r\n'
+        'FN:Brown\\, Olivia\r\n'
+        'ADR:;;1 Main St;;;;\r\n'
+        'EMAIL:person0@example.com\r\n'
+        'TEL:1\r\n'
+        'END:VCARD\r\n'
+    )
+    report = upload(app, cards, filename='contacts.vcard', conflict='upsert').get_json()
+    assert (report['rows'], report['inserted'], report['updated']) == (2, 1, 1)
+
+    ava = Person.query.filter_by(email='ava@example.com').one()
+    assert ava.name == 'Ava Wilson'
+    assert ava.address == '5 St Georges Terrace, Perth, WA, 6000'
+    assert ava.phone == '0423 456 789'
+    assert people()['person0@example.com'] == 'Brown, Olivia'
+
+
+def test_error_list_is_capped(app):
+    records = ((number, {'name': '', 'address': '', 'email': '', 'phone': ''}) for number in range(1, 6))
+    report = importer.import_people(db.session, Person.__table__, records, max_errors=2)
+    assert report.invalid == 5
+    assert [error['row'] for error in report.errors] == [1, 2]
+    assert report.errors_truncated
+
+
+def test_unknown_policy_is_rejected(app):
+    with pytest.raises(ValueError):
+        importer.import_people(db.session, Person.__table__, [], policy='replace')
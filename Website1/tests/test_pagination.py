@@ -0,0 +1,114 @@
+"""Keyset pagination and prefix search on the list page."""
+import pytest
+
+from app import db, Person, decode_cursor, encode_cursor, people_page, prefix_filter, prefix_upper_bound
+from conftest import add_people
+
+# Two "Bea"s so the id tie-break decides their order.
+NAMES = ['Cara', 'Bea', 'Ava', 'Bea', 'Dan', 'Eve', 'Abe']
+
+
+def page_names(people):
+    return [(person.name, person.id) for person in people]
+
+
+def test_next_cursors_visit_every_row_once_in_order(app):
+    add_people(*NAMES)
+    expected = page_names(Person.query.order_by(Person.name, Person.id))
+
+    seen, after, pages = [], None, 0
+    while True:
+        people, prev_cursor, next_cursor = people_page(after=after, per_page=2)
+        assert (prev_cursor is None) == (after is None)
+        seen += page_names(people)
+        pages += 1
+        if next_cursor is None:
+            break
+        after = next_cursor
+
+    assert seen == expected
+    assert pages == 4
+
+
+def test_prev_cursors_walk_back_to_the_first_page(app):
+    add_people(*NAMES)
+    expected = page_names(Person.query.order_by(Person.name, Person.id))
+
+    after = None
+    for _ in range(3):
+        people, _, after = people_page(after=after, per_page=2)
+    last, before, next_cursor = people_page(after=after, per_page=2)
+    assert page_names(last) == expected[6:]
+    assert next_cursor is None
+
+    seen = page_names(last)
+    while before is not None:
+        people, before, next_cursor = people_page(before=before, per_page=2)
+        # Every page reached going back links forward again.
+        assert next_cursor is not None
+        seen = page_names(people) + seen
+
+    assert seen == expected
+    # The first page, reached backwards, holds a full page.
+    assert len(people) == 2
+
+
+def test_cursor_between_equal_names_keeps_the_id_order(app):
+    first, second = add_people('Bea', 'Bea')
+    people = people_page(after=encode_cursor(db.session.get(Person, first)), per_page=5)[0]
+    assert [person.id for person in people] == [second]
+    people = people_page(before=encode_cursor(db.session.get(Person, second)), per_page=5)[0]
+    assert [person.id for person in people] == [first]
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', 'bnVsbA==', 'WyJBIl0='])
+def test_malformed_cursor_is_ignored(app, cursor):
+    add_people(*NAMES)
+    assert decode_cursor(cursor) is None
+    people, prev_cursor, _ = people_page(after=cursor, per_page=2)
+    assert [person.name for person in people] == ['Abe', 'Ava']
+    assert prev_cursor is None
+
+
+def test_list_page_links_use_the_cursors(app):
+    add_people(*NAMES)
+    client = app.test_client()
+    first = client.get('/?per_page=3').get_data(as_text=True)
+    assert 'after=' in first and 'before=' not in first
+
+    after = people_page(per_page=3)[2]
+    second = client.get(f'/?per_page=3&after={after}').get_data(as_text=True)
+    assert 'Bea' in second and 'Cara' in second and 'Abe' not in second
+    assert 'before=' in second
+
+
+@pytest.mark.parametrize('prefix, upper', [
+    ('Al', 'Am'),
+    ('az', 'a{'),
+    ('\ud7ff', '\ue000'),
+    ('a\U0010ffff', 'b'),
+    ('\U0010ffff', None),
+])
+def test_prefix_upper_bound(prefix, upper):
+    assert prefix_upper_bound(prefix) == upper
+
+
+def test_prefix_filter_matches_exactly_the_names_starting_with_the_prefix(app):
+    # 'Al\U0001F600' sorts after 'Al\uffff', so a '\uffff' upper bound missed it.
+    matching = ['Al', 'Alice', 'Alz', 'Al\u00e9', 'Al\u4e2d', 'Al\U0001F600']
+    add_people(*matching, 'Ak', 'Am', 'Amy', 'al', 'A')
+
+    found = Person.query.filter(prefix_filter(Person.name, 'Al')).all()
+    assert sorted(person.name for person in found) == sorted(matching)
+
+
+@pytest.mark.parametrize('field, q, expected', [
+    ('name', 'Be', ['Bea', 'Bea']),
+    ('name', 'be', []),
+    ('email', 'person4@', ['Dan']),
+    ('phone', '0400 000 00', ['Cara', 'Bea', 'Ava', 'Bea', 'Dan', 'Eve', 'Abe']),
+])
+def test_search_field_prefix(app, field, q, expected):
+    add_people(*NAMES)
+    people = people_page(q=q, field=field, per_page=20)[0]
+    assert sorted(person.name for person in people) == sorted(expected)
@@ -0,0 +1,85 @@
+"""Full-text contact search: index sync, ranking and the prefix fallback."""
+import pytest
+
+import search
+from app import db, Person
+from conftest import add_people
+
+
+def found(client, q, **params):
+    response = client.get('/search', query_string=dict(q=q, **params))
+    assert response.status_code == 200
+    return [result['name'] for result in response.get_json()['results']]
+
+
+def test_triggers_keep_the_index_in_sync(app):
+    client = app.test_client()
+    person_id, = add_people('Olivia Brown')
+    assert found(client, 'oliv') == ['Olivia Brown']
+
+    person = db.session.get(Person, person_id)
+    person.name = 'Liam Smith'
+    db.session.commit()
+    assert found(client, 'oliv') == []
+    assert found(client, 'liam') == ['Liam Smith']
+
+    db.session.delete(person)
+    db.session.commit()
+    assert found(client, 'liam') == []
+
+
+def test_raw_sql_writes_are_indexed_too(app):
+    db.session.execute(
+        Person.__table__.insert(),
+        {'name': 'Noah Johnson', 'address': '1 Queen St', 'email': 'noah@example.com', 'phone': '1'}
+    )
+    db.session.commit()
+    assert found(app.test_client(), 'noah') == ['Noah Johnson']
+
+
+def test_name_hits_outrank_email_and_address_hits(app):
+    people = add_people('Ava Wilson', 'Olivia Brown', 'Liam Smith')
+    db.session.get(Person, people[0]).address = '5 Olive Street'
+    db.session.get(Person, people[2]).email = 'olive@example.com'
+    db.session.commit()
+
+    assert found(app.test_client(), 'oliv') == ['Olivia Brown', 'Liam Smith', 'Ava Wilson']
+
+
+def test_every_word_must_match_as_a_prefix(app):
+    add_people('Olivia Brown', 'Olivia Smith')
+    client = app.test_client()
+    assert found(client, 'oli bro') == ['Olivia Brown']
+    assert found(client, 'brown olivia') == ['Olivia Brown']
+
+
+@pytest.mark.parametrize('q', ['"', 'a OR', 'NEAR(x y)', '*', 'o"l', 'name:olivia', '-olivia'])
+def test_fts_syntax_in_the_query_is_matched_literally(app, q):
+    add_people('Olivia Brown')
+    client = app.test_client()
+    assert found(client, q) in ([], ['Olivia Brown'])
+
+
+def test_short_queries_and_limits(app):
+    add_people(*(f'Olivia {number}' for number in range(30)))
+    client = app.test_client()
+    assert found(client, 'o') == []
+    assert len(found(client, 'oli', limit=3)) == 3
+    assert len(found(client, 'oli', limit=1000)) == app.config['SEARCH_MAX_RESULTS']
+
+
+def test_missing_index_falls_back_to_name_prefix_until_rebuilt(app):
+    add_people('Olivia Brown', 'Ava Olive')
+    with db.engine.begin() as connection:
+        search.uninstall(connection)
+    db.session.remove()
+
+    client = app.test_client()
+    # Without the index only names starting with the query match.
+    assert found(client, 'Oli') == ['Olivia Brown']
+
+    result = app.test_cli_runner().invoke(args=['rebuild-search-index'])
+    assert result.exit_code == 0
+    assert 'rebuilt' in result.output
+    # The rebuild indexed the rows that were already there.
+    assert sorted(found(client, 'oli')) == ['Ava Olive', 'Olivia Brown']
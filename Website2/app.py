@@ -4,23 +4,155 @@ Restaurant Menu Management Flask Application
 This application provides a web interface for restaurant menu management,
 including viewing menu items, adding new items, editing existing items,
 and processing customer orders through a checkout system.
+
+create_app() builds the app; views, forms and models live at module
+level and are registered on each app it creates. Run the development
+server with `python app.py`, or several worker processes with serve.py.
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import (
+    Flask, current_app, render_template, request, redirect, url_for, flash, session, abort, make_response,
+    jsonify
+)
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, func, event
+from collections import namedtuple, OrderedDict
+from types import MappingProxyType
+from datetime import datetime, timezone
 from flask_wtf import FlaskForm
 from wtforms import StringField, DecimalField, SubmitField
 from wtforms.validators import DataRequired
+import click
 import os
+import sys
+import weakref
+
+# The modules the three apps share live in ../common (see common/__init__.py).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import assets, dbconfig, export, metrics
+from menu_cache import MenuCache
+from orders import OrderWriter, OrderAckTimeout, OrderQueueFull, OrderWriteFailed, new_order_id, order_age
+
+db = SQLAlchemy(session_options=dbconfig.session_options())
+
+# Third-party CSS shipped in static/ instead of loaded from a CDN (see common/assets.py).
+VENDOR_ASSETS = {
+    'vendor/bootstrap.min.css': assets.Vendored(
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+        'sha384-T3c6CoIi6uLrA9TneNEoa7RxnatzjcDSCmG1MXxSR1GAsXEV/Dwwykc2MPK8M2HN'
+    ),
+}
+
+# (rule, view, options) for every view; create_app() registers them.
+ROUTES = []
+
+
+def route(rule, **options):
+    """Like app.route(), for the apps create_app() builds."""
+    def decorator(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return decorator
+
+
+# Apps create_app() has built, held weakly so discarded apps can be freed.
+_apps = weakref.WeakSet()
+
 
-# Initialize Flask application
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///menu.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+def forget_order_writers():
+    """Drop the order writers a forked child inherited; their thread did not survive fork()."""
+    for app in list(_apps):
+        app.extensions.pop('order_writer', None)
 
-app.static_folder = 'static'
-db = SQLAlchemy(app)
+
+if hasattr(os, 'register_at_fork'):
+    # Registered once for all apps; a child process starts its own writer on first use.
+    os.register_at_fork(after_in_child=forget_order_writers)
+
+
+def create_app(config=None):
+    """
+    Build and configure the Restaurant Menu app.
+    
+    Args:
+        config: Mapping of settings that override the defaults below
+    
+    Returns:
+        Flask application
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your-secret-key'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Seconds between checks of the shared menu_version row: a menu write made
+    # by another worker is seen within this time (0 checks on every request).
+    app.config['MENU_VERSION_CHECK_INTERVAL'] = float(os.environ.get('MENU_VERSION_CHECK_INTERVAL', 1))
+    # Optional maximum age of a cached menu in seconds, on top of that.
+    app.config['MENU_CACHE_TTL'] = (
+        float(os.environ['MENU_CACHE_TTL']) if os.environ.get('MENU_CACHE_TTL') else None
+    )
+    app.config['MAX_LINE_QUANTITY'] = 99
+    # Order write pipeline (see orders.py for the durability semantics).
+    app.config['ORDER_ACK'] = os.environ.get('ORDER_ACK', 'durable')
+    app.config['ORDER_FLUSH_INTERVAL'] = float(os.environ.get('ORDER_FLUSH_INTERVAL', 0.01))
+    app.config['ORDER_QUEUE_SIZE'] = int(os.environ.get('ORDER_QUEUE_SIZE', 1000))
+    app.config['ORDER_BATCH_SIZE'] = 500
+    app.config['ORDER_SUBMIT_TIMEOUT'] = 0.5
+    # Seconds a durable checkout waits for its commit before answering 503.
+    app.config['ORDER_ACK_TIMEOUT'] = float(os.environ.get('ORDER_ACK_TIMEOUT', 10))
+    # Seconds an order id no worker knows about still counts as in flight.
+    app.config['ORDER_PENDING_WINDOW'] = float(os.environ.get('ORDER_PENDING_WINDOW', 30))
+    # Request metrics at /metrics (see common/metrics.py); slow requests are in seconds.
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+    app.config['METRICS_SLOW_REQUEST'] = float(os.environ.get('METRICS_SLOW_REQUEST', 0.5))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config.update(config or {})
+
+    app.static_folder = 'static'
+    # DATABASE_URL overrides the SQLite file; see common/dbconfig.py for the tuning.
+    dbconfig.configure(app, 'sqlite:///menu.db')
+    db.init_app(app)
+    dbconfig.init_app(app, db)
+    metrics.init_app(app, db)
+    assets.init_app(app, VENDOR_ASSETS)
+    app.extensions['menu_cache'] = MenuCache(ttl=app.config['MENU_CACHE_TTL'])
+    for rule, view, options in ROUTES:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.add_template_filter(format_cents, 'cents')
+    app.cli.add_command(recount_categories_command)
+    _apps.add(app)
+    return app
+
+
+def get_menu_cache():
+    """
+    Return the current app's MenuCache, synced with the database at most
+    once per MENU_VERSION_CHECK_INTERVAL.
+    
+    Reading the shared menu version is the only query a cached menu page
+    or checkout needs, so it is not run per request: a menu write made by
+    another worker process reaches this one's cache within the interval.
+    
+    Returns:
+        MenuCache
+    """
+    cache = current_app.extensions['menu_cache']
+    if cache.check_due(current_app.config['MENU_VERSION_CHECK_INTERVAL']):
+        cache.sync(db.session.scalar(select(MenuVersion.version)) or 0)
+    return cache
+
+
+def warmup(app):
+    """
+    Open a database connection and build the menu snapshot and price index
+    once, so a new worker's first visitors are served from the cache
+    (see serve.py).
+    """
+    with app.test_client() as client:
+        client.get('/')
+    with app.app_context():
+        get_menu_cache().prices(load_menu)
 
 
 class MenuItem(db.Model):
@@ -39,6 +171,146 @@ class MenuItem(db.Model):
     description = db.Column(db.String(255), nullable=False)
     cost = db.Column(db.Float, nullable=False)
 
+    # (type, id) serves both the category filter and its display order.
+    __table_args__ = (
+        db.Index('ix_menu_item_type_id', 'type', 'id'),
+    )
+
+
+class Category(db.Model):
+    """
+    Per-category item counts, kept up to date by MenuItem write events.
+    
+    Attributes:
+        id: Unique identifier for the category
+        name: Category name, matching MenuItem.type
+        item_count: Number of menu items currently in the category
+    """
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class MenuVersion(db.Model):
+    """
+    Single-row counter bumped by every menu write, shared by all worker
+    processes so each can tell when its cached menu is stale.
+    
+    Attributes:
+        id: Always 1
+        version: Incremented in the transaction of each menu change
+    """
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+def bump_menu_version(connection):
+    """
+    Increment the shared menu version inside the caller's transaction.
+    
+    Args:
+        connection: Connection of the transaction that changed the menu
+    """
+    dbconfig.increment(connection, MenuVersion.__table__, {'id': 1}, 'version', 1)
+
+
+def adjust_category_count(connection, name, delta):
+    """
+    Add `delta` to a category's item count inside the caller's transaction.
+    
+    Args:
+        connection: Connection of the flush that changed the menu item
+        name: Category name
+        delta: +1 or -1
+    """
+    dbconfig.increment(connection, Category.__table__, {'name': name}, 'item_count', delta)
+
+
+@event.listens_for(MenuItem, 'after_insert')
+def count_inserted_item(mapper, connection, target):
+    adjust_category_count(connection, target.type, 1)
+    bump_menu_version(connection)
+
+
+@event.listens_for(MenuItem, 'after_update')
+def count_moved_item(mapper, connection, target):
+    history = db.inspect(target).attrs.type.history
+    if history.deleted and history.added:
+        adjust_category_count(connection, history.deleted[0], -1)
+        adjust_category_count(connection, history.added[0], 1)
+    bump_menu_version(connection)
+
+
+@event.listens_for(MenuItem, 'after_delete')
+def count_deleted_item(mapper, connection, target):
+    adjust_category_count(connection, target.type, -1)
+    bump_menu_version(connection)
+
+
+def recount_categories(connection):
+    """
+    Rebuild every category count from the menu_item table and bump the
+    shared menu version, so every worker drops its cached menu.
+    
+    Needed after writes that bypass the ORM, such as generate.py.
+    
+    Args:
+        connection: Connection to run the recount on (inside a transaction)
+    """
+    categories = Category.__table__
+    items = MenuItem.__table__
+    connection.execute(categories.delete())
+    connection.execute(categories.insert().from_select(
+        ['name', 'item_count'],
+        select(items.c.type, func.count()).group_by(items.c.type)
+    ))
+    bump_menu_version(connection)
+
+
+class Order(db.Model):
+    """
+    Database model for a placed order.
+    
+    Attributes:
+        id: Hex id (creation time, then random digits) handed to the client
+            before the order is written
+        total_cents: Order total in integer cents
+        created_at: When checkout accepted the order (UTC)
+        lines: Relationship to the order's OrderLine rows
+    """
+    
+    __tablename__ = 'orders'
+    id = db.Column(db.String(32), primary_key=True)
+    total_cents = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    lines = db.relationship('OrderLine', backref='order')
+
+
+class OrderLine(db.Model):
+    """
+    Database model for one line of an order.
+    
+    Attributes:
+        id: Unique identifier for the line
+        order_id: Foreign key to the order
+        menu_item_id: Menu item that was ordered
+        description: Item description at the time of ordering
+        unit_cents: Unit price at the time of ordering, in cents
+        quantity: Number of units ordered
+    """
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.String(32), db.ForeignKey('orders.id'), nullable=False, index=True)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
+    description = db.Column(db.String(255), nullable=False)
+    unit_cents = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+
+PricedLine = namedtuple('PricedLine', ['item', 'quantity', 'line_cents'])
+
 
 class MenuItemForm(FlaskForm):
     """
@@ -57,19 +329,113 @@ class MenuItemForm(FlaskForm):
     submit = SubmitField('Submit')
 
 
-@app.route('/')
+def load_menu(category=None):
+    """
+    Read the menu, or one category of it, as immutable rows for the snapshot cache.
+    
+    Args:
+        category: Category name to restrict to, or None for the whole menu
+    
+    Returns:
+        Tuple of rows with id, type, description and cost attributes,
+        ordered by category
+    """
+    statement = select(MenuItem.id, MenuItem.type, MenuItem.description, MenuItem.cost)
+    if category is not None:
+        statement = statement.where(MenuItem.type == category)
+    statement = statement.order_by(MenuItem.type, MenuItem.id)
+    return tuple(db.session.execute(statement).all())
+
+
+def get_categories():
+    """
+    Return the non-empty categories and their item counts.
+    
+    Read from the Category table, so no menu items are scanned, and cached
+    per menu version.
+    
+    Returns:
+        Read-only mapping of category name to item count, ordered by name
+    """
+    def load():
+        rows = db.session.execute(
+            select(Category.name, Category.item_count)
+            .where(Category.item_count > 0)
+            .order_by(Category.name)
+        )
+        return MappingProxyType(OrderedDict((name, count) for name, count in rows))
+    return get_menu_cache().memo('categories', load)
+
+
+def menu_page(category=None):
+    """
+    Serve a menu view from the snapshot cache with ETag/Last-Modified headers.
+    
+    Args:
+        category: Category to show, or None for the full grouped menu
+    
+    Returns:
+        Rendered menu page, or an empty 304 response
+    """
+    categories = get_categories()
+    snapshot = get_menu_cache().get(
+        category,
+        lambda: load_menu(category),
+        lambda items: render_template(
+            'menu_list.html', items=items, categories=categories, category=category
+        )
+    )
+    response = make_response(snapshot.body)
+    response.set_etag(snapshot.etag)
+    response.headers['Last-Modified'] = snapshot.last_modified
+    # Let clients keep the page but revalidate it on every view.
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@route('/')
 def index():
     """
-    Homepage route that displays all menu items.
+    Homepage route that displays all menu items grouped by category.
+    
+    The rendered page is served from the menu snapshot cache and carries a
+    content ETag and Last-Modified, so repeat visits get 304 Not Modified.
+    
+    Returns:
+        Rendered menu page, or an empty 304 response
+    """
+    return menu_page()
+
+
+@route('/category/<name>')
+def category(name):
+    """
+    Display the menu items of a single category.
+    
+    Unknown categories are rejected from the cached category list, so only
+    real categories ever get a snapshot.
+    
+    Args:
+        name: Category name (MenuItem.type)
     
     Returns:
-        Rendered template showing all menu items
+        Rendered menu page for the category, 304, or 404 if it has no items
     """
-    items = MenuItem.query.all()
-    return render_template('menu_list.html', items=items)
+    if name not in get_categories():
+        abort(404)
+    return menu_page(name)
 
 
-@app.route('/add', methods=['GET', 'POST'])
+@click.command('recount-categories')
+@with_appcontext
+def recount_categories_command():
+    """Rebuild per-category item counts from the menu items."""
+    with db.engine.begin() as connection:
+        recount_categories(connection)
+    print("✅ Category counts rebuilt.")
+
+
+@route('/add', methods=['GET', 'POST'])
 def add_item():
     """
     Route for adding new menu items.
@@ -90,12 +456,13 @@ def add_item():
         )
         db.session.add(item)
         db.session.commit()
+        get_menu_cache().bump()
         flash('Item added to menu!')
         return redirect(url_for('index'))
     return render_template('add_item.html', form=form)
 
 
-@app.route('/edit/<int:id>', methods=['GET', 'POST'])
+@route('/edit/<int:id>', methods=['GET', 'POST'])
 def edit_item(id):
     """
     Route for editing existing menu items.
@@ -117,26 +484,215 @@ def edit_item(id):
         item.description = form.description.data
         item.cost = float(form.cost.data)
         db.session.commit()
+        get_menu_cache().bump()
         flash('Item updated!')
         return redirect(url_for('index'))
     return render_template('edit_item.html', form=form)
 
 
-@app.route('/checkout', methods=['POST'])
+def format_cents(cents):
+    """Render an integer amount of cents as a decimal price."""
+    return f"{cents / 100:.2f}"
+
+
+def price_order(selected_ids, quantities):
+    """
+    Price an order against the in-memory price index.
+    
+    Args:
+        selected_ids: Menu item ids as submitted by the client
+        quantities: Mapping of item id to requested quantity (default 1)
+    
+    Returns:
+        Tuple of (list of PricedLine, total in cents)
+    
+    Raises:
+        ValueError: If an id is malformed or unknown, or a quantity is out of range
+    """
+    prices = get_menu_cache().prices(load_menu)
+    max_quantity = current_app.config['MAX_LINE_QUANTITY']
+    ordered = {}
+    for raw_id in selected_ids:
+        try:
+            item_id = int(raw_id)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid menu item id: {raw_id!r}')
+        if item_id not in prices:
+            raise ValueError(f'Unknown menu item: {item_id}')
+        quantity = quantities.get(item_id, 1)
+        if not 1 <= quantity <= max_quantity:
+            raise ValueError(f'Quantity for item {item_id} must be between 1 and {max_quantity}')
+        ordered[item_id] = ordered.get(item_id, 0) + quantity
+
+    lines = [
+        PricedLine(prices[item_id], quantity, prices[item_id].cents * quantity)
+        for item_id, quantity in ordered.items()
+    ]
+    return lines, sum(line.line_cents for line in lines)
+
+
+def get_order_writer():
+    """
+    Return the app's OrderWriter, creating it on first use.
+    
+    The writer (and its thread) is created lazily so importing the app for
+    scripts such as seed.py does not start a background thread.
+    
+    Returns:
+        OrderWriter bound to this app's engine
+    """
+    writer = current_app.extensions.get('order_writer')
+    if writer is None:
+        writer = current_app.extensions.setdefault('order_writer', OrderWriter(
+            db.engine,
+            Order.__table__,
+            OrderLine.__table__,
+            queue_size=current_app.config['ORDER_QUEUE_SIZE'],
+            batch_size=current_app.config['ORDER_BATCH_SIZE'],
+            flush_interval=current_app.config['ORDER_FLUSH_INTERVAL'],
+            submit_timeout=current_app.config['ORDER_SUBMIT_TIMEOUT'],
+            ack=current_app.config['ORDER_ACK'],
+            ack_timeout=current_app.config['ORDER_ACK_TIMEOUT']
+        ))
+    return writer
+
+
+@route('/checkout', methods=['POST'])
 def checkout():
     """
     Route for processing customer orders and checkout.
     
-    Receives selected menu items from the form submission,
-    calculates the total cost, and displays the order summary.
+    Receives selected menu items and their quantities from the form
+    submission and prices them from the in-memory price index, so checkout
+    does not query the database unless the menu has just changed. The
+    order is then handed to the group-committing order writer.
     
     Returns:
-        Rendered checkout template with selected items and total cost
+        Rendered checkout template with order lines, total cost and order id,
+        400 Bad Request for unknown items or invalid quantities, or
+        503 Service Unavailable when the order queue is full or a durable
+        order was not committed within ORDER_ACK_TIMEOUT
     """
     selected_ids = request.form.getlist('selected_items')
-    selected_items = MenuItem.query.filter(MenuItem.id.in_(selected_ids)).all()
-    total = sum(item.cost for item in selected_items)
-    return render_template('checkout.html', items=selected_items, total=total)
+    quantities = {}
+    for raw_id in selected_ids:
+        raw_quantity = request.form.get(f'quantity_{raw_id}')
+        if raw_quantity is None:
+            continue
+        # A quantity that was sent must be a whole number, not silently 1.
+        raw_quantity = raw_quantity.strip()
+        if not raw_quantity.isdecimal() or int(raw_quantity) < 1:
+            abort(400, description=f'Quantity for item {raw_id} must be a positive whole number.')
+        if raw_id.isdigit():
+            quantities[int(raw_id)] = int(raw_quantity)
+
+    try:
+        lines, total_cents = price_order(selected_ids, quantities)
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    order_id = status = None
+    if lines:
+        order_id = new_order_id()
+        writer = get_order_writer()
+        try:
+            writer.submit(
+                {
+                    'id': order_id,
+                    'total_cents': total_cents,
+                    'created_at': datetime.now(timezone.utc).replace(tzinfo=None)
+                },
+                [
+                    {
+                        'menu_item_id': line.item.id,
+                        'description': line.item.description,
+                        'unit_cents': line.item.cents,
+                        'quantity': line.quantity
+                    }
+                    for line in lines
+                ]
+            )
+        except OrderQueueFull as e:
+            response = make_response(str(e), 503)
+            response.headers['Retry-After'] = '1'
+            return response
+        except OrderAckTimeout as e:
+            response = make_response(str(e), 503)
+            if e.withdrawn:
+                response.headers['Retry-After'] = '1'
+            else:
+                # The order may still be stored; point the client at its status.
+                response.headers['Location'] = url_for('order_status', order_id=order_id)
+            return response
+        except OrderWriteFailed:
+            abort(500, description='Your order could not be saved, please try again.')
+        status = 'confirmed' if writer.ack == 'durable' else 'pending'
+
+    return render_template(
+        'checkout.html', lines=lines, total_cents=total_cents, order_id=order_id, status=status
+    )
+
+
+@route('/orders/<order_id>')
+def order_status(order_id):
+    """
+    Report the status of an order for clients to poll.
+    
+    Args:
+        order_id: Order id shown on the checkout page
+    
+    The order may have been queued by another server worker, so an id
+    that is neither held by this worker's writer nor stored yet is
+    reported 'pending' until it is older than ORDER_PENDING_WINDOW.
+    
+    Returns:
+        JSON with status 'pending', 'failed' or 'confirmed' (plus the order
+        total and lines), or 404 with status 'unknown'
+    """
+    status = get_order_writer().status(order_id)
+    if status is not None:
+        return jsonify(id=order_id, status=status)
+
+    order = db.session.get(Order, order_id)
+    if order is None:
+        age = order_age(order_id)
+        if age is not None and age < current_app.config['ORDER_PENDING_WINDOW']:
+            return jsonify(id=order_id, status='pending')
+        return jsonify(id=order_id, status='unknown'), 404
+    return jsonify(
+        id=order.id,
+        status='confirmed',
+        total_cents=order.total_cents,
+        created_at=order.created_at.isoformat(),
+        lines=[
+            {
+                'menu_item_id': line.menu_item_id,
+                'description': line.description,
+                'unit_cents': line.unit_cents,
+                'quantity': line.quantity
+            }
+            for line in order.lines
+        ]
+    )
+
+
+@route('/export.<fmt>')
+def export_menu(fmt):
+    """
+    Stream every menu item as a CSV or NDJSON download.
+    
+    Args:
+        fmt: Output format, 'csv' or 'ndjson'
+    
+    Returns:
+        Streaming response fed from the database in fixed-size batches
+    """
+    if fmt not in export.FORMATS:
+        abort(404)
+    statement = select(
+        MenuItem.id, MenuItem.type, MenuItem.description, MenuItem.cost
+    ).order_by(MenuItem.id)
+    return export.stream_rows(db.session, statement, fmt, 'menu')
 
 
 if __name__ == '__main__':
@@ -144,8 +700,15 @@ if __name__ == '__main__':
     Application entry point for direct execution.
     Creates static folder, ensures database tables exist, and starts the Flask server.
     """
+    app = create_app()
     os.makedirs(app.static_folder, exist_ok=True)
     with app.app_context():
         db.create_all()
+        # create_all() skips indexes on tables that already exist.
+        for index in MenuItem.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        with db.engine.begin() as connection:
+            if connection.execute(select(func.count()).select_from(Category.__table__)).scalar() == 0:
+                recount_categories(connection)
     app.run(debug=True)
 
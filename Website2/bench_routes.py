@@ -0,0 +1,73 @@
+"""
+Restaurant Menu Route Benchmark
+
+Drives the menu page, checkout and the add and edit forms through the
+Flask test client against a throwaway SQLite database grown with
+generate.py to each --sizes row count, and writes throughput, latency,
+SQL and memory figures as JSON (see common/benchmark.py).
+
+The menu page is requested without If-None-Match, so every request gets
+the full page; add and edit invalidate the menu cache as they would in
+production.
+
+Usage:
+    python bench_routes.py --sizes 1000,100000,1000000 --output bench.json
+    python bench_routes.py --sizes 1000,100000 --baseline bench.json
+"""
+
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix='bench_routes_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+os.environ.setdefault('METRICS_SLOW_REQUEST', '60')
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import create_app, db, MenuItem  # noqa: E402  (must follow DATABASE_URL)
+from common.benchmark import Route  # noqa: E402
+from common import benchmark  # noqa: E402
+import generate  # noqa: E402
+
+app = create_app({'WTF_CSRF_ENABLED': False})
+
+
+def populate(size):
+    """Append generated menu items until the database holds `size`."""
+    with app.app_context():
+        db.create_all()
+        current = db.session.scalar(select(func.count(MenuItem.id)))
+        db.session.remove()
+        if size > current:
+            generate.generate_menu(size - current, seed=42)
+
+
+def routes():
+    """Build the routes to drive at the current database size."""
+    client = app.test_client()
+    with app.app_context():
+        ids = db.session.scalars(select(MenuItem.id).order_by(MenuItem.id).limit(1000)).all()
+        db.session.remove()
+
+    def checkout(i):
+        chosen = [str(ids[(i + step * 7) % len(ids)]) for step in range(3)]
+        data = {'selected_items': chosen}
+        data.update({f'quantity_{item_id}': '2' for item_id in chosen})
+        return client.post('/checkout', data=data)
+
+    def item(i):
+        return {'type': 'Special', 'description': f'Bench Special #{i}', 'cost': '9.50'}
+
+    return [
+        Route('index', lambda i: client.get('/'), 200),
+        Route('checkout', checkout, 200),
+        Route('add_item', lambda i: client.post('/add', data=item(i)), 302),
+        Route('edit_item', lambda i: client.post(f'/edit/{ids[i % len(ids)]}', data=item(i)), 302),
+    ]
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        engines = list(db.engines.values())
+    sys.exit(benchmark.main('Restaurant Menu', engines, populate, routes))
@@ -0,0 +1,233 @@
+"""
+Menu Snapshot Cache
+
+Holds immutable snapshots of the menu views (item data plus the rendered
+page, one per view key: the full menu or a single category) and an
+immutable id -> price index, all tagged with a version number. Write
+paths call bump() after they commit, which invalidates them; the next
+reader rebuilds each one once and every later reader is served from
+memory without touching the database or the template engine.
+
+Rebuilds are copy-on-write: a new object is built off to the side and
+swapped in with a single reference assignment, so a request that already
+holds the old snapshot or price index keeps a consistent view of it.
+
+Worker processes each hold their own cache, so the app also keeps a
+shared version in the database (the menu_version row, bumped in the same
+transaction as every menu write). Reading it would cost a query per
+request, so it is read only when check_due() says the check interval
+has passed, and passed to sync(): a change made by any worker
+invalidates every worker's snapshots within that interval.
+MENU_CACHE_TTL optionally caps the age of a snapshot on top of that.
+"""
+
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from email.utils import formatdate
+from types import MappingProxyType
+
+MenuSnapshot = namedtuple(
+    'MenuSnapshot', ['version', 'items', 'body', 'etag', 'last_modified', 'built_at']
+)
+PriceEntry = namedtuple('PriceEntry', ['id', 'type', 'description', 'cents'])
+PriceIndex = namedtuple('PriceIndex', ['version', 'entries', 'built_at'])
+Memo = namedtuple('Memo', ['version', 'value', 'built_at'])
+
+
+def to_cents(cost):
+    """Convert a float price to integer cents."""
+    return int(round(cost * 100))
+
+
+def build_price_index(items):
+    """
+    Build a read-only id -> PriceEntry mapping from menu rows.
+    
+    Args:
+        items: Iterable of rows with id, type, description and cost
+    
+    Returns:
+        MappingProxyType keyed by item id
+    """
+    return MappingProxyType({
+        item.id: PriceEntry(item.id, item.type, item.description, to_cents(item.cost))
+        for item in items
+    })
+
+
+class MenuCache:
+    """
+    Versioned, thread-safe cache of the current menu snapshot.
+    
+    Attributes:
+        version: Incremented on every menu write
+        shared_version: Last database menu version passed to sync()
+        checked_at: time.monotonic() of the last shared version check
+        ttl: Optional maximum age of a snapshot in seconds (None = no expiry)
+        hits: Requests served from the snapshot
+        misses: Requests that had to rebuild it
+    """
+
+    def __init__(self, ttl=None):
+        self.version = 0
+        self.shared_version = None
+        self.checked_at = None
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._snapshots = {}
+        self._previous = {}
+        self._prices = None
+        self._memos = {}
+        self._lock = threading.Lock()
+
+    def bump(self):
+        """Invalidate every snapshot after a menu write."""
+        with self._lock:
+            self.version += 1
+            self._snapshots = {}
+            self._prices = None
+            self._memos = {}
+
+    def check_due(self, interval):
+        """
+        Return True if the shared version should be read again.
+        
+        A True answer claims the check for the next `interval` seconds,
+        so concurrent requests do not all query for it at once.
+        
+        Args:
+            interval: Seconds between checks
+        """
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < interval:
+            return False
+        self.checked_at = now
+        return True
+
+    def sync(self, shared_version):
+        """
+        Invalidate every snapshot if the database menu version moved.
+        
+        Args:
+            shared_version: Current version from the menu_version row
+        """
+        if shared_version == self.shared_version:
+            return
+        with self._lock:
+            if shared_version != self.shared_version:
+                self.shared_version = shared_version
+                self.version += 1
+                self._snapshots = {}
+                self._prices = None
+                self._memos = {}
+
+    def _fresh(self, entry):
+        if entry is None or entry.version != self.version:
+            return False
+        return self.ttl is None or time.monotonic() - entry.built_at < self.ttl
+
+    def get(self, key, load_items, render):
+        """
+        Return the current snapshot of one menu view, rebuilding it if needed.
+        
+        Args:
+            key: View key; None for the full menu, a category name otherwise
+            load_items: Callable returning the view's menu items as a tuple of rows
+            render: Callable taking the items and returning the page HTML
+        
+        Returns:
+            MenuSnapshot for the current version
+        """
+        snapshot = self._snapshots.get(key)
+        if self._fresh(snapshot):
+            self.hits += 1
+            return snapshot
+
+        # Only one thread rebuilds; the rest wait and reuse its result.
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if self._fresh(snapshot):
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            version = self.version
+            items = load_items()
+            body = render(items).encode('utf-8')
+            etag = hashlib.sha1(body).hexdigest()
+            # The ETag is a content hash, so it agrees across worker processes;
+            # Last-Modified only moves when the content actually changed.
+            previous = self._previous.get(key)
+            if previous is not None and previous.etag == etag:
+                last_modified = previous.last_modified
+            else:
+                last_modified = formatdate(time.time(), usegmt=True)
+            snapshot = MenuSnapshot(
+                version=version,
+                items=items,
+                body=body,
+                etag=etag,
+                last_modified=last_modified,
+                built_at=time.monotonic()
+            )
+            self._snapshots[key] = self._previous[key] = snapshot
+            return snapshot
+
+    def prices(self, load_items):
+        """
+        Return the current id -> PriceEntry index, rebuilding it if needed.
+        
+        Reuses the rows of a fresh full-menu snapshot when there is one, so a
+        rebuild only queries the database if the menu page has not been
+        viewed since the last write.
+        
+        Args:
+            load_items: Callable returning the menu items as a tuple of rows
+        
+        Returns:
+            Read-only mapping of item id to PriceEntry
+        """
+        index = self._prices
+        if self._fresh(index):
+            return index.entries
+
+        with self._lock:
+            index = self._prices
+            if self._fresh(index):
+                return index.entries
+            version = self.version
+            snapshot = self._snapshots.get(None)
+            items = snapshot.items if self._fresh(snapshot) else load_items()
+            index = PriceIndex(
+                version=version,
+                entries=build_price_index(items),
+                built_at=time.monotonic()
+            )
+            self._prices = index
+            return index.entries
+
+    def memo(self, key, build):
+        """
+        Return a small derived value (e.g. the category list) for the
+        current version, building it once per version.
+        
+        Args:
+            key: Name of the value
+            build: Callable returning the value; it must be treated as read-only
+        
+        Returns:
+            The cached value
+        """
+        entry = self._memos.get(key)
+        if self._fresh(entry):
+            return entry.value
+
+        with self._lock:
+            entry = self._memos.get(key)
+            if self._fresh(entry):
+                return entry.value
+            entry = Memo(version=self.version, value=build(), built_at=time.monotonic())
+            self._memos[key] = entry
+            return entry.value
@@ -0,0 +1,295 @@
+"""
+Order Write Pipeline
+
+Checkout hands finished orders to an OrderWriter instead of committing
+them in the request thread. A single background thread drains the
+bounded queue and writes everything that arrived within the flush
+interval in one transaction (group commit), so a burst of N checkouts
+costs one SQLite commit/fsync instead of N.
+
+Durability semantics:
+    ack='durable' (default): submit() returns only after the batch that
+        holds the order has committed. An order that was acknowledged is
+        on disk. Requests still share commits, because every order that
+        arrives during the flush interval rides in the same transaction.
+    ack='queued': submit() returns as soon as the order is queued. This
+        has lower latency, but orders still in the queue are lost if the
+        process dies. Clients must poll the order status until it is
+        'confirmed'; an id that becomes 'unknown' was never stored.
+
+Only the process that queued an order knows it is in flight, and with
+several server workers a poll may reach another one. Order ids therefore
+start with their creation time (new_order_id()): a worker that neither
+holds the order nor finds it in the database reports it 'pending' until
+it is older than the pending window, and 'unknown' after that. A failed
+order is reported 'failed' by its own worker and 'unknown' by the others.
+
+Back-pressure: when the queue is full, submit() waits up to
+submit_timeout and then raises OrderQueueFull; the route maps that to
+503 so clients retry instead of piling up blocked worker threads.
+
+A durable submit() waits at most ack_timeout for its commit. While it
+waits it restarts the writer thread if that has died. When the time is
+up, an order the writer has not picked up yet is withdrawn from the
+queue and OrderAckTimeout says it was not stored, so it is safe to
+retry. An order already being written cannot be withdrawn; its timeout
+says so, and /orders/<id> reports the outcome.
+"""
+
+import atexit
+import logging
+import queue
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_ORDER_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class OrderQueueFull(Exception):
+    """Raised when the write queue stays full for longer than submit_timeout."""
+
+
+class OrderWriteFailed(Exception):
+    """Raised to durable submitters whose order could not be committed."""
+
+
+class OrderAckTimeout(Exception):
+    """
+    Raised to durable submitters whose order was not committed within
+    ack_timeout. `withdrawn` is True when the order was taken off the
+    queue unwritten, False when it may still be committed.
+    """
+
+    def __init__(self, message, withdrawn):
+        super().__init__(message)
+        self.withdrawn = withdrawn
+
+
+def new_order_id():
+    """Return a 32-digit hex order id that starts with its creation time in milliseconds."""
+    return f'{int(time.time() * 1000):012x}{secrets.token_hex(10)}'
+
+
+def order_age(order_id):
+    """
+    Return the seconds since new_order_id() made `order_id`, or None if
+    it is not such an id.
+    """
+    if not _ORDER_ID.fullmatch(order_id):
+        return None
+    age = time.time() - int(order_id[:12], 16) / 1000
+    # Ids from the future were not made here (allow for a little clock jitter).
+    return max(age, 0.0) if age > -1 else None
+
+
+class _Pending:
+    """A queued order plus the signal its submitter may wait on."""
+
+    __slots__ = ('order', 'lines', 'done', 'error', 'taken', 'withdrawn')
+
+    def __init__(self, order, lines):
+        self.order = order
+        self.lines = lines
+        self.done = threading.Event()
+        self.error = None
+        # Both change under the writer's state lock: taken once a batch
+        # holds the order, withdrawn if its submitter gave up before that.
+        self.taken = False
+        self.withdrawn = False
+
+
+class OrderWriter:
+    """
+    Bounded queue plus a background thread that group-commits orders.
+    
+    Args:
+        engine: SQLAlchemy engine to write with
+        orders_table: Core Table for orders
+        lines_table: Core Table for order lines
+        queue_size: Maximum number of orders waiting to be written
+        batch_size: Maximum number of orders per transaction
+        flush_interval: Seconds to keep collecting orders after the first one
+        submit_timeout: Seconds submit() waits for queue space
+        ack: 'durable' or 'queued' (see module docstring)
+        ack_timeout: Seconds a durable submit() waits for its commit
+    """
+
+    def __init__(self, engine, orders_table, lines_table, queue_size=1000, batch_size=500,
+                 flush_interval=0.01, submit_timeout=0.5, ack='durable', ack_timeout=10.0):
+        if ack not in ('durable', 'queued'):
+            raise ValueError(f'Unknown ack mode: {ack}')
+        self.engine = engine
+        self.orders_table = orders_table
+        self.lines_table = lines_table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self.ack = ack
+        self.ack_timeout = ack_timeout
+        self.commits = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = {}
+        self._failed = OrderedDict()
+        self._state_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    # ------------------------------------------------------------ producers
+    def start(self):
+        """Start the writer thread once; safe to call from every request."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='order-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, order, lines):
+        """
+        Queue an order for writing.
+        
+        Args:
+            order: dict of order column values, including its 'id'
+            lines: list of dicts of order line column values (without order_id)
+        
+        Raises:
+            OrderQueueFull: The queue stayed full for submit_timeout seconds
+            OrderWriteFailed: ack='durable' and the order could not be committed
+            OrderAckTimeout: ack='durable' and the order was not committed
+                within ack_timeout seconds
+        """
+        self.start()
+        pending = _Pending(order, lines)
+        with self._state_lock:
+            self._pending[order['id']] = pending
+        try:
+            self._queue.put(pending, timeout=self.submit_timeout)
+        except queue.Full:
+            with self._state_lock:
+                self._pending.pop(order['id'], None)
+            raise OrderQueueFull('Too many orders in flight, please retry.')
+
+        if self.ack == 'durable':
+            self._wait(pending)
+            if pending.error is not None:
+                raise OrderWriteFailed(str(pending.error))
+
+    def _wait(self, pending):
+        """Wait for a durable order's commit, or raise OrderAckTimeout."""
+        deadline = time.monotonic() + self.ack_timeout
+        while not pending.done.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._state_lock:
+                    if pending.done.is_set():
+                        return
+                    if not pending.taken:
+                        pending.withdrawn = True
+                        self._pending.pop(pending.order['id'], None)
+                        raise OrderAckTimeout('Your order was not saved in time, please retry.', True)
+                raise OrderAckTimeout('Your order is still being saved; check its status before retrying.', False)
+            if not pending.done.wait(min(remaining, 0.5)):
+                # A writer thread that died would leave the order queued forever.
+                self.start()
+
+    def status(self, order_id):
+        """
+        Return 'pending' or 'failed' for orders the writer still knows about,
+        or None if the caller should look the order up in the database.
+        """
+        with self._state_lock:
+            if order_id in self._pending:
+                return 'pending'
+            if order_id in self._failed:
+                return 'failed'
+        return None
+
+    def stop(self, timeout=5.0):
+        """Flush everything already queued and stop the writer thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    # -------------------------------------------------------------- writer
+    def _collect(self):
+        """Block for the first order, then gather more until the interval ends."""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        with self._state_lock:
+            batch = [pending for pending in batch if not pending.withdrawn]
+            for pending in batch:
+                pending.taken = True
+        return batch
+
+    def _write(self, batch):
+        orders = [pending.order for pending in batch]
+        lines = [
+            dict(line, order_id=pending.order['id'])
+            for pending in batch for line in pending.lines
+        ]
+        with self.engine.begin() as connection:
+            connection.execute(self.orders_table.insert(), orders)
+            if lines:
+                connection.execute(self.lines_table.insert(), lines)
+
+    def _finish(self, batch, error=None):
+        with self._state_lock:
+            for pending in batch:
+                order_id = pending.order['id']
+                self._pending.pop(order_id, None)
+                if error is not None:
+                    self._failed[order_id] = str(error)
+                    # Remember recent failures only; old ids fall back to 'unknown'.
+                    while len(self._failed) > 10000:
+                        self._failed.popitem(last=False)
+        for pending in batch:
+            pending.error = error
+            pending.done.set()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception('Group commit of %d orders failed; retrying one by one', len(batch))
+                # Isolate the bad order(s) so one failure does not sink the batch.
+                for pending in batch:
+                    try:
+                        self._write([pending])
+                    except Exception as e:
+                        logger.exception('Order %s could not be written', pending.order['id'])
+                        self._finish([pending], error=e)
+                    else:
+                        self.commits += 1
+                        self.written += 1
+                        self._finish([pending])
+                continue
+            self.commits += 1
+            self.written += len(batch)
+            self._finish(batch)
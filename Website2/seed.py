@@ -1,4 +1,4 @@
-from app import app, db
+from app import create_app, db
 from app import MenuItem  # Adjust if MenuItem is in a different file/module
 
 def seed_menu():
@@ -19,6 +19,7 @@ def seed_menu():
     print("✅ Menu seeded successfully!")
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         seed_menu()
 
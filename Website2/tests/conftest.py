@@ -0,0 +1,44 @@
+"""
+Shared fixtures: a fresh app on a throwaway SQLite database.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, MenuItem  # noqa: E402
+from common import testing  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Return a factory that builds an app with extra config; its order writers are stopped afterwards."""
+    apps = []
+
+    def make(**config):
+        app = testing.build_app(create_app, db, tmp_path, **config)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        writer = app.extensions.get('order_writer')
+        if writer is not None:
+            writer.stop()
+        testing.dispose_app(app, db)
+
+
+def add_item(app, description='Soup', cost=4.5):
+    """Add a menu item and return its id."""
+    with app.app_context():
+        item = MenuItem(type='Starters', description=description, cost=cost)
+        db.session.add(item)
+        db.session.commit()
+        return item.id
+
+
+def statements(app):
+    """Collect the SQL statements this thread runs (not the order writer's)."""
+    return testing.statements(app, db)
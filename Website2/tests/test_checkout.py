@@ -0,0 +1,40 @@
+"""Checkout input validation and pricing."""
+import pytest
+
+from conftest import add_item, statements
+
+
+@pytest.mark.parametrize('quantity', ['abc', '', '0', '-2', '1.5', '100'])
+def test_invalid_quantity_is_rejected(make_app, quantity):
+    app = make_app()
+    item_id = add_item(app)
+    response = app.test_client().post('/checkout', data={
+        'selected_items': [str(item_id)],
+        f'quantity_{item_id}': quantity,
+    })
+    assert response.status_code == 400
+
+
+def test_missing_quantity_defaults_to_one(make_app):
+    app = make_app()
+    item_id = add_item(app, cost=4.5)
+    response = app.test_client().post('/checkout', data={'selected_items': [str(item_id)]})
+    assert response.status_code == 200
+    assert 'is confirmed' in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('ack', ['durable', 'queued'])
+def test_checkout_prices_orders_without_sql(make_app, ack):
+    app = make_app(ORDER_ACK=ack, MENU_VERSION_CHECK_INTERVAL=60)
+    item_id = add_item(app, cost=4.5)
+    client = app.test_client()
+    client.get('/')
+
+    # Only the order writer's thread touches the database.
+    with statements(app) as executed:
+        response = client.post('/checkout', data={
+            'selected_items': [str(item_id)],
+            f'quantity_{item_id}': '2',
+        })
+    assert response.status_code == 200
+    assert executed == []
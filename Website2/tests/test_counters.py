@@ -0,0 +1,42 @@
+"""Category counts and the shared menu version, kept by upserts."""
+from sqlalchemy import select
+
+from app import db, Category, MenuItem, MenuVersion
+from conftest import add_item, statements
+
+
+def counts(app):
+    with app.app_context():
+        categories = dict(db.session.execute(select(Category.name, Category.item_count)).all())
+        return categories, db.session.scalar(select(MenuVersion.version))
+
+
+def test_counts_follow_inserts_moves_and_deletes(make_app):
+    app = make_app()
+    assert counts(app) == ({}, None)
+
+    soup = add_item(app, description='Soup')
+    add_item(app, description='Salad')
+    assert counts(app) == ({'Starters': 2}, 2)
+
+    with app.app_context():
+        db.session.get(MenuItem, soup).type = 'Mains'
+        db.session.commit()
+    assert counts(app) == ({'Starters': 1, 'Mains': 1}, 3)
+
+    with app.app_context():
+        db.session.delete(db.session.get(MenuItem, soup))
+        db.session.commit()
+    assert counts(app) == ({'Starters': 1, 'Mains': 0}, 4)
+
+
+def test_new_category_and_version_are_one_upsert_each(make_app):
+    # A single INSERT ... ON CONFLICT cannot race another worker's first
+    # insert the way UPDATE-then-INSERT did.
+    app = make_app()
+    for description in ('Soup', 'Salad'):
+        with statements(app) as executed:
+            add_item(app, description=description)
+        counters = [s for s in executed if s.startswith(('UPDATE', 'INSERT INTO category', 'INSERT INTO menu_version'))]
+        assert len(counters) == 2
+        assert all('ON CONFLICT' in s for s in counters)
@@ -0,0 +1,32 @@
+"""The menu cache across requests and worker processes."""
+import time
+
+from conftest import add_item, statements
+
+
+def test_conditional_get_runs_no_sql(make_app):
+    app = make_app(MENU_VERSION_CHECK_INTERVAL=60)
+    add_item(app)
+    client = app.test_client()
+    etag = client.get('/').headers['ETag']
+
+    with statements(app) as executed:
+        response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert executed == []
+
+
+def test_other_workers_see_a_menu_change_within_the_check_interval(make_app):
+    # Two apps on one database stand in for two server workers.
+    writer, reader = make_app(MENU_VERSION_CHECK_INTERVAL=0.2), make_app(MENU_VERSION_CHECK_INTERVAL=0.2)
+    item_id = add_item(writer, description='Soup')
+    client = reader.test_client()
+    time.sleep(0.25)
+    assert 'Soup' in client.get('/').get_data(as_text=True)
+
+    response = writer.test_client().post(f'/edit/{item_id}', data={
+        'type': 'Starters', 'description': 'Stew', 'cost': '5'
+    })
+    assert response.status_code == 302
+    time.sleep(0.25)
+    assert 'Stew' in client.get('/').get_data(as_text=True)
@@ -0,0 +1,196 @@
+"""The order writer's acknowledgement, back-pressure and failure handling."""
+import re
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db, Order, OrderLine, get_order_writer
+from conftest import add_item
+from orders import new_order_id
+
+
+def checkout(client, item_id, quantity=1):
+    return client.post('/checkout', data={
+        'selected_items': [str(item_id)],
+        f'quantity_{item_id}': str(quantity),
+    })
+
+
+def order_id_of(response):
+    return re.search(r'/orders/([0-9a-f]{32})', response.get_data(as_text=True)).group(1)
+
+
+def stored_order_ids(app):
+    with app.app_context():
+        return set(db.session.scalars(select(Order.id)))
+
+
+def hold_writes(writer, monkeypatch):
+    """Make the writer thread wait for the returned event before each write."""
+    release = threading.Event()
+    write = writer._write
+
+    def held_write(batch):
+        release.wait(5)
+        write(batch)
+
+    monkeypatch.setattr(writer, '_write', held_write)
+    return release
+
+
+def test_durable_ack_returns_after_the_batch_commits(make_app, monkeypatch):
+    app = make_app(ORDER_ACK='durable')
+    item_id = add_item(app)
+    with app.app_context():
+        writer = get_order_writer()
+    release = hold_writes(writer, monkeypatch)
+    responses = []
+    request = threading.Thread(target=lambda: responses.append(checkout(app.test_client(), item_id, 2)))
+    request.start()
+
+    request.join(0.3)
+    assert request.is_alive()
+    assert stored_order_ids(app) == set()
+
+    release.set()
+    request.join(5)
+    assert responses[0].status_code == 200
+    order_id = order_id_of(responses[0])
+    assert 'is confirmed' in responses[0].get_data(as_text=True)
+    assert stored_order_ids(app) == {order_id}
+
+
+def test_queued_ack_is_confirmed_by_polling(make_app):
+    app = make_app(ORDER_ACK='queued', ORDER_FLUSH_INTERVAL=0.2)
+    item_id = add_item(app, cost=3.25)
+    client = app.test_client()
+
+    response = checkout(client, item_id, 2)
+    assert response.status_code == 200
+    assert 'is pending' in response.get_data(as_text=True)
+    order_id = order_id_of(response)
+    assert client.get(f'/orders/{order_id}').json['status'] == 'pending'
+
+    deadline = time.monotonic() + 5
+    while True:
+        status = client.get(f'/orders/{order_id}').json
+        if status['status'] != 'pending' or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert status['status'] == 'confirmed'
+    assert status['total_cents'] == 650
+    assert [line['quantity'] for line in status['lines']] == [2]
+
+
+def test_unstored_order_from_another_worker_reads_pending_then_unknown(make_app):
+    app = make_app(ORDER_PENDING_WINDOW=0.2)
+    client = app.test_client()
+    order_id = new_order_id()
+
+    assert client.get(f'/orders/{order_id}').json['status'] == 'pending'
+    time.sleep(0.3)
+    response = client.get(f'/orders/{order_id}')
+    assert response.status_code == 404
+    assert response.json['status'] == 'unknown'
+
+
+def test_full_queue_returns_503_with_retry_after(make_app, monkeypatch):
+    app = make_app(ORDER_ACK='queued', ORDER_QUEUE_SIZE=1, ORDER_SUBMIT_TIMEOUT=0.05)
+    item_id = add_item(app)
+    with app.app_context():
+        writer = get_order_writer()
+    # Without a writer thread nothing leaves the queue.
+    monkeypatch.setattr(writer, 'start', lambda: None)
+    client = app.test_client()
+
+    assert checkout(client, item_id).status_code == 200
+    response = checkout(client, item_id)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_bad_order_does_not_sink_its_batch(make_app):
+    app = make_app(ORDER_ACK='queued', ORDER_FLUSH_INTERVAL=0.5)
+    item_id = add_item(app)
+    with app.app_context():
+        writer = get_order_writer()
+    good = [new_order_id() for _ in range(3)]
+    bad = new_order_id()
+    line = {'menu_item_id': item_id, 'description': 'Soup', 'unit_cents': 450, 'quantity': 1}
+
+    for order_id in good[:2] + [bad] + good[2:]:
+        # total_cents is NOT NULL, so the bad order fails the batch insert.
+        total = None if order_id == bad else 450
+        writer.submit({'id': order_id, 'total_cents': total, 'created_at': datetime.now()}, [line])
+
+    deadline = time.monotonic() + 5
+    while writer.status(bad) != 'failed' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert writer.status(bad) == 'failed'
+    assert stored_order_ids(app) == set(good)
+    # One failed group commit, then each order on its own.
+    assert writer.written == 3
+    assert writer.commits == 3
+    with app.app_context():
+        assert db.session.scalar(select(db.func.count()).select_from(OrderLine)) == 3
+
+
+def test_durable_ack_timeout_withdraws_an_unwritten_order(make_app, monkeypatch):
+    app = make_app(ORDER_ACK='durable', ORDER_ACK_TIMEOUT=0.2)
+    item_id = add_item(app)
+    with app.app_context():
+        writer = get_order_writer()
+    start = writer.start
+    # A stalled writer: nothing leaves the queue until it is started below.
+    monkeypatch.setattr(writer, 'start', lambda: None)
+
+    response = checkout(app.test_client(), item_id)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    # The withdrawn order is skipped once the writer runs again.
+    start()
+    writer.stop()
+    assert stored_order_ids(app) == set()
+    assert writer.written == 0
+
+
+def test_durable_ack_timeout_during_the_write_points_at_the_status(make_app, monkeypatch):
+    app = make_app(ORDER_ACK='durable', ORDER_ACK_TIMEOUT=0.2)
+    item_id = add_item(app)
+    with app.app_context():
+        writer = get_order_writer()
+    release = hold_writes(writer, monkeypatch)
+    client = app.test_client()
+
+    response = checkout(client, item_id)
+    assert response.status_code == 503
+    assert 'Retry-After' not in response.headers
+    status_url = response.headers['Location']
+    assert client.get(status_url).json['status'] == 'pending'
+
+    release.set()
+    writer.stop()
+    assert client.get(status_url).json['status'] == 'confirmed'
+
+
+def test_durable_submit_restarts_a_dead_writer_thread(make_app, monkeypatch):
+    app = make_app(ORDER_ACK='durable', ORDER_ACK_TIMEOUT=5)
+    item_id = add_item(app)
+    with app.app_context():
+        writer = get_order_writer()
+    start = writer.start
+    calls = []
+
+    def start_after_first_call():
+        # The first call stands in for a thread that died right after it.
+        calls.append(1)
+        if len(calls) > 1:
+            start()
+
+    monkeypatch.setattr(writer, 'start', start_after_first_call)
+    response = checkout(app.test_client(), item_id)
+    assert response.status_code == 200
+    assert stored_order_ids(app) == {order_id_of(response)}
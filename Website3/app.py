@@ -6,44 +6,198 @@ with different roles for administrators, teachers, and students.
 
 The system enables user authentication, role-based access control,
 and CRUD operations for users and timetables.
+
+create_app() builds the app; views, forms and models live at module
+level and are registered on each app it creates. Run the development
+server with `python app.py`, or several worker processes with serve.py.
 """
 
+import functools
+import json
+import os
+import sys
+import time
+import weakref
+from datetime import datetime, timedelta
+
+import click
 from flask import (
-    Flask, render_template, redirect, url_for, request, flash, session
+    Flask, Response, current_app, render_template, redirect, url_for, request, flash, session, abort,
+    jsonify, make_response, stream_with_context
 )
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, delete, func, insert, literal, select, update
+from sqlalchemy.orm import joinedload
 from flask_login import (
     LoginManager, login_user, logout_user, login_required, current_user
 )
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SelectMultipleField, SubmitField
-from wtforms.validators import DataRequired, Email, Length
+from wtforms.validators import DataRequired, Email, Length, ValidationError
+
+# The modules the three apps share live in ../common (see common/__init__.py).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import assets, dbconfig, export, metrics
 from config import Config
-from models import db, User, Timetable
+from models import (
+    db, User, Timetable, Enrollment, TimetableChange, DashboardStat, ScheduleJobRecord,
+    UserVersion, log_timetable_changes
+)
+from querycount import query_budget
+from usercache import CachedUser, UserCache
+from calendars import FeedCache
+from sync import ChangeNotifier
+from hashing import HashingBusy
+from slots import TimetableIndex
+from scheduler import Course, Problem, ScheduleJobs, dump_assignments, load_assignments
+import bulk
+import calendars
+import hashing
+import importer
+import migrations
+import querycount
+import slots
+import stats
+import sync
 
 # -------------App Configuration-------------
-app = Flask(__name__)
-app.config.from_object(Config)
-db.init_app(app)
+timetable_changes = ChangeNotifier()
+
+# (rule, view, options) for every view; create_app() registers them.
+ROUTES = []
+
+
+def route(rule, **options):
+    """Like app.route(), for the apps create_app() builds."""
+    def decorator(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return decorator
+
+
+# Apps create_app() has built, held weakly so discarded apps can be freed.
+_apps = weakref.WeakSet()
+
+
+def forget_schedule_jobs():
+    """Drop the scheduler runners a forked child inherited; their thread did not survive fork()."""
+    for app in list(_apps):
+        app.extensions.pop('schedule_jobs', None)
+
+
+if hasattr(os, 'register_at_fork'):
+    # Registered once for all apps; a child process starts its own runner on first use.
+    os.register_at_fork(after_in_child=forget_schedule_jobs)
+
+
+def create_app(config=None):
+    """
+    Build and configure the School Management app.
+    
+    Args:
+        config: Mapping of settings that override config.Config
+    
+    Returns:
+        Flask application
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(config or {})
+    dbconfig.configure(app, 'sqlite:///timetable.db')
+    db.init_app(app)
+    dbconfig.init_app(app, db)
+    metrics.init_app(app, db)
+    assets.init_app(app)
+    querycount.init_app(app, db)
+    hashing.init_app(app)
+    login_manager.init_app(app)
+    app.extensions['user_cache'] = UserCache(
+        maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL']
+    )
+    app.extensions['feed_cache'] = FeedCache(maxsize=app.config['CALENDAR_CACHE_SIZE'])
+    for rule, view, options in ROUTES:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.register_error_handler(HashingBusy, hashing_busy)
+    for command in (prune_timetable_changes_command, migrate_enrollments_command,
+                    backfill_time_slots_command, recompute_stats_command):
+        app.cli.add_command(command)
+    _apps.add(app)
+    return app
+
+
+def warmup(app):
+    """
+    Open a database connection and load the timetable index once, so a
+    new worker's first clash checks do not pay for it (see serve.py).
+    
+    Args:
+        app: Application built by create_app()
+    """
+    with app.app_context():
+        len(get_timetable_index())
+        db.session.remove()
 
 
 # -------------Login Manager Setup----------
-login_manager = LoginManager(app)
+login_manager = LoginManager()
 login_manager.login_view = 'login'
 
 
+def load_user_record(user_id):
+    """
+    Load the identity fields of a user for the user cache.
+    
+    Args:
+        user_id: The user ID to load from the database
+    
+    Returns:
+        CachedUser if found, None otherwise
+    """
+    user = db.session.get(User, user_id)
+    return CachedUser.from_user(user) if user is not None else None
+
+
 @login_manager.user_loader
 def load_user(user_id):
     """
     Flask-Login user loader function.
     
+    Served from the in-process user cache, so most authenticated requests
+    do not touch the database to resolve current_user; at most one per
+    USER_CACHE_CHECK_INTERVAL reads the shared user version.
+    
     Args:
-        user_id: The user ID to load from the database
+        user_id: The user ID to load
     
     Returns:
-        User object if found, None otherwise
+        CachedUser if found, None otherwise
     """
-    return User.query.get(int(user_id))
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    cache = current_app.extensions['user_cache']
+    # Other workers' user edits and deletions show up through the shared version.
+    if cache.check_due(current_app.config['USER_CACHE_CHECK_INTERVAL']):
+        cache.sync(db.session.scalar(select(UserVersion.version)) or 0)
+    return cache.get(user_id, load_user_record)
+
+
+def hashing_busy(error):
+    """
+    Shed load when the password hashing pool is saturated.
+    
+    Args:
+        error: The HashingBusy exception
+    
+    Returns:
+        503 response asking the client to retry shortly
+    """
+    response = make_response(str(error), 503)
+    response.headers['Retry-After'] = '1'
+    return response
 
 
 # -------------Form Classes----------------
@@ -84,10 +238,105 @@ class TimetableForm(FlaskForm):
     time = StringField('Time', validators=[DataRequired()])
     teacher = SelectMultipleField('Assigned Teacher(s)', coerce=int)
     submit = SubmitField('Save')
+    
+    def validate_day(self, field):
+        """Require a day of the week the slot parser understands."""
+        try:
+            slots.parse_day(field.data)
+        except ValueError:
+            raise ValidationError('Enter a day of the week, e.g. Monday.')
+    
+    def validate_time(self, field):
+        """Require a start time or a start - end range."""
+        try:
+            slots.parse_times(field.data)
+        except ValueError:
+            raise ValidationError('Enter a time such as 10:00 AM or 10:00 AM - 11:30 AM.')
+
+
+def get_timetable_index():
+    """
+    Return the app's TimetableIndex, loading it on first use.
+    
+    Returns:
+        TimetableIndex of every timetable entry with a parsed slot
+    """
+    index = current_app.extensions.get('timetable_index')
+    if index is None:
+        def load_rows():
+            return db.session.execute(
+                select(
+                    Timetable.id, Timetable.user_id, Timetable.weekday,
+                    Timetable.start_minute, Timetable.end_minute
+                ).where(Timetable.weekday.is_not(None), Timetable.user_id.is_not(None))
+            ).all()
+        index = current_app.extensions.setdefault('timetable_index', TimetableIndex(
+            load_rows, ttl=current_app.config['TIMETABLE_INDEX_TTL']
+        ))
+    return index
+
+
+def find_clashes(teacher_ids, slot, exclude=None):
+    """
+    Describe existing classes of the given teachers that overlap a slot.
+    
+    Candidates come from the in-memory interval index and are re-read
+    from the database, so an index entry made stale by another process
+    never produces a false clash.
+    
+    Args:
+        teacher_ids: Teachers to check
+        slot: Proposed Slot
+        exclude: Timetable id to ignore (the entry being edited)
+    
+    Returns:
+        list: One message per clashing entry, empty if there are none
+    """
+    index = get_timetable_index()
+    clash_ids = [
+        entry_id
+        for teacher_id in teacher_ids
+        for entry_id in index.clashes(teacher_id, slot, exclude=exclude)
+    ]
+    if not clash_ids:
+        return []
+    clashes = db.session.scalars(
+        select(Timetable).options(joinedload(Timetable.user))
+        .where(Timetable.id.in_(clash_ids)).order_by(Timetable.id)
+    )
+    return [
+        f"{entry.user.name} already teaches {entry.course_name} "
+        f"({slots.format_slot(entry.slot)})."
+        for entry in clashes
+        if slots.overlaps(entry.slot, slot)
+    ]
+
+
+def schedule_statement(user_id, role):
+    """
+    Build the query for a teacher's or student's classes in time order.
+    
+    Args:
+        user_id: Teacher or student id
+        role: 'teacher' (classes they teach) or 'student' (classes they
+            are enrolled in)
+    
+    Returns:
+        select() of Timetable entries
+    """
+    statement = select(Timetable)
+    if role == 'student':
+        # Read through the (student_id, timetable_id) enrollment index.
+        statement = statement.join(Enrollment, Enrollment.timetable_id == Timetable.id).where(
+            Enrollment.student_id == user_id
+        )
+    else:
+        statement = statement.where(Timetable.user_id == user_id)
+    return statement.order_by(Timetable.weekday, Timetable.start_minute, Timetable.id)
 
 
 # -------------Public Routes---------------
-@app.route('/')
+@route('/')
 def index():
     """
     Root route that redirects to login page.
@@ -98,7 +347,7 @@ def index():
     return redirect(url_for('login'))
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     """
     Handle user login and redirect based on user role.
@@ -112,6 +361,10 @@ def login():
         user = User.query.filter_by(email=email).first()
 
         if user and user.check_password(password):
+            # Transparently move old hashes to the configured cost parameters.
+            if user.needs_rehash():
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
 
             if user.role == 'admin':
@@ -130,7 +383,7 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/logout')
+@route('/logout')
 @login_required
 def logout():
     """
@@ -143,7 +396,7 @@ def logout():
     return redirect(url_for('login'))
 
 
-@app.route('/student/register', methods=['GET', 'POST'])
+@route('/student/register', methods=['GET', 'POST'])
 def register_student():
     """
     Handle student registration process.
@@ -159,18 +412,20 @@ def register_student():
         student = User(name=form.name.data, email=form.email.data, role='student')
         student.set_password(form.password.data)
         db.session.add(student)
+        db.session.flush()
+
+        # Enroll in every class of the chosen teachers with one INSERT ... SELECT.
+        if form.courses.data:
+            classes = select(Timetable.id).where(Timetable.user_id.in_(form.courses.data))
+            db.session.execute(insert(Enrollment).from_select(
+                ['student_id', 'timetable_id'],
+                select(literal(student.id), Timetable.id)
+                .where(Timetable.user_id.in_(form.courses.data))
+            ))
+            log_timetable_changes(db.session, classes, student_id=student.id)
+            stats.count_enrollments(db.session, Enrollment.student_id == student.id, 1)
         db.session.commit()
-
-        for teacher_id in form.courses.data:
-            teacher_courses = Timetable.query.filter_by(user_id=teacher_id).all()
-            for tc in teacher_courses:
-                db.session.add(Timetable(
-                    course_name=tc.course_name,
-                    day=tc.day,
-                    time=tc.time,
-                    user_id=student.id
-                ))
-        db.session.commit()
+        timetable_changes.notify()
 
         flash('Registration successful. You can now log in.')
         return redirect(url_for('login'))
@@ -179,11 +434,20 @@ def register_student():
 
 
 # -------------Role-Specific Dashboard Routes---------------
-@app.route('/admin/dashboard')
+@route('/admin/dashboard')
 @login_required
+@query_budget(8)
 def admin_dashboard():
     """
-    Admin dashboard showing all users and timetables.
+    Admin dashboard showing users and timetables, one page of each.
+    
+    The summary counts come from the dashboard_stat table (see stats.py),
+    so they cost two small queries however many rows are counted.
+    
+    Teachers, students and timetable entries are paginated independently
+    (?teachers_page=, ?students_page=, ?timetables_page=, ?per_page=).
+    Timetable entries are loaded with their user in the same query, so
+    rendering entry.user never triggers a lazy load per row.
     
     Returns:
         Rendered admin dashboard template or redirect if unauthorized
@@ -192,19 +456,42 @@ def admin_dashboard():
         flash('Unauthorized access')
         return redirect(url_for('login'))
 
-    teachers = User.query.filter_by(role='teacher').all()
-    students = User.query.filter_by(role='student').all()
-    timetables = Timetable.query.all()
+    per_page = request.args.get('per_page', current_app.config['DASHBOARD_PER_PAGE'], type=int)
+    max_per_page = current_app.config['DASHBOARD_MAX_PER_PAGE']
+
+    def page_of(statement, arg):
+        return db.paginate(
+            statement,
+            page=request.args.get(arg, 1, type=int),
+            per_page=per_page,
+            max_per_page=max_per_page,
+            error_out=False
+        )
+
+    teachers_page = page_of(
+        select(User).filter_by(role='teacher').order_by(User.id), 'teachers_page'
+    )
+    students_page = page_of(
+        select(User).filter_by(role='student').order_by(User.id), 'students_page'
+    )
+    timetables_page = page_of(
+        select(Timetable).options(joinedload(Timetable.user)).order_by(Timetable.id),
+        'timetables_page'
+    )
 
     return render_template(
         'admin_dashboard.html',
-        teachers=teachers,
-        students=students,
-        timetables=timetables
+        teachers=teachers_page.items,
+        students=students_page.items,
+        timetables=timetables_page.items,
+        teachers_page=teachers_page,
+        students_page=students_page,
+        timetables_page=timetables_page,
+        stats=stats.load(db.session)
     )
 
 
-@app.route('/teacher/dashboard')
+@route('/teacher/dashboard')
 @login_required
 def teacher_dashboard():
     """
@@ -216,15 +503,18 @@ def teacher_dashboard():
     if current_user.role != 'teacher':
         flash('Unauthorized access')
         return redirect(url_for('login'))
-    timetable = Timetable.query.filter_by(user_id=current_user.id).all()
+    timetable = db.session.scalars(schedule_statement(current_user.id, 'teacher')).all()
     return render_template('dashboard.html', timetable=timetable)
 
 
-@app.route('/student/dashboard')
+@route('/student/dashboard')
 @login_required
 def student_dashboard():
     """
-    Student dashboard showing their course timetables.
+    Student dashboard showing the classes they are enrolled in.
+    
+    Served by a single join from the student's enrollments (read through
+    the (student_id, timetable_id) index) to the timetable entries.
     
     Returns:
         Rendered dashboard template or redirect if unauthorized
@@ -232,12 +522,12 @@ def student_dashboard():
     if current_user.role != 'student':
         flash('Unauthorized access')
         return redirect(url_for('login'))
-    timetable = Timetable.query.filter_by(user_id=current_user.id).all()
+    timetable = db.session.scalars(schedule_statement(current_user.id, 'student')).all()
     return render_template('dashboard.html', timetable=timetable)
 
 
 # ---------------Admin User Management Routes-------------------------
-@app.route('/admin/user/create/<role>', methods=['GET', 'POST'])
+@route('/admin/user/create/<role>', methods=['GET', 'POST'])
 @login_required
 def create_user(role):
     """
@@ -272,7 +562,7 @@ def create_user(role):
     )
 
 
-@app.route('/admin/user/edit/<int:user_id>', methods=['GET', 'POST'])
+@route('/admin/user/edit/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 def edit_user(user_id):
     """
@@ -297,6 +587,7 @@ def edit_user(user_id):
         if form.password.data:
             user.set_password(form.password.data)
         db.session.commit()
+        current_app.extensions['user_cache'].invalidate(user.id)
         flash('User updated successfully.')
         return redirect(url_for('admin_dashboard'))
 
@@ -305,12 +596,15 @@ def edit_user(user_id):
     )
 
 
-@app.route('/admin/user/delete/<int:user_id>')
+@route('/admin/user/delete/<int:user_id>')
 @login_required
 def delete_user(user_id):
     """
     Admin route to delete a user.
     
+    A teacher's classes are deleted with them, and so are their own
+    enrollments and their students' enrollments in those classes.
+    
     Args:
         user_id: ID of the user to delete
     
@@ -327,14 +621,15 @@ def delete_user(user_id):
         flash('Cannot delete an admin.')
         return redirect(url_for('admin_dashboard'))
 
-    db.session.delete(user)
+    user_ids, timetable_ids = bulk.delete_users(db.session, [user.id])
     db.session.commit()
+    forget_deleted(user_ids, timetable_ids)
     flash('User deleted successfully.')
     return redirect(url_for('admin_dashboard'))
 
 
 # --------------Admin Timetable Management Routes-------------------------
-@app.route('/admin/timetable/create', methods=['GET', 'POST'])
+@route('/admin/timetable/create', methods=['GET', 'POST'])
 @login_required
 def create_timetable():
     """
@@ -352,6 +647,14 @@ def create_timetable():
     form.teacher.choices = [(t.id, t.name) for t in teachers]
 
     if form.validate_on_submit():
+        slot = slots.parse_slot(form.day.data, form.time.data)
+        clashes = find_clashes(form.teacher.data, slot)
+        if clashes:
+            for message in clashes:
+                flash(message)
+            return render_template('timetable_form.html', form=form, action="Create")
+
+        new_entries = []
         for teacher_id in form.teacher.data:
             new_entry = Timetable(
                 course_name=form.course_name.data,
@@ -360,14 +663,20 @@ def create_timetable():
                 user_id=teacher_id
             )
             db.session.add(new_entry)
+            new_entries.append(new_entry)
+        db.session.flush()
+        log_timetable_changes(db.session, [new_entry.id for new_entry in new_entries])
         db.session.commit()
+        timetable_changes.notify()
+        for new_entry in new_entries:
+            get_timetable_index().update(new_entry.id, new_entry.user_id, new_entry.slot)
         flash('Timetable created successfully.')
         return redirect(url_for('admin_dashboard'))
 
     return render_template('timetable_form.html', form=form, action="Create")
 
 
-@app.route('/admin/timetable/edit/<int:timetable_id>', methods=['GET', 'POST'])
+@route('/admin/timetable/edit/<int:timetable_id>', methods=['GET', 'POST'])
 @login_required
 def edit_timetable(timetable_id):
     """
@@ -388,10 +697,21 @@ def edit_timetable(timetable_id):
     form.teacher.choices = [(entry.user.id, entry.user.name)]
 
     if form.validate_on_submit():
+        slot = slots.parse_slot(form.day.data, form.time.data)
+        clashes = find_clashes([entry.user_id], slot, exclude=entry.id)
+        if clashes:
+            for message in clashes:
+                flash(message)
+            return render_template('timetable_form.html', form=form, action="Edit")
+
         entry.course_name = form.course_name.data
         entry.day = form.day.data
         entry.time = form.time.data
+        db.session.flush()
+        log_timetable_changes(db.session, [entry.id])
         db.session.commit()
+        timetable_changes.notify()
+        get_timetable_index().update(entry.id, entry.user_id, entry.slot)
         flash('Timetable updated.')
         return redirect(url_for('admin_dashboard'))
 
@@ -400,7 +720,7 @@ def edit_timetable(timetable_id):
     return render_template('timetable_form.html', form=form, action="Edit")
 
 
-@app.route('/admin/timetable/delete/<int:timetable_id>')
+@route('/admin/timetable/delete/<int:timetable_id>')
 @login_required
 def delete_timetable(timetable_id):
     """
@@ -417,14 +737,756 @@ def delete_timetable(timetable_id):
         return redirect(url_for('login'))
 
     entry = Timetable.query.get_or_404(timetable_id)
-    db.session.delete(entry)
+    timetable_ids = bulk.delete_timetables(db.session, [entry.id])
     db.session.commit()
+    forget_deleted([], timetable_ids)
     flash('Timetable deleted.')
     return redirect(url_for('admin_dashboard'))
 
 
+@route('/admin/timetable/import', methods=['POST'])
+@login_required
+def import_timetable():
+    """
+    Admin route to bulk-load timetable entries from a CSV upload.
+    
+    The upload ("file") needs course_name, day, time and teacher_email
+    columns. Valid rows are inserted in batched transactions; rows that
+    are invalid or clash with a teacher's classes are skipped and listed
+    in the report, which is downloaded as CSV (or JSON with ?format=json).
+    
+    Returns:
+        Import report, 400 if the upload cannot be read, or redirect
+        if unauthorized
+    """
+    if current_user.role != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify(error='Upload a CSV file as "file".'), 400
+    try:
+        with db.engine.connect() as connection:
+            report = importer.import_timetables(
+                connection,
+                importer.read_csv(importer.text_stream(upload.stream)),
+                batch_size=current_app.config['TIMETABLE_IMPORT_BATCH_SIZE']
+            )
+    except importer.ImportFormatError as exc:
+        return jsonify(error=str(exc)), 400
+    finally:
+        get_timetable_index().clear()
+        timetable_changes.notify()
+
+    if request.args.get('format') == 'json':
+        return jsonify(report.to_dict())
+    response = make_response(report.to_csv())
+    response.headers['Content-Type'] = 'text/csv; charset=utf-8'
+    response.headers['Content-Disposition'] = 'attachment; filename=timetable-import-report.csv'
+    response.headers['X-Import-Rows'] = str(report.rows)
+    response.headers['X-Import-Inserted'] = str(report.inserted)
+    response.headers['X-Import-Rejected'] = str(report.invalid + report.clashes)
+    return response
+
+
+# --------------Admin Bulk Action Routes-------------------------
+def forget_deleted(user_ids, timetable_ids):
+    """
+    Drop deleted users and entries from the per-process caches after commit.
+    
+    Args:
+        user_ids: Ids of deleted users
+        timetable_ids: Ids of deleted timetable entries
+    """
+    index = get_timetable_index()
+    for entry_id in timetable_ids:
+        index.remove(entry_id)
+    for user_id in user_ids:
+        current_app.extensions['user_cache'].invalidate(user_id)
+    timetable_changes.notify()
+
+
+def bulk_request():
+    """
+    Read the JSON body of a bulk action request.
+    
+    Returns:
+        tuple: (action, list of int ids, the whole body)
+    
+    Raises:
+        ValueError: If the body is not a JSON object with an action and ids
+    """
+    spec = request.get_json(silent=True) if request.is_json else None
+    if not isinstance(spec, dict):
+        raise ValueError('Send a JSON object with "action" and "ids".')
+    try:
+        ids = [int(value) for value in spec.get('ids') or []]
+    except (TypeError, ValueError):
+        raise ValueError('"ids" must be a list of ids.')
+    if not ids:
+        raise ValueError('Select at least one id.')
+    if len(ids) > current_app.config['BULK_MAX_IDS']:
+        raise ValueError(f"Select at most {current_app.config['BULK_MAX_IDS']} ids per request.")
+    return spec.get('action'), ids, spec
+
+
+@route('/admin/users/bulk', methods=['POST'])
+@login_required
+def bulk_users():
+    """
+    Admin route to act on many users at once in one transaction.
+    
+    Expects {"action": "delete", "ids": [...]}. Deleting users deletes
+    the classes they teach and all related enrollments; admins in the
+    selection are skipped.
+    
+    Returns:
+        JSON with the affected ids, 400 for invalid requests, or redirect
+        if unauthorized
+    """
+    if current_user.role != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+    try:
+        action, ids, _ = bulk_request()
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    if action != 'delete':
+        return jsonify(error='Unknown action; use "delete".'), 400
+
+    user_ids, timetable_ids = bulk.delete_users(db.session, ids)
+    db.session.commit()
+    forget_deleted(user_ids, timetable_ids)
+    return jsonify(action=action, users=user_ids, timetables=timetable_ids)
+
+
+@route('/admin/timetable/bulk', methods=['POST'])
+@login_required
+def bulk_timetables():
+    """
+    Admin route to act on many timetable entries at once in one transaction.
+    
+    Expects {"action": ..., "ids": [...]} with one of the actions:
+    "delete"; "reassign" with "teacher_id"; "move" with "day" and/or
+    "time". Reassigns and moves that would double-book a teacher are
+    refused as a whole.
+    
+    Returns:
+        JSON with the affected ids, 400 for invalid requests, 409 with
+        the clashes, or redirect if unauthorized
+    """
+    if current_user.role != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+    try:
+        action, ids, spec = bulk_request()
+        if action == 'delete':
+            timetable_ids = bulk.delete_timetables(db.session, ids)
+        elif action == 'reassign':
+            moved = bulk.reassign_timetables(db.session, ids, int(spec.get('teacher_id')))
+        elif action == 'move':
+            moved = bulk.move_timetables(db.session, ids, spec.get('day'), spec.get('time'))
+        else:
+            return jsonify(error='Unknown action; use "delete", "reassign" or "move".'), 400
+    except bulk.ClashError as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc), clashes=exc.clashes), 409
+    except (TypeError, ValueError) as exc:
+        db.session.rollback()
+        return jsonify(error=str(exc)), 400
+    db.session.commit()
+
+    if action == 'delete':
+        forget_deleted([], timetable_ids)
+        return jsonify(action=action, timetables=timetable_ids)
+    index = get_timetable_index()
+    for entry in moved:
+        index.update(entry.id, entry.user_id, entry.slot)
+    timetable_changes.notify()
+    return jsonify(action=action, timetables=[entry.id for entry in moved])
+
+
+# --------------Admin Timetable Generation Routes-------------------------
+def build_schedule_problem(spec, replaces=()):
+    """
+    Validate a timetable generation request and build the scheduler Problem.
+    
+    Existing classes of the requested teachers are passed to the scheduler
+    as blocked time, so generated sessions never clash with them. Entries
+    an earlier job wrote are left out when re-solving from that job, since
+    the new schedule replaces them.
+    
+    Args:
+        spec: Decoded JSON request body
+        replaces: Ids of the entries the new schedule replaces
+    
+    Returns:
+        Problem ready for scheduler.solve()
+    
+    Raises:
+        ValueError: If the request is malformed or names unknown teachers
+    """
+    courses = []
+    for number, item in enumerate(spec.get('courses') or [], start=1):
+        try:
+            course_name = str(item['course_name']).strip()
+            teacher_id = int(item['teacher_id'])
+            sessions = int(item.get('sessions', 1))
+            duration = int(item.get('duration', slots.DEFAULT_DURATION))
+            groups = tuple(str(group) for group in item.get('groups') or ())
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ValueError(f'Course {number}: course_name and teacher_id are required.')
+        if not course_name or sessions < 1 or duration < 1:
+            raise ValueError(f'Course {number}: needs a name, sessions >= 1 and duration >= 1.')
+        courses.append(Course(
+            f'{teacher_id}:{course_name}', course_name, teacher_id, sessions, duration, groups
+        ))
+    if not courses:
+        raise ValueError('Give at least one course.')
+    if len({course.key for course in courses}) != len(courses):
+        raise ValueError('Each teacher can appear with a course name only once.')
+
+    teacher_ids = {course.teacher_id for course in courses}
+    known = set(db.session.scalars(
+        select(User.id).where(User.id.in_(teacher_ids), User.role == 'teacher')
+    ))
+    if teacher_ids - known:
+        raise ValueError(f'Unknown teacher id(s): {sorted(teacher_ids - known)}')
+
+    days = tuple(sorted({slots.parse_day(day) for day in spec.get('days') or slots.DAYS[:5]}))
+    day_start = slots.parse_time(spec.get('day_start', '08:00 AM'))
+    day_end = slots.parse_time(spec.get('day_end', '05:00 PM'))
+    try:
+        step = int(spec.get('step', 30))
+        max_per_day = spec.get('max_per_day')
+        max_per_day = None if max_per_day is None else int(max_per_day)
+    except (TypeError, ValueError):
+        raise ValueError('step and max_per_day must be whole numbers.')
+    if step < 5 or day_end - day_start < step:
+        raise ValueError('The day must be at least one step long, and step at least 5 minutes.')
+    cells = (day_end - day_start) // step
+    if max_per_day is not None and max_per_day < 1:
+        raise ValueError('max_per_day must be at least 1.')
+    # No teacher can teach more sessions a day than there are steps in it.
+    max_per_day = cells if max_per_day is None else min(max_per_day, cells)
+
+    blocked = [
+        (user_id, slots.Slot(weekday, start, end))
+        for user_id, weekday, start, end in db.session.execute(
+            select(Timetable.user_id, Timetable.weekday, Timetable.start_minute, Timetable.end_minute)
+            .where(
+                Timetable.user_id.in_(teacher_ids),
+                Timetable.weekday.is_not(None),
+                Timetable.id.not_in(list(replaces))
+            )
+        )
+    ]
+    for item in spec.get('unavailable') or []:
+        try:
+            teacher_id = int(item['teacher_id'])
+            blocked.append((teacher_id, slots.parse_slot(item['day'], item['time'])))
+        except (AttributeError, KeyError, TypeError):
+            raise ValueError('Unavailable times need teacher_id, day and time.')
+
+    return Problem(courses, blocked, days, day_start, day_end, step, max_per_day)
+
+
+def write_schedule(app, problem, schedule, replaces):
+    """
+    Store a finished schedule as Timetable entries.
+    
+    Runs in the scheduler's job thread. Classes created while the job was
+    solving are re-read first, and sessions that now clash with them are
+    rejected rather than double-booking a teacher.
+    
+    When re-solving, the entries the previous job wrote are replaced
+    rather than added to: a session that still has its entry moves it
+    (keeping its enrollments), new sessions are inserted in one bulk
+    insert, and entries of sessions that are no longer placed are
+    deleted. Every change is logged for calendar sync.
+    
+    Args:
+        app: Application whose database receives the entries
+        problem: Problem that was solved
+        schedule: Schedule returned by the solver
+        replaces: Mapping of session key to the entry id the previous job
+            wrote for it
+    
+    Returns:
+        tuple: (entries written, rejected session keys, entry ids by
+        session key)
+    """
+    courses = {course.key: course for course in problem.courses}
+    teacher_ids = {course.teacher_id for course in problem.courses}
+    table = Timetable.__table__
+    with app.app_context():
+        with db.engine.begin() as connection:
+            # Entries of the previous job that nobody deleted meanwhile.
+            existing = set(connection.scalars(
+                select(table.c.id).where(table.c.id.in_(list(replaces.values())))
+            )) if replaces else set()
+            reusable = {session: entry_id for session, entry_id in replaces.items() if entry_id in existing}
+
+            current = slots.IntervalIndex()
+            for entry_id, user_id, weekday, start, end in connection.execute(
+                select(table.c.id, table.c.user_id, table.c.weekday, table.c.start_minute, table.c.end_minute)
+                .where(table.c.user_id.in_(teacher_ids), table.c.weekday.is_not(None))
+            ):
+                if entry_id not in existing:
+                    current.add((user_id, weekday), start, end, entry_id)
+
+            rows, moves, rejected, entries = [], [], [], {}
+            for session, slot in sorted(schedule.assignments.items()):
+                course = courses[session[0]]
+                if current.overlaps((course.teacher_id, slot.weekday), slot.start, slot.end):
+                    rejected.append(session)
+                    continue
+                values = {
+                    'course_name': course.course_name,
+                    'day': slots.DAYS[slot.weekday],
+                    'time': f"{slots.format_minutes(slot.start)} - {slots.format_minutes(slot.end)}",
+                    'weekday': slot.weekday,
+                    'start_minute': slot.start,
+                    'end_minute': slot.end,
+                    'user_id': course.teacher_id,
+                }
+                entry_id = reusable.pop(session, None)
+                if entry_id is None:
+                    rows.append((session, values))
+                else:
+                    entries[session] = entry_id
+                    moves.append(dict(values, entry_id=entry_id))
+
+            # Rejected and unplaced sessions lose their old entries too.
+            stale = list(reusable.values())
+            if stale:
+                stale_entries = Timetable.id.in_(stale)
+                log_timetable_changes(connection, stale)
+                stats.count_enrollments(connection, Enrollment.timetable_id.in_(stale), -1)
+                stats.count_entries(connection, stale_entries, -1)
+                connection.execute(delete(Enrollment).where(Enrollment.timetable_id.in_(stale)))
+                connection.execute(delete(Timetable).where(stale_entries))
+            if moves:
+                moved = [move['entry_id'] for move in moves]
+                stats.count_entries(connection, Timetable.id.in_(moved), -1, kinds=(stats.DAY,))
+                connection.execute(
+                    update(table).where(table.c.id == bindparam('entry_id')),
+                    moves
+                )
+                stats.count_entries(connection, Timetable.id.in_(moved), 1, kinds=(stats.DAY,))
+                log_timetable_changes(connection, moved)
+            if rows:
+                new_ids = connection.execute(
+                    table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                    [values for _, values in rows]
+                ).scalars().all()
+                entries.update(zip((session for session, _ in rows), new_ids))
+                log_timetable_changes(connection, new_ids)
+                stats.count_new_entries(connection, [values for _, values in rows])
+        get_timetable_index().clear()
+        timetable_changes.notify()
+    return len(rows) + len(moves), rejected, entries
+
+
+def record_schedule_job(app, job):
+    """
+    Copy a job's state to its ScheduleJobRecord row.
+    
+    Called by the scheduler on every state change, so any server worker
+    can report the job and re-solve from its result.
+    
+    Args:
+        app: Application whose database holds the records
+        job: ScheduleJob that changed state
+    """
+    table = ScheduleJobRecord.__table__
+    values = {'state': job.state, 'status': json.dumps(job.to_dict())}
+    if job.schedule is not None:
+        values['assignments'] = json.dumps(dump_assignments(job.schedule.assignments))
+    if job.state == 'done':
+        values['entries'] = json.dumps(
+            [[key, number, entry_id] for (key, number), entry_id in sorted(job.entries.items())]
+        )
+    with app.app_context():
+        with db.engine.begin() as connection:
+            updated = connection.execute(update(table).where(table.c.id == job.id).values(values))
+            if not updated.rowcount:
+                connection.execute(insert(table).values(id=job.id, **values))
+
+
+def get_schedule_jobs():
+    """
+    Return the app's ScheduleJobs runner, creating it on first use.
+    
+    Returns:
+        ScheduleJobs that writes results with write_schedule() and records
+        job states with record_schedule_job()
+    """
+    jobs = current_app.extensions.get('schedule_jobs')
+    if jobs is None:
+        app = current_app._get_current_object()
+        jobs = current_app.extensions.setdefault('schedule_jobs', ScheduleJobs(
+            functools.partial(write_schedule, app),
+            processes=current_app.config['SCHEDULER_PROCESSES'],
+            record=functools.partial(record_schedule_job, app)
+        ))
+    return jobs
+
+
+@route('/admin/timetable/generate', methods=['POST'])
+@login_required
+def generate_timetable():
+    """
+    Admin route to start an automatic timetable generation job.
+    
+    Expects a JSON body listing the courses to schedule, e.g.
+    {"courses": [{"course_name": "Math 101", "teacher_id": 2, "sessions": 3,
+    "duration": 60, "groups": ["Year 9"]}]}, plus optional "days",
+    "day_start", "day_end", "step", "max_per_day", "unavailable"
+    ([{"teacher_id", "day", "time"}]) and "time_budget" (seconds).
+    "previous_job" re-solves from an earlier job's result, and
+    "write": false runs the job without saving it.
+    
+    Returns:
+        202 with the job status, 400 for invalid requests, or redirect
+        if unauthorized
+    """
+    if current_user.role != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+
+    if not request.is_json:
+        return jsonify(error='Send the request as JSON.'), 400
+    spec = request.get_json(silent=True)
+    if not isinstance(spec, dict):
+        return jsonify(error='Send a JSON object.'), 400
+    jobs = get_schedule_jobs()
+    initial, replaces = None, {}
+    if spec.get('previous_job'):
+        previous = jobs.get(str(spec['previous_job']))
+        if previous is not None:
+            if previous.state == 'done':
+                initial, replaces = previous.schedule, previous.entries
+        else:
+            # The job may have run in another server worker.
+            record = db.session.get(ScheduleJobRecord, str(spec['previous_job']))
+            if record is not None and record.state == 'done':
+                initial = load_assignments(json.loads(record.assignments))
+                replaces = {
+                    (key, number): entry_id
+                    for key, number, entry_id in json.loads(record.entries or '[]')
+                }
+        if initial is None:
+            return jsonify(error='previous_job is unknown or has not finished.'), 400
+
+    try:
+        problem = build_schedule_problem(spec, replaces=replaces.values())
+        time_budget = min(
+            float(spec.get('time_budget', current_app.config['SCHEDULER_TIME_BUDGET'])),
+            current_app.config['SCHEDULER_MAX_TIME_BUDGET']
+        )
+    except (TypeError, ValueError) as exc:
+        return jsonify(error=str(exc)), 400
+
+    job = jobs.submit(
+        problem, time_budget, initial=initial, write=bool(spec.get('write', True)), replaces=replaces
+    )
+    return jsonify(job.to_dict()), 202, {'Location': url_for('timetable_job', job_id=job.id)}
+
+
+@route('/admin/timetable/generate/<job_id>')
+@login_required
+def timetable_job(job_id):
+    """
+    Admin route reporting the state of a timetable generation job.
+    
+    Args:
+        job_id: Id returned when the job was started
+    
+    Returns:
+        JSON job status, 404 if unknown, or redirect if unauthorized
+    """
+    if current_user.role != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+
+    job = get_schedule_jobs().get(job_id)
+    if job is not None:
+        return jsonify(job.to_dict())
+    # Jobs started by another server worker are known from their record.
+    record = db.session.get(ScheduleJobRecord, job_id)
+    if record is None:
+        abort(404)
+    return jsonify(json.loads(record.status))
+
+
+@route('/admin/stats')
+@login_required
+def dashboard_stats():
+    """
+    Admin route returning the dashboard counts as JSON.
+    
+    Returns:
+        JSON counts from stats.load() or redirect if unauthorized
+    """
+    if current_user.role != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+    return jsonify(stats.load(db.session))
+
+
+@route('/admin/user-cache')
+@login_required
+def user_cache_stats():
+    """
+    Admin route exposing the user cache hit/miss counters.
+    
+    Returns:
+        JSON cache statistics or redirect if unauthorized
+    """
+    if current_user.role != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+    extensions = current_app.extensions
+    return jsonify(extensions['user_cache'].stats() | {'calendar_feeds': extensions['feed_cache'].stats()})
+
+
+# --------------Timetable Sync Routes-------------------------
+@route('/api/timetable/changes')
+@login_required
+def timetable_changes_since():
+    """
+    Return the current user's timetable changes since a sync version.
+    
+    Clients keep the returned "version" and pass it back as ?since=.
+    Without one (or after the log was pruned past it) the response is
+    the whole timetable with "full": true.
+    
+    Returns:
+        JSON change set, or redirect if the user has no timetable
+    """
+    if current_user.role not in ('teacher', 'student'):
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+    since = request.args.get('since', 0, type=int)
+    return jsonify(sync.changes_since(
+        db.session, schedule_statement(current_user.id, current_user.role), current_user.id, since
+    ))
+
+
+@route('/api/timetable/stream')
+@login_required
+def timetable_change_stream():
+    """
+    Push the current user's timetable changes as server-sent events.
+    
+    Starts from ?since= or the Last-Event-ID header that EventSource
+    sends when it reconnects, and sends a "changes" event whenever the
+    timetable changes. Writes in this process wake the stream at once;
+    others are seen within SYNC_POLL_INTERVAL seconds. The stream ends
+    after SYNC_STREAM_LIFETIME seconds so it does not hold a worker
+    thread forever; EventSource reconnects and resumes from its last id.
+    
+    Returns:
+        text/event-stream response, or redirect if the user has no timetable
+    """
+    if current_user.role not in ('teacher', 'student'):
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+    user_id, role = current_user.id, current_user.role
+    since = request.args.get('since', type=int)
+    if since is None:
+        since = request.headers.get('Last-Event-ID', 0, type=int)
+    poll_interval = current_app.config['SYNC_POLL_INTERVAL']
+    keepalive = current_app.config['SYNC_KEEPALIVE']
+    lifetime = current_app.config['SYNC_STREAM_LIFETIME']
+
+    def generate():
+        version = since
+        started = last_sent = time.monotonic()
+        generation = timetable_changes.generation
+        yield f"retry: {int(poll_interval * 1000)}\n\n"
+        while time.monotonic() - started < lifetime:
+            payload = sync.changes_since(db.session, schedule_statement(user_id, role), user_id, version)
+            # Return the connection to the pool between polls.
+            db.session.close()
+            if payload['full'] or payload['changed'] or payload['deleted']:
+                yield sync.format_event(payload)
+                last_sent = time.monotonic()
+            version = payload['version']
+            if time.monotonic() - last_sent >= keepalive:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+            generation = timetable_changes.wait(generation, poll_interval)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@click.command('prune-timetable-changes')
+@with_appcontext
+@click.option('--days', default=30, show_default=True, help='Keep changes this many days old.')
+def prune_timetable_changes_command(days):
+    """Delete old timetable change-log rows; older clients reload in full."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    table = TimetableChange.__table__
+    with db.engine.begin() as connection:
+        # The newest row is always kept so versions never go backwards.
+        newest = connection.scalar(select(func.max(table.c.id))) or 0
+        removed = connection.execute(
+            delete(table).where(table.c.changed_at < cutoff, table.c.id < newest)
+        ).rowcount
+    print(f"✅ {removed} timetable changes older than {days} days removed.")
+
+
+# --------------Calendar Feed Routes-------------------------
+@route('/calendar')
+@login_required
+def calendar_link():
+    """
+    Give a teacher or student the subscription URL of their calendar feed.
+    
+    Returns:
+        JSON with the feed URL, or redirect if the user has no timetable
+    """
+    if current_user.role not in ('teacher', 'student'):
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+    token = calendars.feed_token(current_app.secret_key, current_user.id)
+    return jsonify(url=url_for('calendar_feed', token=token, _external=True))
+
+
+@route('/calendar/<token>.ics')
+def calendar_feed(token):
+    """
+    Serve a user's timetable as an iCalendar feed.
+    
+    No login is needed; the signed token in the URL names the user. The
+    ETag follows the user's timetable_version, so a client polling with
+    If-None-Match gets a 304 after one primary-key lookup, and a changed
+    feed is rendered once and then served from the feed cache.
+    
+    Args:
+        token: Signed token from calendar_link()
+    
+    Returns:
+        text/calendar response, 304 if unchanged, or 404
+    """
+    user_id = calendars.read_feed_token(current_app.secret_key, token)
+    if user_id is None:
+        abort(404)
+    user = db.session.execute(
+        select(User.name, User.role, User.timetable_version).where(User.id == user_id)
+    ).first()
+    if user is None or user.role not in ('teacher', 'student'):
+        abort(404)
+
+    version = user.timetable_version or 0
+    etag = calendars.feed_etag(user_id, version)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        feed = current_app.extensions['feed_cache'].get(user_id, version, lambda: calendars.render_calendar(
+            f"{user.name}'s timetable",
+            db.session.scalars(schedule_statement(user_id, user.role)),
+            calendars.parse_term_start(current_app.config['CALENDAR_TERM_START']),
+            request.host.split(':')[0]
+        ))
+        response = make_response(feed.body)
+        response.mimetype = 'text/calendar'
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['CALENDAR_MAX_AGE']
+    return response
+
+
+# --------------Admin Export Routes-------------------------
+EXPORTS = {
+    'users': select(
+        User.id, User.name, User.email, User.role
+    ).order_by(User.id),
+    'timetables': select(
+        Timetable.id,
+        Timetable.course_name,
+        Timetable.day,
+        Timetable.time,
+        Timetable.user_id,
+        User.name.label('user_name'),
+        User.email.label('user_email'),
+        User.role.label('user_role')
+    ).outerjoin(User, Timetable.user_id == User.id).order_by(Timetable.id),
+    'enrollments': select(
+        Enrollment.id, Enrollment.student_id, Enrollment.timetable_id
+    ).order_by(Enrollment.id),
+}
+
+
+@route('/admin/export/<dataset>.<fmt>')
+@login_required
+def export_data(dataset, fmt):
+    """
+    Admin route to stream users, timetables or enrollments as CSV or NDJSON.
+    
+    Args:
+        dataset: 'users', 'timetables' or 'enrollments'
+        fmt: Output format, 'csv' or 'ndjson'
+    
+    Returns:
+        Streaming download or redirect if unauthorized
+    """
+    if current_user.role != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+
+    if dataset not in EXPORTS or fmt not in export.FORMATS:
+        abort(404)
+    return export.stream_rows(db.session, EXPORTS[dataset], fmt, dataset)
+
+
+@click.command('migrate-enrollments')
+@with_appcontext
+def migrate_enrollments_command():
+    """Convert students' copied timetable rows into enrollments."""
+    db.create_all()
+    with db.engine.begin() as connection:
+        migrations.upgrade_schema(connection)
+        counts = migrations.migrate_student_timetables(connection)
+        stats.recompute(connection)
+    print(
+        f"✅ {counts['enrolled']} enrollments created, {counts['removed']} copied rows removed, "
+        f"{counts['kept']} unmatched rows kept."
+    )
+
+
+@click.command('backfill-time-slots')
+@with_appcontext
+def backfill_time_slots_command():
+    """Parse existing day/time text into the structured slot columns."""
+    db.create_all()
+    with db.engine.begin() as connection:
+        migrations.upgrade_schema(connection)
+        result = migrations.backfill_time_slots(connection)
+        stats.recompute(connection)
+    for entry_id, day, time_ in result['unparsed']:
+        print(f"  timetable {entry_id}: could not parse {day!r} / {time_!r}")
+    print(f"✅ {result['updated']} entries backfilled, {len(result['unparsed'])} left unparsed.")
+
+
+@click.command('recompute-stats')
+@with_appcontext
+def recompute_stats_command():
+    """Rebuild the admin dashboard counts from the user and timetable tables."""
+    db.create_all()
+    with db.engine.begin() as connection:
+        stats.recompute(connection)
+    print("✅ Dashboard statistics recomputed.")
+
+
 #-------------Initialization Route-------------------(Check the seed.py)
-@app.route('/init')
+@route('/init')
 def init_users():
     """
     Initialize the database with sample users and timetables.
@@ -456,6 +1518,13 @@ def init_users():
 # ------------Application Entry Point---------
 if __name__ == '__main__':
     """Application entry point for direct execution"""
+    app = create_app()
     with app.app_context():
         db.create_all()
+        with db.engine.begin() as connection:
+            migrations.upgrade_schema(connection)
+            backfilled = migrations.backfill_time_slots(connection)
+            # Fill the counters of a database that predates them.
+            if backfilled['updated'] or not connection.scalar(select(func.count()).select_from(DashboardStat)):
+                stats.recompute(connection)
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Login Throughput Benchmark
+
+Compares /login throughput with password hashing done inline in the
+request threads against the bounded process pool from hashing.py. Each
+mode drives the app through the Flask test client from --threads
+concurrent threads against a throwaway SQLite database.
+
+Usage:
+    python bench_login.py --threads 16 --requests 400
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+_tmp = tempfile.mkdtemp(prefix='bench_login_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+
+from app import create_app  # noqa: E402  (must follow DATABASE_URL)
+from models import db, User  # noqa: E402
+import hashing  # noqa: E402
+
+app = create_app({'WTF_CSRF_ENABLED': False})
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'benchpass'
+
+
+def run_mode(label, hasher, threads, requests):
+    """
+    Run `requests` logins spread over `threads` threads with `hasher`.
+    
+    Returns:
+        dict with label, throughput and latency percentiles
+    """
+    app.extensions[hashing.EXTENSION] = hasher
+    latencies = []
+    statuses = []
+    lock = threading.Lock()
+    per_thread = requests // threads
+
+    def worker():
+        client = app.test_client()
+        local = []
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            response = client.post('/login', data={'email': EMAIL, 'password': PASSWORD})
+            local.append((time.perf_counter() - started, response.status_code))
+        with lock:
+            latencies.extend(latency for latency, _ in local)
+            statuses.extend(status for _, status in local)
+
+    # Warm up (starts pool workers) before timing.
+    app.test_client().post('/login', data={'email': EMAIL, 'password': PASSWORD})
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    latencies.sort()
+    return {
+        'mode': label,
+        'logins': len(latencies),
+        'rejected (503)': statuses.count(503),
+        'logins/s': len(latencies) / elapsed,
+        'p50 ms': statistics.median(latencies) * 1000,
+        'p99 ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    """Parse arguments, run both modes and print a comparison table."""
+    parser = argparse.ArgumentParser(description="Benchmark /login with inline vs pooled hashing.")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=320)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='hashing pool size')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        user = User(name='Bench', email=EMAIL, role='student')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+
+    method = app.config['PASSWORD_HASH_METHOD']
+    results = [
+        run_mode('inline', hashing.PasswordHasher(method, workers=0, max_pending=args.threads),
+                 args.threads, args.requests),
+        run_mode(f'pool x{args.workers}', hashing.PasswordHasher(method, workers=args.workers),
+                 args.threads, args.requests),
+    ]
+
+    columns = list(results[0])
+    print('  '.join(f'{c:>14}' for c in columns))
+    for row in results:
+        print('  '.join(f'{v:>14.1f}' if isinstance(v, float) else f'{v:>14}' for v in row.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Timetable Route Benchmark
+
+Drives login, the three dashboards and the admin user and timetable
+forms through the Flask test client against a throwaway SQLite database
+grown with generate.py, and writes throughput, latency, SQL and memory
+figures as JSON (see common/benchmark.py).
+
+A --sizes value counts users: one in a hundred is a teacher with five
+classes and every student is enrolled in three teachers' classes, as
+generate.py does, so the timetable and enrollment tables grow with it.
+Login is measured with the configured PASSWORD_HASH_METHOD; see
+bench_login.py for the hashing pool itself.
+
+Usage:
+    python bench_routes.py --sizes 1000,100000,1000000 --output bench.json
+    python bench_routes.py --sizes 1000,100000 --baseline bench.json
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix='bench_routes_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+os.environ.setdefault('METRICS_SLOW_REQUEST', '60')
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import create_app  # noqa: E402  (must follow DATABASE_URL)
+from common.benchmark import Route  # noqa: E402
+from models import db, User, Timetable, Enrollment  # noqa: E402
+from common import benchmark  # noqa: E402
+import generate  # noqa: E402
+import slots  # noqa: E402
+
+app = create_app({'WTF_CSRF_ENABLED': False})
+
+ADMIN_EMAIL = 'bench-admin@example.com'
+PASSWORD = 'password'
+WEEKEND = ['Saturday', 'Sunday']
+
+_serial = itertools.count()
+
+
+def populate(size):
+    """Append generated teachers and students until there are `size` users."""
+    with app.app_context():
+        db.create_all()
+        if db.session.scalar(select(User.id).where(User.email == ADMIN_EMAIL)) is None:
+            admin = User(name='Bench Admin', email=ADMIN_EMAIL, role='admin')
+            admin.set_password(PASSWORD)
+            db.session.add(admin)
+            db.session.commit()
+        current = db.session.scalar(select(func.count(User.id)))
+        db.session.remove()
+        if size > current:
+            added = size - current
+            teachers = max(1, added // 100)
+            generate.generate_school(teachers, added - teachers, seed=42, password=PASSWORD)
+
+
+def _logged_in(email):
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'Could not log in as {email} ({response.status_code})')
+    return client
+
+
+def routes():
+    """Build the routes to drive at the current database size."""
+    with app.app_context():
+        teacher = db.session.execute(
+            select(User.id, User.email).where(User.role == 'teacher').order_by(User.id).limit(1)
+        ).one()
+        student = db.session.scalar(
+            select(User.email).join(Enrollment, Enrollment.student_id == User.id).limit(1)
+        )
+        teacher_ids = db.session.scalars(
+            select(User.id).where(User.role == 'teacher').order_by(User.id).limit(100)
+        ).all()
+        classes = db.session.scalars(
+            select(Timetable).where(Timetable.user_id.in_(teacher_ids), Timetable.weekday.is_not(None))
+        ).all()
+        # Generated classes may already clash; only edit ones that do not.
+        entries = [
+            (entry.id, entry.day, entry.time) for entry in classes
+            if not any(other.user_id == entry.user_id and other.id != entry.id
+                       and slots.overlaps(entry.slot, other.slot) for other in classes)
+        ]
+        db.session.remove()
+
+    anonymous = app.test_client()
+    admin = _logged_in(ADMIN_EMAIL)
+    teacher_client = _logged_in(teacher.email)
+    student_client = _logged_in(student)
+
+    def login(i):
+        anonymous.get('/logout')
+        return anonymous.post('/login', data={'email': teacher.email, 'password': PASSWORD})
+
+    def create_user(i):
+        serial = next(_serial)
+        return admin.post('/admin/user/create/student', data={
+            'name': f'Bench Student {serial}',
+            'email': f'bench-student-{serial}@example.com',
+            'password': '',
+        })
+
+    def create_timetable(i):
+        # Weekend slots never clash with generated (weekday) classes, and
+        # each teacher gets each ten-minute weekend slot at most once.
+        serial = next(_serial)
+        slot = serial // len(teacher_ids)
+        start = 10 * (slot // 2 % 144)
+        return admin.post('/admin/timetable/create', data={
+            'course_name': f'Bench Course {serial}',
+            'day': WEEKEND[slot % 2],
+            'time': f'{start // 60:02d}:{start % 60:02d} - {(start + 10) // 60:02d}:{(start + 10) % 60:02d}',
+            'teacher': [str(teacher_ids[serial % len(teacher_ids)])],
+        })
+
+    def edit_timetable(i):
+        # Renames a class in place, keeping its slot so it never clashes.
+        entry_id, day, time_ = entries[i % len(entries)]
+        return admin.post(f'/admin/timetable/edit/{entry_id}', data={
+            'course_name': f'Bench Course {i}', 'day': day, 'time': time_,
+        })
+
+    return [
+        Route('login', login, 302),
+        Route('admin_dashboard', lambda i: admin.get('/admin/dashboard'), 200),
+        Route('teacher_dashboard', lambda i: teacher_client.get('/teacher/dashboard'), 200),
+        Route('student_dashboard', lambda i: student_client.get('/student/dashboard'), 200),
+        Route('create_user', create_user, 302),
+        Route('create_timetable', create_timetable, 302),
+        Route('edit_timetable', edit_timetable, 302),
+    ]
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        engines = list(db.engines.values())
+    sys.exit(benchmark.main('Timetable Manager', engines, populate, routes))
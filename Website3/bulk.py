@@ -0,0 +1,245 @@
+"""
+Bulk Admin Operations Module
+
+Set-based versions of the admin's delete, reassign and move actions.
+Each one acts on a whole selection of users or timetable entries with a
+fixed handful of statements (an IN list, never one statement per row)
+in the caller's transaction:
+
+- deleting users also deletes the classes they teach and every
+  enrollment of theirs or in those classes, so nothing is left orphaned
+- deleting entries also deletes their enrollments
+- reassigning or moving entries first checks the affected teachers'
+  timetables for clashes and changes nothing if there are any
+
+The change log, calendar versions, dashboard counters and the shared
+user version are kept in step with set-based statements too (see models.log_timetable_changes
+and stats.py). The caller commits and then refreshes the per-process
+caches (timetable index, user cache) from the returned ids.
+"""
+
+from collections import namedtuple
+
+from sqlalchemy import delete, or_, select, update
+
+import slots
+import stats
+from models import User, Timetable, Enrollment, TimetableChange, bump_user_version, log_timetable_changes
+
+Moved = namedtuple('Moved', 'id user_id slot')
+
+_NO_SYNC = {'synchronize_session': False}
+
+
+class ClashError(ValueError):
+    """Raised when a reassign or move would double-book a teacher."""
+
+    def __init__(self, clashes):
+        super().__init__(f'{len(clashes)} clash(es); nothing was changed.')
+        self.clashes = clashes
+
+
+def delete_users(session, user_ids):
+    """
+    Delete users with their classes and enrollments. Admins are skipped.
+
+    Args:
+        session: SQLAlchemy session, committed by the caller
+        user_ids: Ids of the users to delete
+
+    Returns:
+        tuple: (deleted user ids, deleted timetable ids)
+    """
+    ids = session.scalars(
+        select(User.id).where(User.id.in_(list(user_ids)), User.role != 'admin')
+    ).all()
+    if not ids:
+        return [], []
+    taught = session.scalars(select(Timetable.id).where(Timetable.user_id.in_(ids))).all()
+    enrollments = or_(Enrollment.student_id.in_(ids), Enrollment.timetable_id.in_(taught))
+
+    # Students of the deleted classes see them disappear.
+    log_timetable_changes(session, taught)
+    stats.count_enrollments(session, enrollments, -1)
+    stats.count_entries(session, Timetable.user_id.in_(ids), -1)
+    stats.count_users(session, User.id.in_(ids), -1)
+
+    session.execute(delete(Enrollment).where(enrollments).execution_options(**_NO_SYNC))
+    session.execute(delete(Timetable).where(Timetable.id.in_(taught)).execution_options(**_NO_SYNC))
+    session.execute(
+        delete(TimetableChange).where(TimetableChange.user_id.in_(ids)).execution_options(**_NO_SYNC)
+    )
+    session.execute(delete(User).where(User.id.in_(ids)).execution_options(**_NO_SYNC))
+    bump_user_version(session)
+    return ids, taught
+
+
+def delete_timetables(session, timetable_ids):
+    """
+    Delete timetable entries and their enrollments.
+
+    Args:
+        session: SQLAlchemy session, committed by the caller
+        timetable_ids: Ids of the entries to delete
+
+    Returns:
+        list: Ids of the deleted entries
+    """
+    ids = session.scalars(select(Timetable.id).where(Timetable.id.in_(list(timetable_ids)))).all()
+    if not ids:
+        return []
+    log_timetable_changes(session, ids)
+    stats.count_enrollments(session, Enrollment.timetable_id.in_(ids), -1)
+    stats.count_entries(session, Timetable.id.in_(ids), -1)
+    session.execute(
+        delete(Enrollment).where(Enrollment.timetable_id.in_(ids)).execution_options(**_NO_SYNC)
+    )
+    session.execute(delete(Timetable).where(Timetable.id.in_(ids)).execution_options(**_NO_SYNC))
+    return ids
+
+
+def find_clashes(session, moved):
+    """
+    Check proposed slots against the teachers' other classes and each other.
+
+    Args:
+        session: SQLAlchemy session
+        moved: Moved tuples giving each entry's new teacher and slot
+            (entries without a parsed slot are not checked)
+
+    Returns:
+        list: One message per clash, empty if there are none
+    """
+    moving = {entry.id for entry in moved}
+    teacher_ids = {entry.user_id for entry in moved if entry.slot is not None}
+    if not teacher_ids:
+        return []
+    index = slots.IntervalIndex()
+    for entry_id, user_id, weekday, start, end in session.execute(
+        select(Timetable.id, Timetable.user_id, Timetable.weekday, Timetable.start_minute, Timetable.end_minute)
+        .where(Timetable.user_id.in_(teacher_ids), Timetable.weekday.is_not(None))
+    ):
+        if entry_id not in moving:
+            index.add((user_id, weekday), start, end, entry_id)
+
+    clashes = []
+    for entry in sorted(moved, key=lambda entry: entry.id):
+        if entry.slot is None:
+            continue
+        key = (entry.user_id, entry.slot.weekday)
+        for _, _, other_id in index.overlaps(key, entry.slot.start, entry.slot.end):
+            clashes.append(
+                f'Entry {entry.id} would clash with entry {other_id} '
+                f'(teacher {entry.user_id}, {slots.format_slot(entry.slot)}).'
+            )
+        index.add(key, entry.slot.start, entry.slot.end, entry.id)
+    return clashes
+
+
+def _load_slots(session, ids):
+    return session.execute(
+        select(Timetable.id, Timetable.user_id, Timetable.weekday, Timetable.start_minute, Timetable.end_minute)
+        .where(Timetable.id.in_(list(ids)))
+    ).all()
+
+
+def _slot(weekday, start, end):
+    return None if weekday is None or start is None else slots.Slot(weekday, start, end)
+
+
+def reassign_timetables(session, timetable_ids, teacher_id):
+    """
+    Give timetable entries to another teacher with one UPDATE.
+
+    Args:
+        session: SQLAlchemy session, committed by the caller
+        timetable_ids: Ids of the entries to reassign
+        teacher_id: Id of the new teacher
+
+    Returns:
+        list: Moved tuples for the reassigned entries
+
+    Raises:
+        ValueError: If teacher_id is not a teacher
+        ClashError: If the teacher would be double-booked
+    """
+    if session.scalar(select(User.role).where(User.id == teacher_id)) != 'teacher':
+        raise ValueError(f'Unknown teacher id: {teacher_id}')
+    moved = [
+        Moved(entry_id, teacher_id, _slot(weekday, start, end))
+        for entry_id, _, weekday, start, end in _load_slots(session, timetable_ids)
+    ]
+    if not moved:
+        return []
+    clashes = find_clashes(session, moved)
+    if clashes:
+        raise ClashError(clashes)
+
+    ids = [entry.id for entry in moved]
+    # Log before and after, so both the old and the new teacher are told.
+    log_timetable_changes(session, ids)
+    stats.count_entries(session, Timetable.id.in_(ids), -1, kinds=(stats.TEACHER,))
+    session.execute(
+        update(Timetable).where(Timetable.id.in_(ids)).values(user_id=teacher_id)
+        .execution_options(**_NO_SYNC)
+    )
+    stats.count_entries(session, Timetable.id.in_(ids), 1, kinds=(stats.TEACHER,))
+    log_timetable_changes(session, ids)
+    return moved
+
+
+def move_timetables(session, timetable_ids, day=None, time_text=None):
+    """
+    Move timetable entries to another day and/or time with one UPDATE.
+
+    Args:
+        session: SQLAlchemy session, committed by the caller
+        timetable_ids: Ids of the entries to move
+        day: New day text, or None to keep each entry's day
+        time_text: New time or time range text, or None to keep each
+            entry's time
+
+    Returns:
+        list: Moved tuples for the moved entries
+
+    Raises:
+        ValueError: If neither day nor time is given, or one cannot be parsed
+        ClashError: If a teacher would be double-booked
+    """
+    if not day and not time_text:
+        raise ValueError('Give a day and/or a time to move to.')
+    values = {}
+    weekday = start = end = None
+    if day:
+        weekday = slots.parse_day(day)
+        values.update(day=day, weekday=weekday)
+    if time_text:
+        start, end = slots.parse_times(time_text)
+        values.update(time=time_text, start_minute=start, end_minute=end)
+
+    moved, untimed = [], []
+    for entry_id, user_id, old_weekday, old_start, old_end in _load_slots(session, timetable_ids):
+        if not time_text and old_start is None:
+            untimed.append(entry_id)
+        new_weekday = weekday if day else old_weekday
+        new_start, new_end = (start, end) if time_text else (old_start, old_end)
+        moved.append(Moved(entry_id, user_id, _slot(new_weekday, new_start, new_end)))
+    if untimed:
+        raise ValueError(f'Entries {sorted(untimed)} have no parsed time; move them with a time too.')
+    if not moved:
+        return []
+    clashes = find_clashes(session, [entry for entry in moved if entry.user_id is not None])
+    if clashes:
+        raise ClashError(clashes)
+
+    ids = [entry.id for entry in moved]
+    if day:
+        stats.count_entries(session, Timetable.id.in_(ids), -1, kinds=(stats.DAY,))
+    session.execute(
+        update(Timetable).where(Timetable.id.in_(ids)).values(**values)
+        .execution_options(**_NO_SYNC)
+    )
+    if day:
+        stats.count_entries(session, Timetable.id.in_(ids), 1, kinds=(stats.DAY,))
+    log_timetable_changes(session, ids)
+    return moved
@@ -0,0 +1,197 @@
+"""
+Calendar Feeds Module
+
+Renders a user's timetable as an iCalendar (.ics) feed that calendar
+apps can subscribe to, one weekly recurring event per class, and caches
+the rendered feed per user.
+
+Every user row carries a timetable_version that the write routes bump
+(see models.bump_timetable_versions) whenever a change touches one of
+that user's classes. The feed's ETag is built from the user id and that
+version, so a polling client that already has the current feed gets a
+304 after a single primary-key lookup, and a changed feed is rendered
+once per version and then served from the cache.
+
+Feeds are fetched without a login session, so their URLs carry a token
+signed with the app's SECRET_KEY. Changing the key revokes every token.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, timedelta, timezone
+
+from itsdangerous import BadSignature, URLSafeSerializer
+
+PRODID = '-//School Management System//Timetable//EN'
+TOKEN_SALT = 'calendar-feed'
+
+Feed = namedtuple('Feed', 'version etag body')
+
+
+def feed_token(secret_key, user_id):
+    """Return the signed token that identifies a user's feed."""
+    return URLSafeSerializer(secret_key, salt=TOKEN_SALT).dumps(user_id)
+
+
+def read_feed_token(secret_key, token):
+    """
+    Return the user id in a feed token.
+
+    Returns:
+        int, or None if the token is malformed or was not signed by us
+    """
+    try:
+        user_id = URLSafeSerializer(secret_key, salt=TOKEN_SALT).loads(token)
+    except BadSignature:
+        return None
+    return user_id if isinstance(user_id, int) else None
+
+
+def feed_etag(user_id, version):
+    """ETag of a user's feed at a given timetable version."""
+    return f'{user_id}-{version}'
+
+
+def _escape(text):
+    return (
+        (text or '').replace('\\', '\\\\').replace(';', '\\;')
+        .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    # RFC 5545 limits lines to 75 octets; continuations start with a space.
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Never split a multi-byte character.
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(parts)
+
+
+def _stamp(moment):
+    return moment.strftime('%Y%m%dT%H%M%S')
+
+
+def render_calendar(name, entries, term_start, domain):
+    """
+    Render timetable entries as an iCalendar document.
+
+    Each entry becomes an event repeating weekly from its first
+    occurrence on or after `term_start`, in floating local time. Entries
+    whose day or time could not be parsed are left out.
+
+    Args:
+        name: Calendar name shown by calendar apps
+        entries: Timetable entries (id, course_name and the slot columns)
+        term_start: date the events start repeating from
+        domain: Domain used to make event UIDs globally unique
+
+    Returns:
+        str: The .ics document
+    """
+    stamp = _stamp(datetime.now(timezone.utc)) + 'Z'
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ]
+    for entry in entries:
+        if entry.weekday is None:
+            continue
+        day = term_start + timedelta(days=(entry.weekday - term_start.weekday()) % 7)
+        midnight = datetime(day.year, day.month, day.day)
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:timetable-{entry.id}@{domain}',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART:{_stamp(midnight + timedelta(minutes=entry.start_minute))}',
+            f'DTEND:{_stamp(midnight + timedelta(minutes=entry.end_minute))}',
+            'RRULE:FREQ=WEEKLY',
+            f'SUMMARY:{_escape(entry.course_name)}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+def parse_term_start(value):
+    """Parse an ISO date such as '2024-09-02' for render_calendar()."""
+    return date.fromisoformat(value)
+
+
+class FeedCache:
+    """
+    Thread-safe LRU cache of rendered feeds, one per user.
+
+    A cached feed is only served for the timetable version it was
+    rendered at, so bumping a user's version is all the invalidation a
+    write needs, in every worker process.
+
+    Attributes:
+        maxsize: Maximum number of cached feeds
+        hits: Lookups served from the cache
+        misses: Lookups that rendered the feed
+    """
+
+    def __init__(self, maxsize=5000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version, render):
+        """
+        Return the user's feed at `version`, rendering it on a miss.
+
+        Args:
+            user_id: User id
+            version: The user's current timetable version
+            render: Callable returning the .ics text
+
+        Returns:
+            Feed
+        """
+        with self._lock:
+            feed = self._feeds.get(user_id)
+            if feed is not None and feed.version == version:
+                self._feeds.move_to_end(user_id)
+                self.hits += 1
+                return feed
+            self.misses += 1
+
+        feed = Feed(version, feed_etag(user_id, version), render())
+        with self._lock:
+            current = self._feeds.get(user_id)
+            # Never replace a feed rendered for a newer version.
+            if current is None or current.version <= version:
+                self._feeds[user_id] = feed
+                self._feeds.move_to_end(user_id)
+                while len(self._feeds) > self.maxsize:
+                    self._feeds.popitem(last=False)
+        return feed
+
+    def stats(self):
+        """
+        Return cache counters.
+
+        Returns:
+            dict with size, maxsize, hits and misses
+        """
+        with self._lock:
+            return {
+                'size': len(self._feeds),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -2,5 +2,38 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev_key'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///timetable.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DASHBOARD_PER_PAGE = 50
+    DASHBOARD_MAX_PER_PAGE = 500
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+    # Seconds between checks of the shared user version (see usercache.py),
+    # i.e. how long other server workers may serve a changed user's old record.
+    USER_CACHE_CHECK_INTERVAL = float(os.environ.get('USER_CACHE_CHECK_INTERVAL', 1))
+    # In-memory clash index (see slots.py); reloaded after this many seconds.
+    TIMETABLE_INDEX_TTL = float(os.environ.get('TIMETABLE_INDEX_TTL', 60))
+    # Rows per transaction for the CSV timetable import (see importer.py).
+    TIMETABLE_IMPORT_BATCH_SIZE = int(os.environ.get('TIMETABLE_IMPORT_BATCH_SIZE', 5000))
+    # iCalendar feeds (see calendars.py); classes repeat weekly from the term start.
+    CALENDAR_TERM_START = os.environ.get('CALENDAR_TERM_START', '2024-01-01')
+    CALENDAR_CACHE_SIZE = int(os.environ.get('CALENDAR_CACHE_SIZE', 5000))
+    CALENDAR_MAX_AGE = int(os.environ.get('CALENDAR_MAX_AGE', 300))
+    # Timetable sync event streams (see sync.py); all in seconds.
+    SYNC_POLL_INTERVAL = float(os.environ.get('SYNC_POLL_INTERVAL', 5))
+    SYNC_KEEPALIVE = float(os.environ.get('SYNC_KEEPALIVE', 15))
+    SYNC_STREAM_LIFETIME = float(os.environ.get('SYNC_STREAM_LIFETIME', 300))
+    # Request metrics at /metrics (see common/metrics.py); slow requests are in seconds.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+    METRICS_SLOW_REQUEST = float(os.environ.get('METRICS_SLOW_REQUEST', 0.5))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Largest selection a bulk admin action accepts (see bulk.py).
+    BULK_MAX_IDS = int(os.environ.get('BULK_MAX_IDS', 10000))
+    # Timetable generation (see scheduler.py); budgets are in seconds.
+    SCHEDULER_TIME_BUDGET = float(os.environ.get('SCHEDULER_TIME_BUDGET', 10))
+    SCHEDULER_MAX_TIME_BUDGET = float(os.environ.get('SCHEDULER_MAX_TIME_BUDGET', 120))
+    SCHEDULER_PROCESSES = os.environ.get('SCHEDULER_PROCESSES', '1') != '0'
+    # Password hashing pool (see hashing.py); 0 workers hashes inline.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 0)) or None
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 2.0))
@@ -0,0 +1,222 @@
+"""
+Synthetic School Data Generator
+
+Appends deterministic teachers, students, Timetable and Enrollment rows
+for load testing, then recomputes the dashboard statistics. The same
+arguments always produce the same data. Each
+student is enrolled in every class of a few teachers, as
+register_student() does. Rows are
+written with executemany Core inserts, one transaction per batch, and the
+insert rate is reported as it goes. Existing data is never dropped.
+
+Every generated account shares one password (--password). It is hashed
+once rather than per user, because werkzeug's hash is deliberately slow.
+
+Usage:
+    python generate.py --teachers 2000 --students 200000 --seed 42
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from models import db, User, Timetable, Enrollment
+import slots
+import stats
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+TIMES = [
+    "08:00 AM", "09:00 AM", "10:00 AM", "11:00 AM", "12:00 PM",
+    "01:00 PM", "02:00 PM", "03:00 PM", "04:00 PM",
+]
+SUBJECTS = [
+    "Math", "English", "Physics", "Chemistry", "Biology", "History",
+    "Geography", "Economics", "Art", "Music", "Computing", "French",
+]
+FIRST_NAMES = [
+    "Olivia", "Liam", "Ava", "Noah", "Isla", "Jack", "Mia", "William",
+    "Grace", "Henry", "Zoe", "Lucas", "Ruby", "James", "Amara", "Kofi",
+]
+LAST_NAMES = [
+    "Smith", "Jones", "Brown", "Wilson", "Taylor", "Nguyen", "Walker",
+    "Otieno", "Mwangi", "Kamau", "Harris", "Lee", "King", "Wright",
+]
+
+
+class Progress:
+    """Running rows-per-second report across all generated tables."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+
+    def add(self, label, count):
+        self.rows += count
+        elapsed = time.perf_counter() - self.started
+        print(f"  {self.rows:>12,} rows ({label})  ({self.rows / elapsed:,.0f} rows/s)")
+
+    def done(self):
+        elapsed = time.perf_counter() - self.started
+        print(f"✅ Generated {self.rows:,} rows in {elapsed:.1f}s ({self.rows / elapsed:,.0f} rows/s)")
+
+
+def insert_batches(connection, table, rows, batch_size, label, progress):
+    """
+    Insert an iterable of row dicts in chunked transactions.
+    
+    Args:
+        connection: Core connection to write with
+        table: Target Table
+        rows: Iterable of row dicts, consumed lazily
+        batch_size: Rows per transaction
+        label: Name used in progress output
+        progress: Progress instance to report to
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with connection.begin():
+                connection.execute(table.insert(), batch)
+            progress.add(label, len(batch))
+            batch = []
+    if batch:
+        with connection.begin():
+            connection.execute(table.insert(), batch)
+        progress.add(label, len(batch))
+
+
+def teacher_classes(seed, teacher_id, count):
+    """Return the (course_name, day, time) classes a generated teacher runs."""
+    rng = random.Random(f"{seed}:classes:{teacher_id}")
+    subject = rng.choice(SUBJECTS)
+    return [
+        (f"{subject} {rng.randint(1, 4)}0{rng.randint(1, 9)}", rng.choice(DAYS), rng.choice(TIMES))
+        for _ in range(count)
+    ]
+
+
+def generate_school(teachers, students, classes_per_teacher=5, teachers_per_student=3,
+                    seed=0, batch_size=10000, password='password'):
+    """
+    Append generated users, their timetable rows and enrollments.
+    
+    Args:
+        teachers: Number of teachers to add
+        students: Number of students to add
+        classes_per_teacher: Timetable rows per generated teacher
+        teachers_per_student: Teachers whose classes each student is enrolled in
+        seed: Random seed
+        batch_size: Rows per INSERT transaction
+        password: Plaintext password shared by all generated users
+    """
+    db.create_all()
+    users = User.__table__
+    timetables = Timetable.__table__
+    enrollments = Enrollment.__table__
+    password_hash = generate_password_hash(password)
+    progress = Progress()
+
+    with db.engine.connect() as connection:
+        # Ids are assigned here so timetable and enrollment rows can
+        # reference users and classes without reading generated keys back.
+        next_id = (connection.execute(select(func.max(users.c.id))).scalar() or 0) + 1
+        next_class_id = (connection.execute(select(func.max(timetables.c.id))).scalar() or 0) + 1
+        teacher_ids = range(next_id, next_id + teachers)
+        student_ids = range(next_id + teachers, next_id + teachers + students)
+        classes = {tid: teacher_classes(seed, tid, classes_per_teacher) for tid in teacher_ids}
+        class_ids = {
+            tid: range(next_class_id + i * classes_per_teacher, next_class_id + (i + 1) * classes_per_teacher)
+            for i, tid in enumerate(teacher_ids)
+        }
+
+        if not classes:
+            # Only students requested: enrol them with the teachers already on file.
+            existing = connection.execute(
+                select(timetables.c.user_id, timetables.c.id)
+                .join(users, users.c.id == timetables.c.user_id)
+                .where(users.c.role == 'teacher')
+            )
+            for user_id, class_id in existing:
+                class_ids.setdefault(user_id, []).append(class_id)
+        pool = sorted(class_ids)
+        connection.commit()
+
+        def user_rows(ids, role):
+            rng = random.Random(f"{seed}:{role}:{ids.start}")
+            for uid in ids:
+                yield {
+                    'id': uid,
+                    'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    'email': f"{role}{uid}@school.example.com",
+                    'password_hash': password_hash,
+                    'role': role,
+                }
+
+        def timetable_rows():
+            for tid in teacher_ids:
+                for class_id, (course_name, day, time_) in zip(class_ids[tid], classes[tid]):
+                    slot = slots.parse_slot(day, time_)
+                    yield {
+                        'id': class_id, 'course_name': course_name, 'day': day,
+                        'time': time_, 'weekday': slot.weekday,
+                        'start_minute': slot.start, 'end_minute': slot.end,
+                        'user_id': tid,
+                    }
+
+        def enrollment_rows():
+            for sid in student_ids:
+                rng = random.Random(f"{seed}:enrol:{sid}")
+                for tid in rng.sample(pool, min(teachers_per_student, len(pool))):
+                    for class_id in class_ids[tid]:
+                        yield {'student_id': sid, 'timetable_id': class_id}
+
+        insert_batches(connection, users, user_rows(teacher_ids, 'teacher'), batch_size, 'teachers', progress)
+        insert_batches(connection, users, user_rows(student_ids, 'student'), batch_size, 'students', progress)
+        insert_batches(connection, timetables, timetable_rows(), batch_size, 'timetables', progress)
+        insert_batches(connection, enrollments, enrollment_rows(), batch_size, 'enrollments', progress)
+        with connection.begin():
+            stats.recompute(connection)
+
+        if connection.dialect.name == 'postgresql':
+            # Explicit ids bypass the serial sequences; move them past them.
+            with connection.begin():
+                for table in ('"user"', 'timetable'):
+                    connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                    ))
+
+    progress.done()
+
+
+def main():
+    """Parse command line arguments and run the generator."""
+    parser = argparse.ArgumentParser(description="Append synthetic users, timetables and enrollments for load testing.")
+    parser.add_argument('--teachers', type=int, default=100, help='teachers to add')
+    parser.add_argument('--students', type=int, default=10000, help='students to add')
+    parser.add_argument('--classes-per-teacher', type=int, default=5)
+    parser.add_argument('--teachers-per-student', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows per transaction')
+    parser.add_argument('--password', default='password', help='password for every generated user')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        generate_school(
+            args.teachers,
+            args.students,
+            classes_per_teacher=args.classes_per_teacher,
+            teachers_per_student=args.teachers_per_student,
+            seed=args.seed,
+            batch_size=args.batch_size,
+            password=args.password
+        )
+
+
+if __name__ == '__main__':
+    main()
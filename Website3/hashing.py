@@ -0,0 +1,158 @@
+"""
+Password Hashing Module
+
+Runs werkzeug's deliberately slow password hashing in a bounded process
+pool. The request thread still blocks on the result, so a login holds
+its thread for as long as the hash takes; what the pool changes is where
+the CPU work runs. Hashes are computed in separate processes, on at most
+`workers` cores, so they do not compete for the server process's GIL
+with the threads serving other pages. At most `max_pending` hash jobs
+may be queued or running at once; a request that cannot get a slot
+within `wait_timeout` seconds gets HashingBusy, which the app turns into
+503 + Retry-After (shedding load instead of queueing without bound).
+
+Each app's hasher lives in app.extensions and get_hasher() finds it
+through current_app; outside an app context an inline hasher is used.
+The pool is created lazily on first use, after any pre-fork, and uses the
+'spawn' start method so workers never inherit the server's threads.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+EXTENSION = 'password_hasher'
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing slot frees up within the wait timeout."""
+
+
+def normalize_method(method):
+    """
+    Expand a werkzeug method name to the prefix it writes into hashes.
+    
+    Args:
+        method: e.g. 'pbkdf2', 'pbkdf2:sha256:600000', 'scrypt'
+    
+    Returns:
+        str: Fully specified method, e.g. 'scrypt:32768:8:1'
+    """
+    name, *args = method.split(':')
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) > 1 else DEFAULT_METHOD.rsplit(':', 1)[1]
+        return f'pbkdf2:{hash_name}:{iterations}'
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    return method
+
+
+class PasswordHasher:
+    """
+    Hash and verify passwords, optionally in a bounded process pool.
+    
+    Args:
+        method: werkzeug hash method and cost parameters for new hashes
+        workers: Pool size; 0 hashes inline in the calling thread
+        max_pending: Maximum hash jobs queued or running at once
+        wait_timeout: Seconds to wait for a slot before raising HashingBusy
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=None, max_pending=None, wait_timeout=2.0):
+        self.method = normalize_method(method)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(self.workers, 1) * 4
+        self.wait_timeout = wait_timeout
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            self.rejected += 1
+            raise HashingBusy('Too many password checks in progress, please retry.')
+        try:
+            if self.workers == 0:
+                return func(*args)
+            try:
+                return self._executor().submit(func, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool and retry once.
+                self._reset(broken=self._pool)
+                return self._executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _reset(self, broken):
+        with self._pool_lock:
+            if self._pool is broken and broken is not None:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def hash(self, password):
+        """Return a new hash of `password` using the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Return True if `password` matches the stored `pwhash`."""
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Return True if `pwhash` was made with a different method or cost."""
+        return bool(pwhash) and pwhash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        """Stop the worker processes (used on reload and at exit)."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Used outside an app context, e.g. by scripts that build users directly.
+_inline = PasswordHasher(workers=0)
+
+
+def init_app(app):
+    """
+    Give the app a hasher configured from its PASSWORD_HASH_* settings.
+    
+    Args:
+        app: Flask application with PASSWORD_HASH_* settings
+    """
+    previous = app.extensions.get(EXTENSION)
+    if previous is not None:
+        previous.shutdown()
+    app.extensions[EXTENSION] = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        wait_timeout=app.config['PASSWORD_HASH_WAIT']
+    )
+
+
+def get_hasher():
+    """Return the current app's PasswordHasher, or an inline one outside an app context."""
+    if has_app_context():
+        return current_app.extensions.get(EXTENSION, _inline)
+    return _inline
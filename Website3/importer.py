@@ -0,0 +1,256 @@
+"""
+Timetable Import Module
+
+Streams a CSV of classes (course_name, day, time, teacher_email) into the
+timetable table. Teacher emails are resolved with one lookup of every
+teacher before the first row is read, rows are validated and checked for
+clashes against an in-memory IntervalIndex of the teachers' classes, and
+accepted rows are written with executemany INSERTs, one transaction per
+batch. Only one batch of rows (plus the report) is held in memory.
+
+Rows are written through Core, so the structured slot columns are filled
+here rather than by the ORM before_insert hook.
+"""
+
+import csv
+import io
+
+from sqlalchemy import select
+
+import slots
+import stats
+from models import User, Timetable, log_timetable_changes
+
+FIELDS = ('course_name', 'day', 'time', 'teacher_email')
+REPORT_COLUMNS = ('row',) + FIELDS + ('error',)
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_MAX_ERRORS = 10000
+
+
+class ImportFormatError(ValueError):
+    """Raised when an upload cannot be parsed at all (e.g. missing CSV columns)."""
+
+
+class ImportReport:
+    """
+    Counters and rejected rows collected during an import.
+
+    Attributes:
+        rows: Data rows read from the file
+        inserted: Timetable entries written
+        invalid: Rows rejected by validation
+        clashes: Rows rejected because the teacher is already booked
+        errors: Rejected rows with their fields and the reason
+        errors_truncated: Whether more than max_errors rows were rejected
+    """
+
+    def __init__(self, max_errors=DEFAULT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.invalid = 0
+        self.clashes = 0
+        self.errors = []
+        self.errors_truncated = False
+
+    def add_error(self, row_number, record, message):
+        """Record a rejected row, up to max_errors of them."""
+        if len(self.errors) < self.max_errors:
+            self.errors.append(dict(record, row=row_number, error=message))
+        else:
+            self.errors_truncated = True
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'invalid': self.invalid,
+            'clashes': self.clashes,
+            'errors': self.errors,
+            'errors_truncated': self.errors_truncated,
+        }
+
+    def to_csv(self):
+        """Return the rejected rows as CSV text, one line per row."""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, REPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(self.errors)
+        if self.errors_truncated:
+            writer.writerow({'error': f'More than {self.max_errors} rows rejected; report truncated.'})
+        return buffer.getvalue()
+
+
+def text_stream(binary):
+    """Wrap an uploaded binary stream for incremental text decoding."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def read_csv(stream):
+    """
+    Yield (row_number, record) pairs from a CSV with a header row.
+
+    Raises:
+        ImportFormatError: If a required column is missing
+    """
+    reader = csv.reader(stream)
+    try:
+        header = [column.strip().lower() for column in next(reader)]
+    except StopIteration:
+        return
+    missing = [field for field in FIELDS if field not in header]
+    if missing:
+        raise ImportFormatError(f"CSV is missing column(s): {', '.join(missing)}")
+    positions = {field: header.index(field) for field in FIELDS}
+
+    for row_number, row in enumerate(reader, start=1):
+        if not any(cell.strip() for cell in row):
+            continue
+        yield row_number, {
+            field: row[index] if index < len(row) else ''
+            for field, index in positions.items()
+        }
+
+
+def validate(record, max_lengths):
+    """
+    Check a record and parse its slot.
+
+    Args:
+        record: Row dict; values are stripped in place
+        max_lengths: Column lengths of the timetable table
+
+    Returns:
+        tuple: (Slot or None, list of error messages)
+    """
+    errors = []
+    for field in FIELDS:
+        value = record[field] = (record.get(field) or '').strip()
+        if not value:
+            errors.append(f'{field}: This field is required.')
+        elif max_lengths.get(field) and len(value) > max_lengths[field]:
+            errors.append(f'{field}: Longer than {max_lengths[field]} characters.')
+    slot = None
+    if record['day'] and record['time']:
+        try:
+            slot = slots.parse_slot(record['day'], record['time'])
+        except ValueError as exc:
+            errors.append(str(exc))
+    return slot, errors
+
+
+def load_teachers(connection):
+    """Map lower-cased email to user id for every teacher, in one query."""
+    users = User.__table__
+    return {
+        email.strip().lower(): user_id
+        for user_id, email in connection.execute(
+            select(users.c.id, users.c.email).where(users.c.role == 'teacher')
+        )
+        if email
+    }
+
+
+def load_bookings(connection):
+    """
+    Index the existing classes of every teacher by (teacher, weekday).
+
+    Returns:
+        IntervalIndex whose entry ids are timetable ids
+    """
+    table, users = Timetable.__table__, User.__table__
+    index = slots.IntervalIndex()
+    for entry_id, user_id, weekday, start, end in connection.execute(
+        select(table.c.id, table.c.user_id, table.c.weekday, table.c.start_minute, table.c.end_minute)
+        .join(users, users.c.id == table.c.user_id)
+        .where(users.c.role == 'teacher', table.c.weekday.is_not(None))
+    ):
+        index.add((user_id, weekday), start, end, entry_id)
+    return index
+
+
+def _describe_clash(entry_id, teacher_email):
+    # Rows accepted earlier in the same file are indexed under -row_number.
+    if entry_id < 0:
+        return f'Clashes with row {-entry_id} for {teacher_email}.'
+    return f'Clashes with timetable entry {entry_id} for {teacher_email}.'
+
+
+def _flush(connection, batch, report):
+    with connection.begin():
+        table = Timetable.__table__
+        new_ids = connection.execute(table.insert().returning(table.c.id), batch).scalars().all()
+        log_timetable_changes(connection, new_ids)
+        stats.count_new_entries(connection, batch)
+    report.inserted += len(batch)
+
+
+def import_timetables(connection, records, batch_size=DEFAULT_BATCH_SIZE,
+                      max_errors=DEFAULT_MAX_ERRORS):
+    """
+    Validate and insert timetable rows in batched transactions.
+
+    A row is rejected if a field is missing or too long, the day or time
+    cannot be parsed, the email is not a teacher's, or the slot overlaps
+    one of the teacher's existing classes or a row accepted earlier in
+    the file. Batches committed before a failure stay committed.
+
+    Args:
+        connection: Core connection outside a transaction
+        records: Iterable of (row_number, dict) pairs, e.g. from read_csv()
+        batch_size: Rows inserted per transaction
+        max_errors: Rejected rows kept for the report
+
+    Returns:
+        ImportReport
+    """
+    table = Timetable.__table__
+    max_lengths = {
+        'course_name': table.c.course_name.type.length,
+        'day': table.c.day.type.length,
+        'time': table.c.time.type.length,
+    }
+    report = ImportReport(max_errors=max_errors)
+
+    with connection.begin():
+        teachers = load_teachers(connection)
+        bookings = load_bookings(connection)
+
+    batch = []
+    for row_number, record in records:
+        report.rows += 1
+        slot, problems = validate(record, max_lengths)
+        teacher_id = teachers.get(record['teacher_email'].lower())
+        if record['teacher_email'] and teacher_id is None:
+            problems.append(f"teacher_email: No teacher with email {record['teacher_email']}.")
+        if problems:
+            report.invalid += 1
+            report.add_error(row_number, record, '; '.join(problems))
+            continue
+
+        key = (teacher_id, slot.weekday)
+        clashes = bookings.overlaps(key, slot.start, slot.end)
+        if clashes:
+            report.clashes += 1
+            report.add_error(row_number, record, ' '.join(
+                _describe_clash(entry_id, record['teacher_email']) for _, _, entry_id in clashes
+            ))
+            continue
+
+        bookings.add(key, slot.start, slot.end, -row_number)
+        batch.append({
+            'course_name': record['course_name'],
+            'day': record['day'],
+            'time': record['time'],
+            'weekday': slot.weekday,
+            'start_minute': slot.start,
+            'end_minute': slot.end,
+            'user_id': teacher_id,
+        })
+        if len(batch) >= batch_size:
+            _flush(connection, batch, report)
+            batch = []
+
+    if batch:
+        _flush(connection, batch, report)
+    return report
@@ -0,0 +1,170 @@
+"""
+Data Migrations Module
+
+One-off, re-runnable migrations that move existing databases onto the
+current schema. Each function takes a Core connection inside a
+transaction and works with set-based statements, so it runs in a handful
+of queries however many rows are involved.
+"""
+from sqlalchemy import and_, bindparam, delete, exists, insert, inspect, select, text, update
+from sqlalchemy.orm import aliased
+
+import slots
+from models import User, Timetable, Enrollment, ScheduleJobRecord
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade_schema(connection):
+    """
+    Add columns and indexes declared on the models that an older database lacks.
+
+    create_all() only creates missing tables, so columns and indexes
+    added to tables that already existed are created here. New columns
+    are added as nullable, without defaults.
+
+    Args:
+        connection: Core connection to run the DDL on
+    """
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in (User.__table__, Timetable.__table__, Enrollment.__table__, ScheduleJobRecord.__table__):
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} "
+                    f"{column.type.compile(connection.dialect)}"
+                ))
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def migrate_student_timetables(connection):
+    """
+    Replace per-student copies of teachers' classes with Enrollment rows.
+
+    register_student() used to copy every class of each chosen teacher
+    into a Timetable row owned by the student. A copy whose course, day
+    and time match a teacher's class becomes an enrollment in that class
+    and is deleted. Copies that no longer match any class (the teacher's
+    entry was edited or removed after registration) are kept, and the
+    student is enrolled in their own copy so it stays on their dashboard.
+
+    Safe to run more than once: existing enrollments are never duplicated.
+
+    Args:
+        connection: Core connection inside a transaction
+
+    Returns:
+        dict: Counts of 'enrolled', 'removed' and 'kept' rows
+    """
+    enrollments = Enrollment.__table__
+    student = aliased(User)
+    teacher = aliased(User)
+    copy = aliased(Timetable)
+    session = aliased(Timetable)
+
+    not_enrolled = ~exists().where(
+        enrollments.c.student_id == copy.user_id,
+        enrollments.c.timetable_id == session.id
+    )
+    matches = (
+        select(copy.user_id, session.id)
+        .join(student, and_(student.id == copy.user_id, student.role == 'student'))
+        .join(session, and_(
+            session.course_name == copy.course_name,
+            session.day == copy.day,
+            session.time == copy.time
+        ))
+        .join(teacher, and_(teacher.id == session.user_id, teacher.role == 'teacher'))
+        .where(not_enrolled)
+        .distinct()
+    )
+    enrolled = connection.execute(
+        insert(enrollments).from_select(['student_id', 'timetable_id'], matches)
+    ).rowcount
+
+    matched_copies = (
+        select(copy.id)
+        .join(student, and_(student.id == copy.user_id, student.role == 'student'))
+        .where(exists().where(
+            session.course_name == copy.course_name,
+            session.day == copy.day,
+            session.time == copy.time,
+            teacher.id == session.user_id,
+            teacher.role == 'teacher'
+        ))
+    )
+    # Enrollments of other students in a copy (none expected) would dangle.
+    connection.execute(delete(enrollments).where(enrollments.c.timetable_id.in_(matched_copies)))
+    removed = connection.execute(
+        delete(Timetable.__table__).where(Timetable.__table__.c.id.in_(matched_copies))
+    ).rowcount
+
+    own_copies = (
+        select(copy.user_id, copy.id)
+        .join(student, and_(student.id == copy.user_id, student.role == 'student'))
+        .where(~exists().where(
+            enrollments.c.student_id == copy.user_id,
+            enrollments.c.timetable_id == copy.id
+        ))
+    )
+    kept = connection.execute(
+        insert(enrollments).from_select(['student_id', 'timetable_id'], own_copies)
+    ).rowcount
+    enrolled += kept
+
+    return {'enrolled': enrolled, 'removed': removed, 'kept': kept}
+
+
+def backfill_time_slots(connection, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Parse the day and time text of entries whose slot columns are empty.
+
+    Rows are read in id order and updated with one executemany UPDATE per
+    batch. Entries whose text cannot be parsed keep NULL slot columns and
+    are reported back so they can be fixed by hand.
+
+    Args:
+        connection: Core connection inside a transaction
+        batch_size: Rows parsed and updated per statement
+
+    Returns:
+        dict: 'updated' count and the 'unparsed' (id, day, time) rows
+    """
+    table = Timetable.__table__
+    statement = update(table).where(table.c.id == bindparam('_id')).values(
+        weekday=bindparam('weekday'),
+        start_minute=bindparam('start_minute'),
+        end_minute=bindparam('end_minute')
+    )
+    updated, unparsed, last_id = 0, [], 0
+    while True:
+        rows = connection.execute(
+            select(table.c.id, table.c.day, table.c.time)
+            .where(table.c.weekday.is_(None), table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        batch = []
+        for row in rows:
+            try:
+                slot = slots.parse_slot(row.day, row.time)
+            except ValueError:
+                unparsed.append(tuple(row))
+                continue
+            batch.append({
+                '_id': row.id,
+                'weekday': slot.weekday,
+                'start_minute': slot.start,
+                'end_minute': slot.end,
+            })
+        if batch:
+            connection.execute(statement, batch)
+            updated += len(batch)
+    return {'updated': updated, 'unparsed': unparsed}
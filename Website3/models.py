@@ -2,14 +2,20 @@
 Database Models Module
 
 This module defines the SQLAlchemy database models for the school management system.
-It includes models for User authentication and Timetable management.
+It includes models for User authentication, Timetable management,
+student Enrollment in scheduled classes, the TimetableChange log
+that incremental timetable sync reads from and the DashboardStat
+counters behind the admin dashboard.
 """
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import Select, event, func, insert, or_, select, union_all, update
+from common import dbconfig
+import hashing
+import slots
 
 # Initialize SQLAlchemy instance
-db = SQLAlchemy()
+db = SQLAlchemy(session_options=dbconfig.session_options())
 
 
 class User(UserMixin, db.Model):
@@ -22,6 +28,8 @@ class User(UserMixin, db.Model):
         email: Email address (unique) used for login
         password_hash: Securely hashed password
         role: User role ('admin', 'teacher', or 'student')
+        timetable_version: Bumped whenever the user's classes change
+            (see bump_timetable_versions); NULL counts as 0
     """
     
     id = db.Column(db.Integer, primary_key=True)
@@ -29,15 +37,21 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(100), unique=True)
     password_hash = db.Column(db.String(128))
     role = db.Column(db.String(50))  # 'admin', 'teacher', 'student'
+    timetable_version = db.Column(db.Integer, default=0)
 
     def set_password(self, password):
         """
         Set the password hash from a plaintext password.
         
+        Hashing runs in the bounded hashing pool (see hashing.py).
+        
         Args:
             password: The plaintext password to hash and store
+        
+        Raises:
+            hashing.HashingBusy: If no hashing slot is free in time
         """
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hashing.get_hasher().hash(password)
 
     def check_password(self, password):
         """
@@ -48,29 +62,331 @@ class User(UserMixin, db.Model):
             
         Returns:
             bool: True if the password matches, False otherwise
+        
+        Raises:
+            hashing.HashingBusy: If no hashing slot is free in time
+        """
+        return hashing.get_hasher().verify(self.password_hash, password)
+
+    def needs_rehash(self):
+        """
+        Check whether the stored hash uses outdated hashing parameters.
+        
+        Returns:
+            bool: True if the hash should be regenerated on next login
         """
-        return check_password_hash(self.password_hash, password)
+        return hashing.get_hasher().needs_rehash(self.password_hash)
 
 
 class Timetable(db.Model):
     """
     Timetable model for storing course schedules.
     
-    Each entry represents a scheduled class with details about
-    the course, day, time, and associated user (teacher or student).
+    Each entry represents a scheduled class (a session of a course) with
+    details about the course, day, time, and the teacher who runs it.
+    Students are linked to the sessions they attend through Enrollment
+    rather than holding their own copies of each entry.
+    
+    The free-text day and time are parsed into weekday and start/end
+    minute columns whenever an entry is written (see slots.py), so entries
+    can be sorted and range-queried by time. They stay NULL for text that
+    cannot be parsed.
     
     Attributes:
         id: Unique identifier for the timetable entry
         course_name: Name of the course
         day: Day of the week when the class is scheduled
         time: Time when the class is scheduled
-        user_id: Foreign key linking to the associated user
+        weekday: Parsed day, Monday = 0
+        start_minute: Parsed start time, minutes after midnight
+        end_minute: Parsed end time, minutes after midnight
+        user_id: Foreign key linking to the associated user; deleting
+            the user deletes the entry (see bulk.delete_users)
         user: Relationship to the User model
     """
     
+    __table_args__ = (
+        db.Index('ix_timetable_user_slot', 'user_id', 'weekday', 'start_minute'),
+        db.Index('ix_timetable_slot', 'weekday', 'start_minute'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     course_name = db.Column(db.String(100))
     day = db.Column(db.String(50))
     time = db.Column(db.String(50))
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    user = db.relationship('User', backref='timetables')
\ No newline at end of file
+    weekday = db.Column(db.SmallInteger)
+    start_minute = db.Column(db.SmallInteger)
+    end_minute = db.Column(db.SmallInteger)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'))
+    user = db.relationship(
+        'User', backref=db.backref('timetables', cascade='all')
+    )
+    
+    @property
+    def slot(self):
+        """The parsed Slot, or None if the day/time could not be parsed."""
+        if self.weekday is None:
+            return None
+        return slots.Slot(self.weekday, self.start_minute, self.end_minute)
+    
+    def parse_slot(self):
+        """
+        Fill weekday, start_minute and end_minute from day and time.
+        
+        Returns:
+            Slot or None if the day/time could not be parsed
+        """
+        try:
+            slot = slots.parse_slot(self.day, self.time)
+        except ValueError:
+            slot = None
+        self.weekday, self.start_minute, self.end_minute = slot or (None, None, None)
+        return slot
+    
+    def to_dict(self):
+        """Return the entry's columns as a JSON-serializable dict."""
+        return {
+            'id': self.id,
+            'course_name': self.course_name,
+            'day': self.day,
+            'time': self.time,
+            'weekday': self.weekday,
+            'start_minute': self.start_minute,
+            'end_minute': self.end_minute,
+            'user_id': self.user_id,
+        }
+
+
+@event.listens_for(Timetable, 'before_insert')
+@event.listens_for(Timetable, 'before_update')
+def sync_timetable_slot(mapper, connection, target):
+    """Keep the structured slot columns in step with the day and time text."""
+    target.parse_slot()
+
+
+class Enrollment(db.Model):
+    """
+    Enrollment model linking a student to a scheduled class.
+    
+    The (student_id, timetable_id) unique index doubles as the lookup
+    index for a student's schedule; ix_enrollment_timetable_id serves
+    the reverse lookup when a class is deleted.
+    
+    Attributes:
+        id: Unique identifier for the enrollment
+        student_id: Foreign key linking to the enrolled student
+        timetable_id: Foreign key linking to the scheduled class
+        student: Relationship to the User model
+        timetable: Relationship to the Timetable model
+    """
+    
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'timetable_id', name='uq_enrollment_student_timetable'),
+        db.Index('ix_enrollment_timetable_id', 'timetable_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(
+        db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False
+    )
+    timetable_id = db.Column(
+        db.Integer, db.ForeignKey('timetable.id', ondelete='CASCADE'), nullable=False
+    )
+    student = db.relationship('User')
+    timetable = db.relationship('Timetable')
+
+
+class TimetableChange(db.Model):
+    """
+    Change log of timetable entries, one row per entry per affected user.
+    
+    The id is the global, monotonically increasing sync version: a client
+    that has seen version N asks for the entries named by its rows with
+    id > N (see sync.py). Rows outlive the entries and users they name,
+    so neither column is a foreign key; old rows are removed with the
+    prune-timetable-changes command.
+    
+    Attributes:
+        id: Sync version of the change
+        user_id: Teacher or student whose timetable the change touches
+        timetable_id: Entry that was added, changed or deleted
+        changed_at: When the change was logged
+    """
+    
+    __tablename__ = 'timetable_change'
+    __table_args__ = (
+        db.Index('ix_timetable_change_user_id', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    timetable_id = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.DateTime, server_default=func.now(), index=True)
+
+
+class DashboardStat(db.Model):
+    """
+    One counter shown on the admin dashboard, kept current by stats.py.
+    
+    Attributes:
+        id: Unique identifier for the counter
+        kind: 'role', 'day', 'teacher' or 'course'
+        key: Role name, weekday number, teacher id or course name
+        count: Current value
+    """
+    
+    __tablename__ = 'dashboard_stat'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'key', name='uq_dashboard_stat_kind_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ScheduleJobRecord(db.Model):
+    """
+    Last known state of a timetable generation job (see scheduler.py).
+    
+    Jobs run in the server worker that accepted them, but a status poll
+    or a re-solve may reach any worker, so every state change is copied
+    here.
+    
+    Attributes:
+        id: Job id
+        state: 'queued', 'running', 'done' or 'failed'
+        status: The job's status JSON, as the status route returns it
+        assignments: The solved assignments as JSON (dump_assignments()),
+            once the job has a schedule
+        entries: [course key, session number, Timetable id] rows as JSON
+            for the entries that hold the job's sessions once it is done;
+            a re-solve from this job replaces them
+        updated_at: When the state last changed
+    """
+    
+    __tablename__ = 'schedule_job'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    state = db.Column(db.String(10), nullable=False)
+    status = db.Column(db.Text, nullable=False)
+    assignments = db.Column(db.Text)
+    entries = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class UserVersion(db.Model):
+    """
+    Single-row counter bumped whenever a user's cached identity (name,
+    email, role) changes or a user is deleted, shared by all worker
+    processes so each can tell when its user cache is stale.
+    
+    Attributes:
+        id: Always 1
+        version: Incremented in the transaction of each such change
+    """
+    
+    __tablename__ = 'user_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+def bump_user_version(executor):
+    """
+    Increment the shared user version inside the caller's transaction.
+    
+    Args:
+        executor: Session or Core connection of the write
+    """
+    dbconfig.increment(executor, UserVersion.__table__, {'id': 1}, 'version', 1)
+
+
+@event.listens_for(User, 'after_update')
+def user_identity_changed(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('name', 'email', 'role')):
+        bump_user_version(connection)
+
+
+@event.listens_for(User, 'after_delete')
+def user_deleted(mapper, connection, target):
+    bump_user_version(connection)
+
+
+def _id_list(ids):
+    # A select() of ids is used as a subquery; anything else is materialized.
+    return ids if isinstance(ids, Select) else list(ids)
+
+
+def log_timetable_changes(executor, timetable_ids, student_id=None):
+    """
+    Log changed entries for every user who sees them and bump their versions.
+    
+    Call it in the same transaction as the write: after new entries have
+    ids, and before entries or enrollments are deleted, so the affected
+    teacher and students can still be found.
+    
+    Args:
+        executor: Session or Core connection to run the statements on
+        timetable_ids: Ids, or a select() of ids, of the changed entries
+        student_id: Only log for this student (a new enrollment), not
+            for the entries' teachers and other students
+    """
+    timetable_ids = _id_list(timetable_ids)
+    if not isinstance(timetable_ids, Select) and not timetable_ids:
+        return
+    students = select(Enrollment.student_id, Enrollment.timetable_id).where(
+        Enrollment.timetable_id.in_(timetable_ids)
+    )
+    if student_id is not None:
+        affected = students.where(Enrollment.student_id == student_id)
+    else:
+        affected = union_all(
+            select(Timetable.user_id, Timetable.id).where(
+                Timetable.id.in_(timetable_ids), Timetable.user_id.is_not(None)
+            ),
+            students
+        )
+    executor.execute(
+        insert(TimetableChange).from_select(['user_id', 'timetable_id'], affected)
+    )
+    if student_id is not None:
+        bump_timetable_versions(executor, user_ids=[student_id])
+    else:
+        bump_timetable_versions(executor, timetable_ids=timetable_ids)
+
+
+def bump_timetable_versions(executor, user_ids=(), timetable_ids=()):
+    """
+    Increment the timetable_version of every user a change touches.
+    
+    Call it in the same transaction as the write, and before deleting
+    entries or enrollments, so the affected users can still be found.
+    
+    Args:
+        executor: Session or Core connection to run the UPDATE on
+        user_ids: Users whose own classes changed
+        timetable_ids: Ids, or a select() of ids, of entries that
+            changed; their teacher and every enrolled student are bumped
+    """
+    conditions = []
+    user_ids, timetable_ids = list(user_ids), _id_list(timetable_ids)
+    if user_ids:
+        conditions.append(User.id.in_(user_ids))
+    if isinstance(timetable_ids, Select) or timetable_ids:
+        conditions.append(User.id.in_(
+            select(Timetable.user_id).where(Timetable.id.in_(timetable_ids))
+        ))
+        conditions.append(User.id.in_(
+            select(Enrollment.student_id).where(Enrollment.timetable_id.in_(timetable_ids))
+        ))
+    if not conditions:
+        return
+    executor.execute(
+        update(User.__table__)
+        .where(or_(*conditions))
+        .values(timetable_version=func.coalesce(User.__table__.c.timetable_version, 0) + 1)
+    )
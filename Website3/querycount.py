@@ -0,0 +1,68 @@
+"""
+Query Counting Module
+
+Counts the SQL statements each request sends to the database and lets
+views declare a query budget. A view that goes over its budget (the
+classic symptom of an N+1 lazy-loading bug) logs a warning; the request
+itself is never failed. tests/test_dashboard.py checks that the admin
+dashboard's statement count does not grow with the data.
+"""
+
+import functools
+import logging
+
+from flask import g, has_app_context
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g._query_count = g.get('_query_count', 0) + 1
+
+
+def init_app(app, db):
+    """
+    Attach the statement counter to the app's engine.
+    
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension bound to the app
+    """
+    with app.app_context():
+        if not event.contains(db.engine, 'before_cursor_execute', _count_statement):
+            event.listen(db.engine, 'before_cursor_execute', _count_statement)
+
+
+def query_count():
+    """
+    Return the number of SQL statements run so far in the current app context.
+    
+    Returns:
+        int: Statements executed since the context was pushed
+    """
+    return g.get('_query_count', 0)
+
+
+def query_budget(limit):
+    """
+    Decorate a view so that it may run at most `limit` SQL statements.
+    
+    Args:
+        limit: Maximum number of statements the view body may execute
+    
+    Returns:
+        Decorator for a Flask view function
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            start = query_count()
+            response = view(*args, **kwargs)
+            used = query_count() - start
+            if used > limit:
+                logger.warning('%s ran %d SQL statements (budget %d)', view.__name__, used, limit)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,454 @@
+"""
+Timetable Scheduler Module
+
+Places the weekly sessions of a set of courses into free time slots.
+Hard constraints: a teacher never teaches two sessions at once, a
+student group never attends two sessions at once, a teacher teaches at
+most `max_per_day` sessions a day, and nothing is placed over a
+teacher's existing classes or unavailable times. As soft preferences,
+sessions of one course are spread over different days and teachers'
+days are kept evenly loaded.
+
+The day is cut into `step`-minute cells and each (teacher or group,
+day) pair keeps a bitmask of its busy cells, so testing a slot is a few
+integer ANDs. Sessions are first placed greedily, most constrained
+first. Any left over are then placed by a min-conflicts search: take
+an unplaced session, put it where it displaces the fewest placed ones,
+requeue those, and repeat until everything is placed or the time budget
+runs out. The best assignment seen is returned.
+
+Passing a previous Schedule as `initial` re-solves incrementally: its
+placements that are still valid are kept and only the sessions they no
+longer fit are searched for, so changing one constraint moves few
+sessions.
+
+ScheduleJobs runs solves in the background, one at a time, in a spawned
+worker process (or a thread), and hands each result to a write callback.
+A record callback sees every state change, so the app can keep job
+state where all of its server workers can read it.
+"""
+
+import logging
+import multiprocessing
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import slots
+
+Course = namedtuple('Course', 'key course_name teacher_id sessions duration groups')
+Problem = namedtuple('Problem', 'courses blocked days day_start day_end step max_per_day')
+Schedule = namedtuple('Schedule', 'assignments unplaced complete elapsed iterations')
+
+logger = logging.getLogger(__name__)
+
+FIXED = -1
+TABU_TENURE = 10
+
+
+class _Search:
+    """Mutable search state for one solve() call."""
+
+    def __init__(self, problem, seed):
+        self.problem = problem
+        self.rng = random.Random(seed)
+        self.cells = (problem.day_end - problem.day_start) // problem.step
+        self.sessions = []
+        for course in problem.courses:
+            length = -(-course.duration // problem.step)
+            resources = (('teacher', course.teacher_id),) + tuple(('group', g) for g in course.groups)
+            for number in range(course.sessions):
+                self.sessions.append(((course.key, number), course, length, resources))
+
+        self.masks = {}
+        self.owners = {}
+        self.load = {}
+        self.course_days = {}
+        self.assigned = [None] * len(self.sessions)
+        self.tabu = {}
+
+        for teacher_id, slot in problem.blocked:
+            if slot.weekday not in problem.days:
+                continue
+            first = max((slot.start - problem.day_start) // problem.step, 0)
+            last = min(-(-(slot.end - problem.day_start) // problem.step), self.cells)
+            if first >= last:
+                continue
+            key = (('teacher', teacher_id), slot.weekday)
+            owners = self._owners(key)
+            for cell in range(first, last):
+                owners[cell] = FIXED
+            self.masks[key] = self.masks.get(key, 0) | (((1 << (last - first)) - 1) << first)
+
+        self.domains = []
+        for _, course, length, _ in self.sessions:
+            teacher = ('teacher', course.teacher_id)
+            self.domains.append([
+                (day, cell)
+                for day in problem.days
+                for cell in range(self.cells - length + 1)
+                if not self.masks.get((teacher, day), 0) & (((1 << length) - 1) << cell)
+            ])
+
+    def _owners(self, key):
+        owners = self.owners.get(key)
+        if owners is None:
+            owners = self.owners[key] = [None] * self.cells
+        return owners
+
+    def feasible(self, index, value):
+        _, course, length, resources = self.sessions[index]
+        day, cell = value
+        bits = ((1 << length) - 1) << cell
+        for resource in resources:
+            if self.masks.get((resource, day), 0) & bits:
+                return False
+        return len(self.load.get((course.teacher_id, day), ())) < self.problem.max_per_day
+
+    def place(self, index, value):
+        _, course, length, resources = self.sessions[index]
+        day, cell = value
+        bits = ((1 << length) - 1) << cell
+        for resource in resources:
+            key = (resource, day)
+            self.masks[key] = self.masks.get(key, 0) | bits
+            owners = self._owners(key)
+            for position in range(cell, cell + length):
+                owners[position] = index
+        self.load.setdefault((course.teacher_id, day), set()).add(index)
+        course_day = (course.key, day)
+        self.course_days[course_day] = self.course_days.get(course_day, 0) + 1
+        self.assigned[index] = value
+
+    def unplace(self, index):
+        _, course, length, resources = self.sessions[index]
+        day, cell = self.assigned[index]
+        bits = ((1 << length) - 1) << cell
+        for resource in resources:
+            key = (resource, day)
+            self.masks[key] &= ~bits
+            owners = self.owners[key]
+            for position in range(cell, cell + length):
+                owners[position] = None
+        self.load[(course.teacher_id, day)].discard(index)
+        self.course_days[(course.key, day)] -= 1
+        self.assigned[index] = None
+
+    def preference(self, index, value):
+        """
+        Lower is better: spread a course over days, balance daily load,
+        then pack the day from the start so free time stays contiguous.
+        """
+        course = self.sessions[index][1]
+        day, cell = value
+        return (
+            self.course_days.get((course.key, day), 0),
+            len(self.load.get((course.teacher_id, day), ())),
+            cell
+        )
+
+    def conflicts(self, index, value):
+        """Placed sessions that would have to move for `value`, or None if blocked."""
+        _, course, length, resources = self.sessions[index]
+        day, cell = value
+        found = set()
+        for resource in resources:
+            owners = self.owners.get((resource, day))
+            if owners is None:
+                continue
+            for position in range(cell, cell + length):
+                owner = owners[position]
+                if owner == FIXED:
+                    return None
+                if owner is not None:
+                    found.add(owner)
+        same_day = self.load.get((course.teacher_id, day), frozenset())
+        if len(same_day - found) >= self.problem.max_per_day:
+            found.add(self.rng.choice(sorted(same_day - found)))
+        return found
+
+    def greedy(self, indexes):
+        """Place each session at its best feasible value; return the rest."""
+        left = []
+        for index in indexes:
+            values = [value for value in self.domains[index] if self.feasible(index, value)]
+            if values:
+                self.place(index, min(values, key=lambda value: self.preference(index, value)))
+            else:
+                left.append(index)
+        return left
+
+    def repair(self, unplaced, deadline):
+        """Min-conflicts search over unplaced sessions until the deadline."""
+        unplaced = list(unplaced)
+        best = (len(unplaced), list(self.assigned))
+        iterations = 0
+        while unplaced and time.perf_counter() < deadline:
+            iterations += 1
+            index = unplaced.pop(self.rng.randrange(len(unplaced)))
+            choice, choice_score = None, None
+            for value in self.domains[index]:
+                if self.tabu.get((index, value), 0) > iterations:
+                    continue
+                found = self.conflicts(index, value)
+                if found is None:
+                    continue
+                score = (len(found), self.rng.random())
+                if choice_score is None or score < choice_score:
+                    choice, choice_score, evicted = value, score, found
+                    if not found:
+                        break
+            if choice is None:
+                unplaced.append(index)
+                continue
+            for other in evicted:
+                self.tabu[(other, self.assigned[other])] = iterations + TABU_TENURE
+                self.unplace(other)
+                unplaced.append(other)
+            self.place(index, choice)
+            if len(unplaced) < best[0]:
+                best = (len(unplaced), list(self.assigned))
+        return best[1], iterations
+
+    def slot(self, index, value):
+        course = self.sessions[index][1]
+        day, cell = value
+        start = self.problem.day_start + cell * self.problem.step
+        return slots.Slot(day, start, start + course.duration)
+
+    def value_of(self, slot):
+        offset = slot.start - self.problem.day_start
+        if offset % self.problem.step:
+            return None
+        return (slot.weekday, offset // self.problem.step)
+
+
+def solve(problem, time_budget=10.0, initial=None, seed=0):
+    """
+    Find slots for every session of every course in `problem`.
+
+    Args:
+        problem: Problem describing courses, blocked times and the week
+        time_budget: Seconds the search may run before returning the best
+            assignment found so far
+        initial: Previous Schedule (or its assignments) to re-solve from
+        seed: Random seed; the same inputs and seed give the same result
+            when the search finishes within its budget
+
+    Returns:
+        Schedule: assignments maps (course key, session number) to a Slot;
+        unplaced lists the session keys that could not be placed
+    """
+    started = time.perf_counter()
+    search = _Search(problem, seed)
+    previous = getattr(initial, 'assignments', initial) or {}
+
+    pending = []
+    for index, (key, _, _, _) in enumerate(search.sessions):
+        value = search.value_of(previous[key]) if key in previous else None
+        if value in search.domains[index] and search.feasible(index, value):
+            search.place(index, value)
+        else:
+            pending.append(index)
+
+    # Most constrained first: fewest candidate slots, then busiest resources.
+    demand = {}
+    for _, course, length, resources in search.sessions:
+        for resource in resources:
+            demand[resource] = demand.get(resource, 0) + length
+    pending.sort(key=lambda index: (
+        len(search.domains[index]),
+        -max(demand[resource] for resource in search.sessions[index][3])
+    ))
+    left = search.greedy(pending)
+
+    iterations = 0
+    assigned = search.assigned
+    if left:
+        assigned, iterations = search.repair(left, started + time_budget)
+
+    assignments, unplaced = {}, []
+    for index, value in enumerate(assigned):
+        key = search.sessions[index][0]
+        if value is None:
+            unplaced.append(key)
+        else:
+            assignments[key] = search.slot(index, value)
+    return Schedule(
+        assignments, unplaced, not unplaced, time.perf_counter() - started, iterations
+    )
+
+
+def dump_assignments(assignments):
+    """Return a Schedule's assignments as JSON-friendly [key, number, weekday, start, end] rows."""
+    return [
+        [key, number, slot.weekday, slot.start, slot.end]
+        for (key, number), slot in sorted(assignments.items())
+    ]
+
+
+def load_assignments(rows):
+    """Rebuild assignments from dump_assignments() rows, e.g. as `initial` for solve()."""
+    return {
+        (key, number): slots.Slot(weekday, start, end)
+        for key, number, weekday, start, end in rows
+    }
+
+
+class ScheduleJob:
+    """
+    State of one background solve.
+
+    Attributes:
+        id: Job id
+        state: 'queued', 'running', 'done' or 'failed'
+        schedule: Schedule once solved
+        written: Entries written by the write callback
+        rejected: Session keys the write callback refused (clashes that
+            appeared while solving)
+        replaces: Mapping of session key to the stored entry id an
+            earlier job wrote for it, which this job's result replaces
+        entries: Mapping of session key to the stored entry id that holds
+            the session once the job is done (a dry run keeps `replaces`)
+        error: Message if the job failed
+    """
+
+    def __init__(self, problem, time_budget, initial, write, replaces=None):
+        self.id = uuid.uuid4().hex
+        self.problem = problem
+        self.time_budget = time_budget
+        self.initial = initial
+        self.write = write
+        self.replaces = dict(replaces or {})
+        self.state = 'queued'
+        self.schedule = None
+        self.written = 0
+        self.rejected = []
+        self.entries = {}
+        self.error = None
+
+    def to_dict(self):
+        data = {'id': self.id, 'state': self.state, 'write': self.write}
+        if self.schedule is not None:
+            data.update(
+                placed=len(self.schedule.assignments),
+                unplaced=[list(key) for key in self.schedule.unplaced],
+                complete=self.schedule.complete,
+                elapsed=round(self.schedule.elapsed, 3),
+                iterations=self.schedule.iterations,
+                written=self.written,
+                rejected=[list(key) for key in self.rejected]
+            )
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+
+class ScheduleJobs:
+    """
+    Run scheduling jobs one at a time in the background.
+
+    Jobs are solved in a single spawned worker process, so a long search
+    never holds the web server's GIL, or in a thread when `processes` is
+    False. The result is passed to `write(problem, schedule, replaces)`
+    in the job thread, which returns (written count, rejected session
+    keys, entry ids by session key). Queued
+    and running jobs are always remembered, plus the most recent `keep`
+    finished ones, for status polling and as starting points for
+    incremental re-solves. `record(job)` is called
+    when a job is queued, starts running and finishes; its errors are
+    logged and do not fail the job.
+
+    Args:
+        write: Callback that stores a finished schedule
+        processes: Solve in a worker process rather than a thread
+        keep: Number of finished jobs to remember
+        record: Optional callback that persists a job's state
+    """
+
+    def __init__(self, write, processes=True, keep=20, record=None):
+        self._write = write
+        self._record = record
+        self.processes = processes
+        self.keep = keep
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scheduler')
+        self._pool = None
+
+    def submit(self, problem, time_budget, initial=None, write=True, replaces=None):
+        """
+        Queue a solve and return its ScheduleJob.
+
+        Args:
+            problem: Problem to solve
+            time_budget: Search time budget in seconds
+            initial: Previous Schedule to re-solve from
+            write: Store the result when done (False for a dry run)
+            replaces: The previous job's entries by session key, which
+                write() moves or deletes instead of adding to
+        """
+        job = ScheduleJob(problem, time_budget, initial, write, replaces)
+        with self._lock:
+            self._jobs[job.id] = job
+            finished = [old.id for old in self._jobs.values() if old.state in ('done', 'failed')]
+            for job_id in finished[:max(len(finished) - self.keep, 0)]:
+                del self._jobs[job_id]
+        self._save(job)
+        self._runner.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _solve(self, job):
+        if not self.processes:
+            return solve(job.problem, job.time_budget, job.initial)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn')
+            )
+        try:
+            return self._pool.submit(solve, job.problem, job.time_budget, job.initial).result()
+        except BrokenProcessPool:
+            # The worker died (e.g. OOM-killed); fail this job, start fresh for the next.
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            raise
+
+    def _save(self, job):
+        if self._record is None:
+            return
+        try:
+            self._record(job)
+        except Exception:
+            logger.exception('Could not record the state of schedule job %s', job.id)
+
+    def _run(self, job):
+        job.state = 'running'
+        self._save(job)
+        try:
+            job.schedule = self._solve(job)
+            if job.write:
+                job.written, job.rejected, job.entries = self._write(
+                    job.problem, job.schedule, job.replaces
+                )
+            else:
+                job.entries = dict(job.replaces)
+            job.state = 'done'
+        except Exception as exc:
+            job.error = f'{type(exc).__name__}: {exc}'
+            job.state = 'failed'
+        self._save(job)
+
+    def shutdown(self):
+        """Stop the worker thread and process."""
+        self._runner.shutdown(wait=False, cancel_futures=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,325 @@
+"""
+Time Slots Module
+
+Parses the free-text day and time of a timetable entry ("Monday",
+"10:00 AM", "Tue", "14:30-16:00") into a structured slot: a weekday
+number (Monday = 0) and start/end minutes from midnight. Times without
+an explicit end are given DEFAULT_DURATION minutes.
+
+It also provides IntervalIndex, an in-memory index of slots grouped by
+a key (for timetables, the teacher and weekday) that answers "what
+overlaps this slot" with a binary search instead of a scan.
+"""
+
+import bisect
+import re
+import threading
+import time
+from collections import namedtuple
+
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+DEFAULT_DURATION = 60
+MINUTES_PER_DAY = 24 * 60
+
+Slot = namedtuple('Slot', 'weekday start end')
+
+_DAY_NAMES = {}
+for _number, _name in enumerate(DAYS):
+    for _length in range(3, len(_name) + 1):
+        _DAY_NAMES.setdefault(_name[:_length].lower(), _number)
+
+_TIME = re.compile(r'\s*(\d{1,2})(?:[:.](\d{2}))?\s*([ap])?\.?\s*(?:m\.?)?\s*\Z', re.IGNORECASE)
+_RANGE = re.compile(r'\s*-\s*|\s+to\s+', re.IGNORECASE)
+
+
+def parse_day(value):
+    """
+    Parse a day name or abbreviation.
+
+    Args:
+        value: Text such as 'Monday', 'mon' or 'Thurs'
+
+    Returns:
+        int: Weekday number, Monday = 0
+
+    Raises:
+        ValueError: If the text is not a day of the week
+    """
+    try:
+        return _DAY_NAMES[(value or '').strip().rstrip('.').lower()]
+    except KeyError:
+        raise ValueError(f'Unknown day: {value!r}')
+
+
+def parse_time(value):
+    """
+    Parse a clock time in 12- or 24-hour form.
+
+    Args:
+        value: Text such as '10:00 AM', '2pm' or '14:30'
+
+    Returns:
+        int: Minutes after midnight
+
+    Raises:
+        ValueError: If the text is not a valid time
+    """
+    match = _TIME.match(value or '')
+    if not match:
+        raise ValueError(f'Unknown time: {value!r}')
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if minute > 59:
+        raise ValueError(f'Unknown time: {value!r}')
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f'Unknown time: {value!r}')
+        hour = hour % 12 + (12 if meridiem.lower() == 'p' else 0)
+    elif hour > 23:
+        raise ValueError(f'Unknown time: {value!r}')
+    return hour * 60 + minute
+
+
+def _meridiem(value):
+    return _TIME.match(value).group(3)
+
+
+def _time_or_none(value):
+    try:
+        return parse_time(value)
+    except ValueError:
+        return None
+
+
+def parse_times(time_text, duration=DEFAULT_DURATION):
+    """
+    Parse the time column of a timetable entry.
+
+    The time may be a single start time or a 'start - end' range. When
+    only one end of a range says AM or PM ('1:00 - 2:30 PM'), the other
+    end is read the same way unless that would put the start after the end.
+
+    Args:
+        time_text: Start time or time range text
+        duration: Class length in minutes when no end time is given
+
+    Returns:
+        tuple: (start, end) minutes after midnight
+
+    Raises:
+        ValueError: If the text cannot be parsed or the end is not after
+            the start
+    """
+    parts = _RANGE.split((time_text or '').strip(), maxsplit=1)
+    if len(parts) == 1:
+        start = parse_time(parts[0])
+        return start, min(start + duration, MINUTES_PER_DAY)
+
+    start_text, end_text = parts
+    start, end = parse_time(start_text), parse_time(end_text)
+    start_meridiem, end_meridiem = _meridiem(start_text), _meridiem(end_text)
+    if end_meridiem and not start_meridiem:
+        adjusted = _time_or_none(f'{start_text} {end_meridiem}m')
+        if adjusted is not None and adjusted < end:
+            start = adjusted
+    elif start_meridiem and not end_meridiem:
+        adjusted = _time_or_none(f'{end_text} {start_meridiem}m')
+        if adjusted is not None and adjusted > start:
+            end = adjusted
+    if end <= start:
+        raise ValueError(f'End time is not after start time: {time_text!r}')
+    return start, end
+
+
+def parse_slot(day, time_text, duration=DEFAULT_DURATION):
+    """
+    Parse the day and time columns of a timetable entry.
+
+    Args:
+        day: Day text
+        time_text: Start time or time range text
+        duration: Class length in minutes when no end time is given
+
+    Returns:
+        Slot: weekday, start and end minutes
+
+    Raises:
+        ValueError: If either value cannot be parsed
+    """
+    return Slot(parse_day(day), *parse_times(time_text, duration))
+
+
+def format_slot(slot):
+    """Format a Slot as 'Monday 10:00 AM - 11:00 AM'."""
+    return f"{DAYS[slot.weekday]} {format_minutes(slot.start)} - {format_minutes(slot.end)}"
+
+
+def overlaps(first, second):
+    """Whether two slots (either may be None) share any time."""
+    return (
+        first is not None and second is not None and first.weekday == second.weekday
+        and first.start < second.end and second.start < first.end
+    )
+
+
+def format_minutes(minutes):
+    """Format minutes after midnight as '10:00 AM'."""
+    hour, minute = divmod(minutes, 60)
+    return f"{(hour % 12) or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+class IntervalIndex:
+    """
+    In-memory index of half-open [start, end) intervals grouped by key.
+
+    Each key's intervals are kept sorted by start. An interval overlapping
+    [start, end) must start before `end` and after `start - longest`,
+    where `longest` is the longest interval ever added, so overlaps are
+    found with two binary searches plus a walk over that narrow window:
+    O(log n) per lookup and insert for the bounded lengths of school
+    classes. Overlapping intervals may be stored (existing double
+    bookings); lookups report all of them.
+
+    Attributes:
+        longest: Length of the longest interval added so far
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._entries = {}
+        self.longest = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, entry_id):
+        return entry_id in self._entries
+
+    def add(self, key, start, end, entry_id):
+        """
+        Add or move the interval identified by `entry_id`.
+
+        Args:
+            key: Group the interval belongs to
+            start: Start of the interval
+            end: End of the interval (exclusive)
+            entry_id: Unique id of the interval
+        """
+        self.remove(entry_id)
+        bisect.insort(self._buckets.setdefault(key, []), (start, end, entry_id))
+        self._entries[entry_id] = (key, start, end)
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, entry_id):
+        """Remove the interval identified by `entry_id`, if present."""
+        found = self._entries.pop(entry_id, None)
+        if found is None:
+            return
+        key, start, end = found
+        bucket = self._buckets[key]
+        del bucket[bisect.bisect_left(bucket, (start, end, entry_id))]
+        if not bucket:
+            del self._buckets[key]
+
+    def overlaps(self, key, start, end, exclude=None):
+        """
+        Find intervals under `key` that overlap [start, end).
+
+        Args:
+            key: Group to search
+            start: Start of the interval
+            end: End of the interval (exclusive)
+            exclude: Entry id to ignore (the entry being edited)
+
+        Returns:
+            list: (start, end, entry_id) tuples, ordered by start
+        """
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return []
+        low = bisect.bisect_right(bucket, (start - self.longest, float('inf')))
+        high = bisect.bisect_left(bucket, (end,))
+        return [
+            interval for interval in bucket[low:high]
+            if interval[1] > start and interval[2] != exclude
+        ]
+
+
+class TimetableIndex:
+    """
+    Thread-safe IntervalIndex of timetable entries keyed by (teacher, weekday).
+
+    The index is loaded from the database on first use and kept current by
+    the routes that write timetable entries. It lives in process memory:
+    with several worker processes, changes made by another worker (or by
+    scripts writing to the database) are only seen after `ttl` seconds,
+    when the index is reloaded.
+
+    Attributes:
+        ttl: Seconds before the index is reloaded, or None to keep it
+        loads: Number of times the index was loaded
+    """
+
+    def __init__(self, load_rows, ttl=None):
+        """
+        Args:
+            load_rows: Callable returning (id, user_id, weekday, start, end)
+                rows for every entry with a structured slot
+            ttl: Seconds before the index is reloaded, or None to keep it
+        """
+        self._load_rows = load_rows
+        self._lock = threading.Lock()
+        self._index = None
+        self._loaded_at = 0.0
+        self.ttl = ttl
+        self.loads = 0
+
+    def _current(self):
+        expired = self.ttl is not None and time.monotonic() - self._loaded_at > self.ttl
+        if self._index is None or expired:
+            index = IntervalIndex()
+            for entry_id, user_id, weekday, start, end in self._load_rows():
+                index.add((user_id, weekday), start, end, entry_id)
+            self._index = index
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+        return self._index
+
+    def clashes(self, user_id, slot, exclude=None):
+        """
+        Return ids of the teacher's entries that overlap `slot`.
+
+        Args:
+            user_id: Teacher id
+            slot: Slot to check
+            exclude: Timetable id to ignore (the entry being edited)
+
+        Returns:
+            list: Clashing timetable ids, ordered by start time
+        """
+        with self._lock:
+            found = self._current().overlaps((user_id, slot.weekday), slot.start, slot.end, exclude)
+        return [entry_id for _, _, entry_id in found]
+
+    def update(self, entry_id, user_id, slot):
+        """Record the current slot of an entry (None removes it)."""
+        with self._lock:
+            index = self._current()
+            if slot is None or user_id is None:
+                index.remove(entry_id)
+            else:
+                index.add((user_id, slot.weekday), slot.start, slot.end, entry_id)
+
+    def remove(self, entry_id):
+        """Forget a deleted entry."""
+        with self._lock:
+            if self._index is not None:
+                self._index.remove(entry_id)
+
+    def clear(self):
+        """Drop the index so the next lookup reloads it."""
+        with self._lock:
+            self._index = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._current())
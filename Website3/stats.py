@@ -0,0 +1,256 @@
+"""
+Dashboard Statistics Module
+
+Keeps the admin dashboard's counts (users by role, classes per day,
+classes per teacher, enrolled students per course) in the dashboard_stat
+table, so showing them reads a few dozen summary rows instead of
+scanning the user, timetable and enrollment tables.
+
+ORM writes to User and Timetable are counted by the mapper events
+below, in the same transaction as the write. Core writes bypass those
+events, so the code that issues them reports its changes itself with
+count_new_entries(), count_entries(), count_users() and
+count_enrollments(). Anything else that writes
+the tables directly (generate.py, the migrations, hand-written SQL) must
+be followed by recompute(), also available as `flask --app app
+recompute-stats`.
+
+Students per course counts enrollments: a student enrolled in two
+sessions of a course counts twice.
+"""
+
+from collections import Counter
+
+from sqlalchemy import String, cast, event, func, literal, select, union_all
+
+from common import dbconfig
+import slots
+from models import db, User, Timetable, Enrollment, DashboardStat
+
+ROLE, DAY, TEACHER, COURSE = 'role', 'day', 'teacher', 'course'
+UNSCHEDULED = 'unscheduled'
+
+
+def day_key(weekday):
+    """Stat key of a parsed weekday, or UNSCHEDULED for None."""
+    return UNSCHEDULED if weekday is None else str(weekday)
+
+
+def adjust(executor, kind, key, delta):
+    """
+    Add `delta` to one counter inside the caller's transaction.
+
+    Args:
+        executor: Session or Core connection of the write
+        kind: ROLE, DAY, TEACHER or COURSE
+        key: Role, day_key(), teacher id or course name
+        delta: Amount to add, may be negative
+    """
+    if key is None or not delta:
+        return
+    dbconfig.increment(executor, DashboardStat.__table__, {'kind': kind, 'key': str(key)}, 'count', delta)
+
+
+def adjust_many(executor, kind, deltas):
+    """Apply a mapping of key -> delta for one kind of counter."""
+    for key, delta in deltas.items():
+        adjust(executor, kind, key, delta)
+
+
+def count_new_entries(executor, rows):
+    """
+    Count timetable rows inserted through Core (imports, generated schedules).
+
+    Args:
+        executor: Session or Core connection of the insert
+        rows: Inserted row dicts with weekday and user_id
+    """
+    adjust_many(executor, DAY, Counter(day_key(row['weekday']) for row in rows))
+    adjust_many(executor, TEACHER, Counter(row['user_id'] for row in rows if row['user_id']))
+
+
+def count_entries(executor, condition, sign, kinds=(DAY, TEACHER)):
+    """
+    Count timetable entries matching `condition` into or out of the day
+    and teacher counters, for set-based updates and deletes.
+
+    Call it before deleting or changing the entries (sign -1) and after
+    changing them (sign 1), in the same transaction.
+
+    Args:
+        executor: Session or Core connection of the write
+        condition: SQL condition on Timetable columns
+        sign: 1 or -1
+        kinds: Counters to adjust, DAY and/or TEACHER
+    """
+    if DAY in kinds:
+        rows = executor.execute(
+            select(Timetable.weekday, func.count()).where(condition).group_by(Timetable.weekday)
+        )
+        adjust_many(executor, DAY, {day_key(weekday): sign * count for weekday, count in rows})
+    if TEACHER in kinds:
+        rows = executor.execute(
+            select(Timetable.user_id, func.count())
+            .where(condition, Timetable.user_id.is_not(None))
+            .group_by(Timetable.user_id)
+        )
+        adjust_many(executor, TEACHER, {user_id: sign * count for user_id, count in rows})
+
+
+def count_users(executor, condition, sign):
+    """Count users matching `condition` into or out of users by role."""
+    rows = executor.execute(
+        select(User.role, func.count()).where(condition).group_by(User.role)
+    )
+    adjust_many(executor, ROLE, {role: sign * count for role, count in rows})
+
+
+def count_enrollments(executor, condition, sign):
+    """
+    Count enrollments matching `condition` into or out of students per course.
+
+    Call it after inserting enrollments (sign 1) or before deleting them
+    (sign -1), in the same transaction.
+
+    Args:
+        executor: Session or Core connection of the write
+        condition: SQL condition on Enrollment (and Timetable) columns
+        sign: 1 or -1
+    """
+    rows = executor.execute(
+        select(Timetable.course_name, func.count())
+        .select_from(Enrollment)
+        .join(Timetable, Timetable.id == Enrollment.timetable_id)
+        .where(condition)
+        .group_by(Timetable.course_name)
+    )
+    adjust_many(executor, COURSE, {course: sign * count for course, count in rows})
+
+
+def _change(target, name):
+    # (old, new) of an attribute changed in this flush, or None.
+    history = db.inspect(target).attrs[name].history
+    if not (history.added or history.deleted):
+        return None
+    return (
+        history.deleted[0] if history.deleted else None,
+        history.added[0] if history.added else None,
+    )
+
+
+@event.listens_for(User, 'after_insert')
+def count_inserted_user(mapper, connection, target):
+    adjust(connection, ROLE, target.role, 1)
+
+
+@event.listens_for(User, 'after_update')
+def count_changed_role(mapper, connection, target):
+    change = _change(target, 'role')
+    if change:
+        adjust(connection, ROLE, change[0], -1)
+        adjust(connection, ROLE, change[1], 1)
+
+
+@event.listens_for(User, 'after_delete')
+def count_deleted_user(mapper, connection, target):
+    adjust(connection, ROLE, target.role, -1)
+
+
+@event.listens_for(Timetable, 'after_insert')
+def count_inserted_entry(mapper, connection, target):
+    adjust(connection, DAY, day_key(target.weekday), 1)
+    adjust(connection, TEACHER, target.user_id, 1)
+
+
+@event.listens_for(Timetable, 'after_update')
+def count_changed_entry(mapper, connection, target):
+    weekday = _change(target, 'weekday')
+    if weekday:
+        adjust(connection, DAY, day_key(weekday[0]), -1)
+        adjust(connection, DAY, day_key(weekday[1]), 1)
+    teacher = _change(target, 'user_id')
+    if teacher:
+        adjust(connection, TEACHER, teacher[0], -1)
+        adjust(connection, TEACHER, teacher[1], 1)
+    course = _change(target, 'course_name')
+    if course:
+        enrolled = connection.scalar(
+            select(func.count()).select_from(Enrollment).where(Enrollment.timetable_id == target.id)
+        )
+        adjust(connection, COURSE, course[0], -enrolled)
+        adjust(connection, COURSE, course[1], enrolled)
+
+
+@event.listens_for(Timetable, 'after_delete')
+def count_deleted_entry(mapper, connection, target):
+    adjust(connection, DAY, day_key(target.weekday), -1)
+    adjust(connection, TEACHER, target.user_id, -1)
+
+
+def recompute(connection):
+    """
+    Rebuild every counter from the user, timetable and enrollment tables.
+
+    Args:
+        connection: Connection to run the recompute on (inside a transaction)
+    """
+    stats = DashboardStat.__table__
+    users, timetables, enrollments = User.__table__, Timetable.__table__, Enrollment.__table__
+    connection.execute(stats.delete())
+    connection.execute(stats.insert().from_select(['kind', 'key', 'count'], union_all(
+        select(literal(ROLE), users.c.role, func.count())
+        .where(users.c.role.is_not(None))
+        .group_by(users.c.role),
+        select(
+            literal(DAY),
+            func.coalesce(cast(timetables.c.weekday, String), UNSCHEDULED),
+            func.count()
+        ).group_by(timetables.c.weekday),
+        select(literal(TEACHER), cast(timetables.c.user_id, String), func.count())
+        .where(timetables.c.user_id.is_not(None))
+        .group_by(timetables.c.user_id),
+        select(literal(COURSE), timetables.c.course_name, func.count())
+        .select_from(enrollments.join(timetables, timetables.c.id == enrollments.c.timetable_id))
+        .where(timetables.c.course_name.is_not(None))
+        .group_by(timetables.c.course_name),
+    )))
+
+
+def load(session):
+    """
+    Read the dashboard counts.
+
+    Costs two small queries, whatever the size of the counted tables:
+    one over the summary rows and one for the names of counted teachers.
+
+    Returns:
+        dict: 'users_by_role' and 'students_per_course' ({name: count}),
+        'classes_per_day' ({day name: count}, in week order) and
+        'classes_per_teacher' ([{'id', 'name', 'count'}], busiest first)
+    """
+    counts = {ROLE: {}, DAY: {}, TEACHER: {}, COURSE: {}}
+    for kind, key, count in session.execute(
+        select(DashboardStat.kind, DashboardStat.key, DashboardStat.count)
+        .where(DashboardStat.count > 0)
+    ):
+        counts.setdefault(kind, {})[key] = count
+
+    days = {
+        slots.DAYS[int(key)] if key != UNSCHEDULED else 'Unscheduled': count
+        for key, count in sorted(counts[DAY].items(), key=lambda item: (item[0] == UNSCHEDULED, item[0]))
+    }
+    teacher_counts = {int(key): count for key, count in counts[TEACHER].items()}
+    names = dict(session.execute(
+        select(User.id, User.name).where(User.id.in_(teacher_counts), User.role == 'teacher')
+    ).all()) if teacher_counts else {}
+    teachers = sorted(
+        ({'id': user_id, 'name': names[user_id], 'count': count}
+         for user_id, count in teacher_counts.items() if user_id in names),
+        key=lambda teacher: (-teacher['count'], teacher['name'] or '')
+    )
+    return {
+        'users_by_role': dict(sorted(counts[ROLE].items())),
+        'classes_per_day': days,
+        'classes_per_teacher': teachers,
+        'students_per_course': dict(sorted(counts[COURSE].items())),
+    }
@@ -0,0 +1,124 @@
+"""
+Timetable Sync Module
+
+Lets dashboards keep a local copy of a user's timetable current without
+reloading it. Every write logs the entries it touched for each affected
+user in the timetable_change table (see models.log_timetable_changes),
+whose ids form one global, increasing version. A client that has seen
+version N asks for everything after N and gets back just the entries
+that were added or changed (their current rows) and the ids of those it
+should drop.
+
+Whether an entry counts as changed or deleted is decided by whether the
+user can still see it now, not by replaying the log, so repeated or
+out-of-order log rows for an entry collapse into one answer.
+
+On PostgreSQL, concurrent transactions may commit their log rows out of
+id order, so a change committed late with a lower id than a version a
+client already holds can be missed until that entry changes again.
+SQLite's single writer never commits out of order.
+
+ChangeNotifier wakes this process's open event streams as soon as a
+write commits; writes made by other processes are picked up on the
+streams' next poll.
+"""
+
+import json
+import threading
+
+from sqlalchemy import func, select
+
+from models import Timetable, TimetableChange
+
+
+def current_version(session):
+    """Return the latest sync version, 0 if nothing has been logged."""
+    return session.scalar(select(func.max(TimetableChange.id))) or 0
+
+
+def oldest_version(session):
+    """Return the lowest version a client can sync from without a full reload."""
+    oldest = session.scalar(select(func.min(TimetableChange.id)))
+    return oldest - 1 if oldest else 0
+
+
+def changes_since(session, visible, user_id, since):
+    """
+    Describe how a user's timetable changed after version `since`.
+
+    A client with no version (0), one older than the pruned log, or one
+    newer than the server's (a restored database) gets a full reload.
+
+    Args:
+        session: SQLAlchemy session
+        visible: select() of the Timetable entries the user sees now
+        user_id: Teacher or student id
+        since: Version the client already has
+
+    Returns:
+        dict: 'version' to send next time, 'full' (True when 'changed'
+        is the whole timetable and the client should drop everything
+        else), 'changed' entry dicts and 'deleted' entry ids
+    """
+    # Read the version first: a change logged after this point is
+    # reported next time rather than being skipped.
+    version = current_version(session)
+    if not since or since > version or since < oldest_version(session):
+        return {
+            'version': version,
+            'full': True,
+            'changed': [entry.to_dict() for entry in session.scalars(visible)],
+            'deleted': [],
+        }
+
+    changed_ids = set(session.scalars(
+        select(TimetableChange.timetable_id).where(
+            TimetableChange.user_id == user_id,
+            TimetableChange.id > since,
+            TimetableChange.id <= version
+        )
+    ))
+    changed = []
+    if changed_ids:
+        changed = session.scalars(visible.where(Timetable.id.in_(changed_ids))).all()
+    return {
+        'version': version,
+        'full': False,
+        'changed': [entry.to_dict() for entry in changed],
+        'deleted': sorted(changed_ids - {entry.id for entry in changed}),
+    }
+
+
+def format_event(payload, event='changes'):
+    """Encode a change set as a server-sent event whose id is its version."""
+    return f"id: {payload['version']}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+class ChangeNotifier:
+    """
+    Wakes threads waiting for timetable writes in this process.
+
+    Attributes:
+        generation: Incremented by every notify()
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self._condition = threading.Condition()
+
+    def notify(self):
+        """Record that a write committed and wake every waiting stream."""
+        with self._condition:
+            self.generation += 1
+            self._condition.notify_all()
+
+    def wait(self, generation, timeout):
+        """
+        Block until a write after `generation`, or until `timeout` seconds pass.
+
+        Returns:
+            int: The current generation
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
@@ -0,0 +1,50 @@
+"""The admin dashboard must run the same statements however much data there is."""
+from common import testing
+from conftest import login
+from models import db, User, Timetable
+
+DASHBOARD = '/admin/dashboard?teachers_page=1000'
+
+
+def add_teachers(count, start):
+    """Add `count` teachers with one class each (each class has its own user)."""
+    for number in range(start, start + count):
+        teacher = User(name=f'Teacher {number}', email=f'teacher{number}@example.com',
+                       role='teacher', password_hash='-')
+        db.session.add(teacher)
+        db.session.add(Timetable(course_name=f'Course {number}', day='Monday',
+                                 time='10:00 AM', user=teacher))
+    db.session.commit()
+
+
+def dashboard_statements(app, client):
+    """Return the number of SQL statements one dashboard request runs."""
+    with testing.statements(app, db) as statements:
+        # An empty teachers page keeps the class teachers out of the
+        # identity map, so only eager loading can avoid a query per class.
+        response = client.get(DASHBOARD)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_dashboard_statements_do_not_grow_with_rows(app):
+    with app.app_context():
+        admin = User(name='Admin', email='admin@example.com', role='admin', password_hash='-')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+        add_teachers(5, start=0)
+
+    # The first request claims the shared user version check for the test.
+    app.config['USER_CACHE_CHECK_INTERVAL'] = 60
+    client = app.test_client()
+    login(client, admin_id)
+    client.get(DASHBOARD)  # fills the user cache
+    few = dashboard_statements(app, client)
+
+    with app.app_context():
+        add_teachers(40, start=5)
+    many = dashboard_statements(app, client)
+
+    assert 'Course 44 Teacher 44' in client.get(DASHBOARD).get_data(as_text=True)
+    assert many == few
@@ -0,0 +1,136 @@
+"""Timetable generation requests and the background job runner."""
+import threading
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from conftest import login
+from models import db, User, Timetable, TimetableChange, DashboardStat
+from scheduler import Course, Problem, ScheduleJobs
+
+
+def add_user(name, role):
+    user = User(name=name, email=f'{name.lower()}@example.com', role=role, password_hash='-')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+@pytest.mark.parametrize('options', [
+    {'max_per_day': -1},
+    {'max_per_day': 0},
+    {'max_per_day': 'many'},
+    {'step': 0},
+    {'step': -30},
+    {'step': 'x'},
+    {'step': 600},
+])
+def test_out_of_range_options_are_rejected(app, options):
+    with app.app_context():
+        admin_id = add_user('Admin', 'admin')
+        teacher_id = add_user('Teacher', 'teacher')
+    client = app.test_client()
+    login(client, admin_id)
+    response = client.post('/admin/timetable/generate', json=dict({
+        'courses': [{'course_name': 'Math', 'teacher_id': teacher_id, 'sessions': 2}],
+        'write': False,
+    }, **options))
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
+def test_only_finished_jobs_are_evicted():
+    release = threading.Event()
+
+    def write(problem, schedule):
+        release.wait(5)
+        return 0, []
+
+    jobs = ScheduleJobs(write, processes=False, keep=1)
+    problem = Problem([Course('1:Math', 'Math', 1, 1, 60, ())], [], (0,), 480, 1020, 30, 4)
+    try:
+        # The first job blocks in write(), so the rest stay queued behind it.
+        submitted = [jobs.submit(problem, 0.1) for _ in range(4)]
+        assert all(jobs.get(job.id) is job for job in submitted)
+
+        release.set()
+        jobs._runner.submit(lambda: None).result(5)
+        jobs.submit(problem, 0.1, write=False)
+        remembered = [job for job in submitted if jobs.get(job.id) is not None]
+        assert remembered == submitted[-1:]
+    finally:
+        jobs.shutdown()
+
+
+def generate(client, spec):
+    """Start a generation job and wait for it to finish."""
+    response = client.post('/admin/timetable/generate', json=spec)
+    assert response.status_code == 202, response.json
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(response.headers['Location']).json
+        if job['state'] in ('done', 'failed') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def timetable_of(teacher_id):
+    return sorted(
+        (entry.weekday, entry.start_minute, entry.end_minute, entry.id)
+        for entry in db.session.scalars(select(Timetable).where(Timetable.user_id == teacher_id))
+    )
+
+
+def test_resolving_replaces_the_previous_jobs_entries(app):
+    with app.app_context():
+        admin_id = add_user('Admin', 'admin')
+        teacher_id = add_user('Teacher', 'teacher')
+    client = app.test_client()
+    login(client, admin_id)
+    spec = {
+        'courses': [{'course_name': 'Math', 'teacher_id': teacher_id, 'sessions': 3, 'duration': 60}],
+        'time_budget': 1,
+    }
+
+    first = generate(client, spec)
+    assert first['state'] == 'done' and first['written'] == 3
+    with app.app_context():
+        before = timetable_of(teacher_id)
+        version = db.session.get(User, teacher_id).timetable_version
+        changes = db.session.scalar(select(func.count()).select_from(TimetableChange))
+    assert [(day, start) for day, start, _, _ in before] == [(0, 480), (1, 480), (2, 480)]
+
+    second = generate(client, dict(
+        spec,
+        previous_job=first['id'],
+        unavailable=[{'teacher_id': teacher_id, 'day': 'Monday', 'time': '08:00 AM - 09:00 AM'}],
+    ))
+    assert second['state'] == 'done' and second['written'] == 3 and second['rejected'] == []
+    with app.app_context():
+        after = timetable_of(teacher_id)
+        assert len(after) == 3
+        assert (0, 480, 540) not in [entry[:3] for entry in after]
+        # The sessions kept their entries and were moved, not copied.
+        assert {entry[3] for entry in after} == {entry[3] for entry in before}
+        assert db.session.get(User, teacher_id).timetable_version > version
+        assert db.session.scalar(select(func.count()).select_from(TimetableChange)) > changes
+        days = db.session.scalars(select(DashboardStat).where(DashboardStat.kind == 'day')).all()
+        assert sum(stat.count for stat in days) == 3
+
+
+def test_resolving_without_a_session_deletes_its_entry(app):
+    with app.app_context():
+        admin_id = add_user('Admin', 'admin')
+        teacher_id = add_user('Teacher', 'teacher')
+    client = app.test_client()
+    login(client, admin_id)
+    course = {'course_name': 'Math', 'teacher_id': teacher_id, 'duration': 60}
+
+    first = generate(client, {'courses': [dict(course, sessions=3)], 'time_budget': 1})
+    second = generate(client, {
+        'courses': [dict(course, sessions=2)], 'time_budget': 1, 'previous_job': first['id']
+    })
+    assert second['state'] == 'done'
+    with app.app_context():
+        assert len(timetable_of(teacher_id)) == 2
@@ -0,0 +1,45 @@
+"""Dashboard counters kept by stats.py."""
+from sqlalchemy import select
+
+import stats
+from common import testing
+from models import db, User, DashboardStat
+
+
+def counters(kind):
+    rows = db.session.execute(
+        select(DashboardStat.key, DashboardStat.count).where(DashboardStat.kind == kind)
+    )
+    return dict(rows.all())
+
+
+def test_adjust_creates_increments_and_decrements(app):
+    with app.app_context():
+        stats.adjust(db.session, stats.COURSE, 'Maths', -1)
+        assert counters(stats.COURSE) == {}
+
+        stats.adjust(db.session, stats.COURSE, 'Maths', 2)
+        stats.adjust(db.session, stats.COURSE, 'Maths', 3)
+        stats.adjust(db.session, stats.COURSE, 'Maths', -4)
+        stats.adjust(db.session, stats.COURSE, 'Art', 0)
+        db.session.commit()
+        assert counters(stats.COURSE) == {'Maths': 1}
+
+
+def test_new_counter_is_a_single_upsert(app):
+    # A lone INSERT ... ON CONFLICT cannot race another worker creating the
+    # same counter the way UPDATE-then-INSERT could.
+    with testing.statements(app, db) as executed:
+        with app.app_context():
+            db.session.add(User(name='Ann', email='ann@example.com', role='teacher', password_hash='-'))
+            db.session.add(User(name='Bob', email='bob@example.com', role='teacher', password_hash='-'))
+            db.session.commit()
+    writes = [s for s in executed if 'dashboard_stat' in s]
+    assert len(writes) == 2
+    assert all(s.startswith('INSERT') and 'ON CONFLICT' in s for s in writes)
+
+    with app.app_context():
+        assert counters(stats.ROLE) == {'teacher': 2}
+        db.session.delete(db.session.scalar(select(User).filter_by(name='Ann')))
+        db.session.commit()
+        assert counters(stats.ROLE) == {'teacher': 1}
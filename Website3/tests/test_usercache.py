@@ -0,0 +1,97 @@
+"""The user cache across requests and worker processes."""
+import time
+
+import jinja2
+import pytest
+from sqlalchemy import select
+
+import bulk
+from app import create_app
+from common import testing
+from conftest import TEMPLATES, login
+from models import db, User, UserVersion
+
+STATS = '/admin/user-cache'
+
+
+@pytest.fixture
+def other_worker(app, tmp_path):
+    """A second app on the same database, standing in for another server worker."""
+    other = testing.build_app(
+        create_app, db, tmp_path, PASSWORD_HASH_WORKERS=0, SCHEDULER_PROCESSES=False
+    )
+    other.jinja_env.loader = jinja2.DictLoader(TEMPLATES)
+    yield other
+    testing.dispose_app(other, db)
+
+
+def add_admin(app, name='Admin'):
+    with app.app_context():
+        admin = User(name=name, email=f'{name.lower()}@example.com', role='admin', password_hash='-')
+        db.session.add(admin)
+        db.session.commit()
+        return admin.id
+
+
+def shared_version(app):
+    with app.app_context():
+        return db.session.scalar(select(UserVersion.version))
+
+
+def test_cached_requests_run_no_user_query(app):
+    app.config['USER_CACHE_CHECK_INTERVAL'] = 60
+    client = app.test_client()
+    login(client, add_admin(app))
+    assert client.get(STATS).status_code == 200
+
+    with testing.statements(app, db) as executed:
+        assert client.get(STATS).status_code == 200
+    assert executed == []
+
+
+def test_demotion_on_another_worker_applies_within_the_interval(app, other_worker):
+    app.config['USER_CACHE_CHECK_INTERVAL'] = 0.2
+    admin_id = add_admin(app)
+    client = app.test_client()
+    login(client, admin_id)
+    assert client.get(STATS).status_code == 200
+
+    with other_worker.app_context():
+        db.session.get(User, admin_id).role = 'student'
+        db.session.commit()
+    time.sleep(0.25)
+    assert client.get(STATS).status_code == 302
+
+
+def test_deletion_on_another_worker_logs_the_user_out(app, other_worker):
+    app.config['USER_CACHE_CHECK_INTERVAL'] = 0.2
+    admin_id = add_admin(app)
+    with app.app_context():
+        student = User(name='Sam', email='sam@example.com', role='student', password_hash='-')
+        db.session.add(student)
+        db.session.commit()
+        student_id = student.id
+    client = app.test_client()
+    login(client, student_id)
+    client.get(STATS)
+    assert app.extensions['user_cache'].stats()['size'] == 1
+
+    with other_worker.app_context():
+        bulk.delete_users(db.session, [student_id, admin_id])
+        db.session.commit()
+    time.sleep(0.25)
+    client.get(STATS)
+    assert app.extensions['user_cache'].stats()['size'] == 0
+
+
+def test_only_identity_changes_bump_the_shared_version(app):
+    admin_id = add_admin(app)
+    assert shared_version(app) is None
+    with app.app_context():
+        db.session.get(User, admin_id).password_hash = 'changed'
+        db.session.commit()
+    assert shared_version(app) is None
+    with app.app_context():
+        db.session.get(User, admin_id).name = 'Renamed'
+        db.session.commit()
+    assert shared_version(app) == 1
@@ -0,0 +1,171 @@
+"""
+User Cache Module
+
+Bounded LRU cache with a TTL for the lightweight user records that
+Flask-Login's user_loader hands to every authenticated request. A hit
+skips the database entirely; routes that change or remove a user call
+invalidate() so the next request reloads it.
+
+The cache lives in process memory, so invalidate() only reaches the
+worker that made the edit. Every worker therefore also watches a shared
+version in the database (the user_version row, bumped in the same
+transaction as any change to a user's name, email or role and any user
+deletion). Reading it costs a query, so it is read only when check_due()
+says USER_CACHE_CHECK_INTERVAL has passed, and passed to sync(): a
+deleted or demoted user keeps their old record on another worker for at
+most that interval. USER_CACHE_TTL still bounds the age of an entry.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+
+class CachedUser(UserMixin):
+    """
+    Read-only identity record stored in the cache instead of the ORM object.
+    
+    Attributes:
+        id: User id
+        name: Full name of the user
+        email: Email address
+        role: User role ('admin', 'teacher', or 'student')
+    """
+
+    __slots__ = ('id', 'name', 'email', 'role')
+
+    def __init__(self, id, name, email, role):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'email', email)
+        object.__setattr__(self, 'role', role)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('CachedUser is read-only')
+
+    @classmethod
+    def from_user(cls, user):
+        """Copy the identity fields of a User model instance."""
+        return cls(user.id, user.name, user.email, user.role)
+
+
+class UserCache:
+    """
+    Thread-safe LRU + TTL cache of CachedUser records keyed by user id.
+    
+    Attributes:
+        maxsize: Maximum number of cached users
+        ttl: Seconds an entry stays valid
+        shared_version: Last database user version passed to sync()
+        checked_at: time.monotonic() of the last shared version check
+        hits: Lookups served from the cache
+        misses: Lookups that went to the loader
+    """
+
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared_version = None
+        self.checked_at = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id, load):
+        """
+        Return the cached record for `user_id`, loading it on a miss.
+        
+        Args:
+            user_id: User id to look up
+            load: Callable taking the id and returning a CachedUser or None
+        
+        Returns:
+            CachedUser, or None if the loader found no user (not cached)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        record = load(user_id)
+        if record is not None:
+            with self._lock:
+                # An invalidation while we were loading may mean `record` is
+                # already stale; serve it this once but do not cache it.
+                if generation != self._generation:
+                    return record
+                self._entries[user_id] = (record, now + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return record
+
+    def invalidate(self, user_id):
+        """Drop one user so the next request reloads it."""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop every cached user."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def check_due(self, interval):
+        """
+        Return True if the shared version should be read again.
+        
+        A True answer claims the check for the next `interval` seconds,
+        so concurrent requests do not all query for it at once.
+        
+        Args:
+            interval: Seconds between checks
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.checked_at is not None and now - self.checked_at < interval:
+                return False
+            self.checked_at = now
+            return True
+
+    def sync(self, shared_version):
+        """
+        Drop every cached user if the database user version moved.
+        
+        Args:
+            shared_version: Current version from the user_version row
+        """
+        with self._lock:
+            if shared_version == self.shared_version:
+                return
+            self.shared_version = shared_version
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Return cache counters.
+        
+        Returns:
+            dict with size, maxsize, ttl, hits, misses and hit_ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,16 @@
+"""
+Modules shared by the three apps.
+
+- dbconfig: database engine tuning, fork safety and read replicas
+- metrics: per-request Prometheus metrics at /metrics
+- export: streaming CSV / NDJSON downloads
+- assets: fingerprinted, precompressed static files
+- serve: the gunicorn production server behind each app's serve.py
+- benchmark: the route benchmark harness behind each app's bench_routes.py
+- testing: app fixtures and a statement counter for each app's tests/
+
+Each app's app.py (and serve.py) puts the repository root on sys.path
+before importing from here, so the apps still run from their own folders
+(`python app.py`, `flask --app app ...`) as long as this folder sits next
+to them.
+"""
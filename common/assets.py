@@ -0,0 +1,284 @@
+# assets.py
+"""
+Fingerprinted, precompressed, self-hosted static assets.
+
+`flask --app app build-assets` turns every file under static/ into a
+build in static/dist/:
+
+- CSS is minified (comments and redundant whitespace; /*! license
+  comments are kept)
+- each file is renamed after a hash of its content, e.g.
+  styles.3f09a1c2b4.css, and gets .gz and (with the optional brotli
+  package) .br siblings compressed once at build time
+- static/dist/manifest.json maps each source name to its build
+
+In templates, asset_url('styles.css') works like url_for('static', ...)
+but returns the built file under /assets/. Because a new build has a new
+name, those responses are cached for a year as immutable, and the client
+gets the .br or .gz variant its Accept-Encoding allows. Before the first
+build asset_url() falls back to the plain static file, so development
+works without building.
+
+Earlier builds are left in place, so workers still running the previous
+code keep serving their files during a graceful reload. The manifest is
+read when the app is created: build, then reload the workers.
+
+Third-party CSS is vendored into static/vendor/ instead of loaded from a
+CDN. Each vendored file is pinned to a Subresource Integrity digest that
+is checked on every build; `build-assets --fetch` downloads them again.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.request
+from collections import namedtuple
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz variants are built
+    brotli = None
+
+EXTENSION = 'assets'
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 10
+MAX_AGE = 365 * 24 * 60 * 60
+# Only text compresses well; images and fonts are served as they are.
+COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.txt'}
+# Preferred first when the client accepts both.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+Vendored = namedtuple('Vendored', 'url integrity')
+Vendored.__doc__ = """
+A third-party file kept in static/.
+
+Attributes:
+    url: Where `build-assets --fetch` downloads it from
+    integrity: Its Subresource Integrity digest, e.g. 'sha384-...'
+"""
+
+_COMMENT_OR_STRING = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/''', re.S)
+_WHITESPACE = re.compile(r'\s+')
+_PUNCTUATION = re.compile(r'(?<!:) ?([{};,>]) ?')
+# `--x: ;` keeps its space: older browsers reject an empty custom property.
+_COLON = re.compile(r': (?![;}])')
+
+
+def _squeeze(code):
+    code = _PUNCTUATION.sub(r'\1', _WHITESPACE.sub(' ', code))
+    return _COLON.sub(':', code).replace(';}', '}')
+
+
+def minify_css(text):
+    """
+    Strip comments and redundant whitespace from a stylesheet.
+
+    Strings and /*! comments are copied unchanged; whitespace before a
+    colon is kept because it is significant in selectors (`a :hover`).
+
+    Args:
+        text: CSS source
+
+    Returns:
+        str: Minified CSS
+    """
+    chunks, code, last = [], '', 0
+    for match in _COMMENT_OR_STRING.finditer(text):
+        code += text[last:match.start()]
+        last = match.end()
+        token = match.group()
+        if token.startswith('/*') and not token.startswith('/*!'):
+            # A comment separates tokens just like whitespace does.
+            code += ' '
+            continue
+        chunks.extend((_squeeze(code), token))
+        code = ''
+    chunks.append(_squeeze(code + text[last:]))
+    return ''.join(chunks).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css}
+
+
+def integrity(data):
+    """Return the sha384 Subresource Integrity digest of `data`."""
+    return 'sha384-' + base64.b64encode(hashlib.sha384(data).digest()).decode()
+
+
+def check_vendored(static_folder, vendor, fetch=False):
+    """
+    Make sure every vendored file is present and unmodified.
+
+    Args:
+        static_folder: The app's static folder
+        vendor: Mapping of static file name to Vendored
+        fetch: Download each file again before checking it
+
+    Raises:
+        click.ClickException: If a file is missing or its digest differs
+    """
+    for name, source in vendor.items():
+        path = os.path.join(static_folder, *name.split('/'))
+        if fetch:
+            with urllib.request.urlopen(source.url, timeout=30) as response:
+                data = response.read()
+            if integrity(data) != source.integrity:
+                raise click.ClickException(f'{source.url} does not match its pinned digest; not saved.')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            print(f"  fetched {name} ({len(data):,} bytes)")
+        if not os.path.isfile(path):
+            raise click.ClickException(f'{name} is missing; run build-assets --fetch.')
+        with open(path, 'rb') as f:
+            if integrity(f.read()) != source.integrity:
+                raise click.ClickException(f'{name} was modified; run build-assets --fetch to restore it.')
+
+
+def build(static_folder):
+    """
+    Minify, fingerprint and precompress every file under `static_folder`.
+
+    Args:
+        static_folder: Folder to build; the output goes to its dist/ folder
+
+    Returns:
+        list of (name, built name, source bytes, built bytes, gzip bytes,
+        brotli bytes or None), one per file
+    """
+    dist = os.path.join(static_folder, DIST)
+    manifest, report = {}, []
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder and DIST in dirs:
+            dirs.remove(DIST)
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            stem, ext = os.path.splitext(name)
+            with open(path, 'rb') as f:
+                source = f.read()
+            data = source
+            if ext in MINIFIERS:
+                data = MINIFIERS[ext](source.decode('utf-8')).encode('utf-8')
+            built = f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+            target = os.path.join(dist, *built.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            variants = {'': data}
+            if ext in COMPRESSIBLE:
+                # mtime=0 keeps the .gz bytes identical from build to build.
+                variants['.gz'] = gzip.compress(data, 9, mtime=0)
+                if brotli is not None:
+                    variants['.br'] = brotli.compress(data)
+            for suffix, content in variants.items():
+                with open(target + suffix, 'wb') as f:
+                    f.write(content)
+            manifest[name] = built
+            report.append((name, built, len(source), len(data),
+                           len(variants.get('.gz', data)), len(variants['.br']) if '.br' in variants else None))
+
+    os.makedirs(dist, exist_ok=True)
+    # Replace the manifest in one step; a starting worker may be reading it.
+    temporary = os.path.join(dist, MANIFEST + '.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temporary, os.path.join(dist, MANIFEST))
+    return report
+
+
+def load_manifest(static_folder):
+    """Return the last build's manifest, or {} if nothing was built."""
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class _State:
+    def __init__(self, manifest, vendor):
+        self.manifest = manifest
+        self.vendor = vendor
+
+
+def init_app(app, vendor=None):
+    """
+    Register asset_url(), the /assets/ route and the build-assets command.
+
+    Args:
+        app: Flask application
+        vendor: Mapping of static file name to Vendored for the
+            third-party files the app ships
+    """
+    app.extensions[EXTENSION] = _State(load_manifest(app.static_folder), dict(vendor or {}))
+    app.add_template_global(asset_url)
+    app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+    app.cli.add_command(build_assets_command)
+
+
+def asset_url(filename, **values):
+    """
+    url_for() for a static file that returns its fingerprinted build.
+
+    Args:
+        filename: Name under static/, e.g. 'styles.css'
+        **values: Extra url_for() arguments (e.g. _external=True)
+
+    Returns:
+        URL of the built file, or of the static file if it was not built
+    """
+    built = current_app.extensions[EXTENSION].manifest.get(filename)
+    if built is None:
+        return url_for('static', filename=filename, **values)
+    return url_for('asset', filename=built, **values)
+
+
+def serve_asset(filename):
+    """
+    Serve a built file, precompressed when the client accepts it.
+
+    Args:
+        filename: Built name from the manifest
+
+    Returns:
+        Immutable, year-long cacheable file response
+    """
+    dist = os.path.join(current_app.static_folder, DIST)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, mimetype=mimetype, max_age=MAX_AGE)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, mimetype=mimetype, max_age=MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@click.command('build-assets')
+@click.option('--fetch', is_flag=True, help='Download the vendored third-party files again.')
+@with_appcontext
+def build_assets_command(fetch):
+    """Minify, fingerprint and precompress the files under static/."""
+    static_folder = current_app.static_folder
+    check_vendored(static_folder, current_app.extensions[EXTENSION].vendor, fetch=fetch)
+    report = build(static_folder)
+    for name, built, source, data, gzipped, brotlied in report:
+        sizes = f"{source:,} -> {data:,} bytes, gzip {gzipped:,}"
+        if brotlied is not None:
+            sizes += f", brotli {brotlied:,}"
+        print(f"  {name} -> {DIST}/{built} ({sizes})")
+    if brotli is None:
+        print("  (install brotli to also build .br variants)")
+    print(f"✅ {len(report)} assets built; reload the app to serve them.")
@@ -0,0 +1,215 @@
+# benchmark.py
+"""
+Route benchmark harness.
+
+Each app's bench_routes.py says how to fill the database and which
+routes to drive.
+Routes are driven through the Flask test client (no network, no server)
+at each requested database size, and for every (size, route) the run
+records:
+
+- throughput (requests/s) and p50 / p99 latency over the timed requests
+- SQL statements per request (engine cursor events)
+- peak Python memory allocated by one request (tracemalloc, measured in
+  a separate untimed pass because tracing slows everything down)
+- requests that got an unexpected status code
+
+Results are written as JSON. Given a baseline (an earlier run's JSON),
+any route whose p50 latency or peak memory grew, or whose throughput
+fell, by more than the threshold, or that now runs more SQL statements,
+is reported as a regression and the run exits with status 1.
+
+Timings depend on the machine: compare runs from the same box.
+"""
+import argparse
+import contextlib
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+from sqlalchemy import event
+
+Route = namedtuple('Route', 'name call expect')
+Route.__doc__ = """
+A benchmarked route.
+
+Attributes:
+    name: Label used in the results (usually the endpoint name)
+    call: Callable(i) that sends the i-th request and returns the response
+    expect: Status code every response should have
+"""
+
+DEFAULT_SIZES = '1000'
+MEMORY_SAMPLES = 5
+
+
+class QueryCounter:
+    """Counts SQL statements run on a set of engines."""
+
+    def __init__(self, engines):
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def percentile(ordered, fraction):
+    """Return the value at `fraction` (0-1) of an ascending list."""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(route, requests, warmup, queries):
+    """
+    Time one route.
+
+    Args:
+        route: Route to drive
+        requests: Timed requests to send
+        warmup: Untimed requests sent first (fills caches, compiles SQL)
+        queries: QueryCounter on the app's engines
+
+    Returns:
+        dict of the route's results
+    """
+    errors = 0
+    for i in range(warmup):
+        errors += route.call(i).status_code != route.expect
+
+    latencies = []
+    first_query = queries.count
+    started = time.perf_counter()
+    for i in range(warmup, warmup + requests):
+        sent = time.perf_counter()
+        response = route.call(i)
+        latencies.append(time.perf_counter() - sent)
+        errors += response.status_code != route.expect
+    elapsed = time.perf_counter() - started
+    statements = queries.count - first_query
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for i in range(warmup + requests, warmup + requests + MEMORY_SAMPLES):
+            tracemalloc.reset_peak()
+            errors += route.call(i).status_code != route.expect
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'route': route.name,
+        'requests': requests,
+        'errors': errors,
+        'throughput': round(requests / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries': round(statements / requests, 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    List the routes that regressed against a baseline run.
+
+    Args:
+        results: This run's results list
+        baseline: An earlier run's results list
+        threshold: Allowed relative change, e.g. 0.25 for 25%
+
+    Returns:
+        list of messages, empty if nothing regressed
+    """
+    before = {(row['size'], row['route']): row for row in baseline}
+    messages = []
+    for row in results:
+        old = before.get((row['size'], row['route']))
+        if old is None:
+            continue
+        label = f"{row['route']} @ {row['size']:,} rows"
+        if row['p50_ms'] > old['p50_ms'] * (1 + threshold):
+            messages.append(f"{label}: p50 {old['p50_ms']}ms -> {row['p50_ms']}ms")
+        if row['throughput'] < old['throughput'] / (1 + threshold):
+            messages.append(f"{label}: throughput {old['throughput']}/s -> {row['throughput']}/s")
+        if row['peak_kb'] > old['peak_kb'] * (1 + threshold):
+            messages.append(f"{label}: peak memory {old['peak_kb']}KB -> {row['peak_kb']}KB")
+        # Statement counts are deterministic, so any increase is real.
+        if row['queries'] > old['queries'] + 0.01:
+            messages.append(f"{label}: SQL statements {old['queries']} -> {row['queries']} per request")
+    return messages
+
+
+def main(name, engines, populate, routes, argv=None):
+    """
+    Run the benchmark command line for one app.
+
+    Args:
+        name: App name recorded in the results
+        engines: Engines whose statements are counted
+        populate: Callable(size) that grows the database to `size` rows
+        routes: Callable() returning the Routes to drive at the current size
+        argv: Arguments (default: sys.argv)
+
+    Returns:
+        int: Process exit status
+    """
+    parser = argparse.ArgumentParser(description=f"Benchmark the {name} routes.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='comma-separated database sizes, e.g. 1000,100000,1000000')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per route')
+    parser.add_argument('--routes', help='comma-separated route names to run (default: all)')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative regression (default 0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    queries = QueryCounter(engines)
+    wanted = set(args.routes.split(',')) if args.routes else None
+    results = []
+    for size in sorted(int(size) for size in args.sizes.split(',')):
+        # Generators report progress on stdout; keep it for the JSON.
+        with contextlib.redirect_stdout(sys.stderr):
+            populate(size)
+        for route in routes():
+            if wanted and route.name not in wanted:
+                continue
+            row = {'size': size, **measure(route, args.requests, args.warmup, queries)}
+            print(f"{size:>10,}  {row['route']:<20} {row['throughput']:>9.1f}/s  p50 {row['p50_ms']:>8.2f}ms"
+                  f"  p99 {row['p99_ms']:>8.2f}ms  {row['queries']:>6} SQL  {row['peak_kb']:>9.1f}KB"
+                  + (f"  {row['errors']} errors" if row['errors'] else ''), file=sys.stderr)
+            results.append(row)
+
+    report = json.dumps({
+        'app': name,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'requests': args.requests,
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+    status = 0
+    if any(row['errors'] for row in results):
+        print('Some requests got an unexpected status code.', file=sys.stderr)
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], args.threshold)
+        for message in regressions:
+            print(f'REGRESSION {message}', file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
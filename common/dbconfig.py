@@ -0,0 +1,279 @@
+# dbconfig.py
+"""
+Database engine configuration shared by the three apps.
+
+configure(app, default_uri) picks the database URI (the app's configured
+one, else DATABASE_URL, else the default) and fills
+SQLALCHEMY_ENGINE_OPTIONS before Flask-SQLAlchemy creates the engine:
+
+- SQLite: every new connection switches the database to WAL (readers no
+  longer block behind a writer), synchronous=NORMAL (safe with WAL, far
+  fewer fsyncs), a busy timeout so concurrent writers wait instead of
+  failing with "database is locked", a larger page cache and in-memory
+  temp tables. SQLITE_FOREIGN_KEYS=1 also enforces foreign keys.
+- PostgreSQL and others: pool size, overflow, timeout and recycle come
+  from DB_POOL_* variables, connections are pre-pinged before use, and
+  DB_STATEMENT_TIMEOUT (ms) bounds runaway queries.
+
+Connections are never shared across fork(): a single after-fork hook,
+registered when this module is imported, makes each child process drop
+(without closing) the pooled connections of every engine init_app() has
+seen, so a pre-forking server can create the app, and even query, in the
+parent before starting its workers. Engines are tracked weakly, so
+creating many apps (e.g. in tests) does not keep old engines alive.
+
+Read replicas are opt-in: with DATABASE_REPLICA_URL set, sessions created
+with session_options() send plain SELECTs to the replica and everything
+else (writes, flushes, SELECT ... FOR UPDATE, and any read after the
+session has written in the current transaction) to the primary. Replicas
+lag, so code that must read its own earlier writes (e.g. straight after a
+redirect) can wrap the reads in use_primary().
+
+increment() adds to a counter row, creating it if needed, with a single
+INSERT ... ON CONFLICT DO UPDATE (ON DUPLICATE KEY UPDATE on MySQL), so
+two workers creating the same counter at once cannot both insert it.
+"""
+import contextlib
+import os
+import weakref
+
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import Select
+
+EXTENSION = 'dbconfig'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': ('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': ('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': ('SQLITE_BUSY_TIMEOUT', '5000'),
+    'cache_size': ('SQLITE_CACHE_SIZE', '-16384'),
+    'temp_store': ('SQLITE_TEMP_STORE', 'MEMORY'),
+    'foreign_keys': ('SQLITE_FOREIGN_KEYS', '0'),
+}
+
+
+def database_uri(default, env=os.environ):
+    """Return DATABASE_URL if set, else the app's default URI."""
+    return env.get('DATABASE_URL') or default
+
+
+def sqlite_pragmas(env=os.environ):
+    """Return the PRAGMA name -> value pairs run on each new SQLite connection."""
+    return {name: env.get(variable, default) for name, (variable, default) in SQLITE_PRAGMAS.items()}
+
+
+def engine_options(uri, env=os.environ):
+    """
+    Build create_engine() keyword arguments for a database URI.
+
+    Args:
+        uri: Database URI
+        env: Mapping to read DB_POOL_* and DB_STATEMENT_TIMEOUT from
+
+    Returns:
+        dict suitable for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        options = {}
+        if url.database and url.database != ':memory:':
+            # File databases use a QueuePool; size it like the others.
+            options['pool_size'] = int(env.get('DB_POOL_SIZE', 5))
+            options['max_overflow'] = int(env.get('DB_MAX_OVERFLOW', 10))
+        return options
+
+    options = {
+        'pool_size': int(env.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(env.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(env.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(env.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': env.get('DB_POOL_PRE_PING', '1') != '0',
+    }
+    statement_timeout = env.get('DB_STATEMENT_TIMEOUT')
+    if statement_timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    return options
+
+
+def _set_sqlite_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def tune_engine(engine, env=os.environ):
+    """Apply the per-connection SQLite pragmas to an engine (no-op otherwise)."""
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _set_sqlite_pragmas(sqlite_pragmas(env)))
+    return engine
+
+
+def configure(app, default_uri=None, env=os.environ):
+    """
+    Set the app's database URI, engine options and replica URI.
+
+    Call before Flask-SQLAlchemy is initialised on the app. A URI already
+    in the app's config is kept.
+
+    Args:
+        app: Flask application
+        default_uri: URI used when DATABASE_URL is not set
+        env: Mapping to read settings from
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI') or database_uri(default_uri, env)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    options = engine_options(uri, env)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.config.setdefault('SQLALCHEMY_REPLICA_URI', env.get('DATABASE_REPLICA_URL'))
+
+
+class _State:
+    def __init__(self, replica):
+        self.replica = replica
+
+
+def init_app(app, db, env=os.environ):
+    """
+    Tune the app's engines and create the read replica engine, if configured.
+
+    Call after Flask-SQLAlchemy is initialised on the app.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension bound to the app
+        env: Mapping to read settings from
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        tune_engine(engine, env)
+    replica = None
+    replica_uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if replica_uri:
+        replica = tune_engine(create_engine(replica_uri, **engine_options(replica_uri, env)), env)
+        engines.append(replica)
+    app.extensions[EXTENSION] = _State(replica)
+    _fork_engines.update(engines)
+
+
+# Engines whose pools a forked child must drop; see dispose_after_fork().
+_fork_engines = weakref.WeakSet()
+
+
+def dispose_after_fork():
+    """Forget pooled connections inherited from the parent process."""
+    for engine in list(_fork_engines):
+        # close=False leaves the parent's connections open for the parent.
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dispose_after_fork)
+
+
+def replica_engine():
+    """Return the current app's replica engine, or None."""
+    if not has_app_context():
+        return None
+    state = current_app.extensions.get(EXTENSION)
+    return state.replica if state is not None else None
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends plain reads to the read replica.
+
+    Reads stay on the primary once the session has written in the current
+    transaction, so a transaction always sees its own writes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wrote = False
+        event.listen(self, 'after_transaction_end', self._reset)
+
+    def _reset(self, session, transaction):
+        if transaction.parent is None:
+            self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = replica_engine() if bind is None else None
+        if replica is not None:
+            if self._flushing or (clause is not None and not isinstance(clause, Select)):
+                self._wrote = True
+            elif (
+                isinstance(clause, Select) and clause._for_update_arg is None
+                and not self._wrote and not self.info.get('primary')
+            ):
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def session_options():
+    """Session options for SQLAlchemy(..., session_options=...)."""
+    return {'class_': RoutingSession}
+
+
+@contextlib.contextmanager
+def use_primary(session):
+    """Send the session's reads to the primary inside the block."""
+    previous = session.info.get('primary')
+    session.info['primary'] = True
+    try:
+        yield session
+    finally:
+        session.info['primary'] = previous
+
+
+def _upsert_insert(dialect):
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        return None
+    return insert
+
+
+def increment(executor, table, key, column, delta):
+    """
+    Add `delta` to one counter row inside the caller's transaction.
+
+    A missing row is created with `delta` when it is positive; a negative
+    delta only changes an existing row.
+
+    Args:
+        executor: Session or Core connection of the write
+        table: Table with a primary key or unique constraint over `key`
+        key: Mapping of column name -> value identifying the row
+        column: Name of the counter column
+        delta: Amount to add
+    """
+    condition = [table.c[name] == value for name, value in key.items()]
+    added = {column: table.c[column] + delta}
+    dialect = executor.dialect if hasattr(executor, 'dialect') else executor.get_bind().dialect
+    insert = _upsert_insert(dialect.name) if delta > 0 else None
+    if insert is None:
+        result = executor.execute(table.update().where(*condition).values(added))
+        if result.rowcount == 0 and delta > 0:
+            # No upsert on this database, so a concurrent insert can still fail.
+            executor.execute(table.insert().values(dict(key, **{column: delta})))
+        return
+
+    stmt = insert(table).values(dict(key, **{column: delta}))
+    if dialect.name in ('mysql', 'mariadb'):
+        stmt = stmt.on_duplicate_key_update(added)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=list(key), set_=added)
+    executor.execute(stmt)
@@ -0,0 +1,289 @@
+# metrics.py
+"""
+Per-request performance metrics in Prometheus text format.
+
+init_app(app, db) times every request and records, per endpoint:
+
+- request latency
+- SQL statements run and the time spent in them (engine events on the
+  primary and, if configured, the read replica engine)
+- Jinja render time (Flask's template signals)
+- response body size (streamed responses have no size and are skipped)
+
+and serves them at GET /metrics. Requests slower than
+METRICS_SLOW_REQUEST seconds are counted and logged with their slowest
+METRICS_SLOW_QUERIES statements.
+
+Recording costs a few perf_counter() calls per request and per
+statement and a handful of short locked updates per request; statement
+text is only referenced, never copied. Statements run
+outside a request (CLI commands, background threads) are not recorded.
+
+Every worker process keeps its own numbers; scrape each worker, or sum
+the series across them.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from flask import Response, abort, current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+from . import dbconfig
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{_labels(self.labelnames, labels)} {value}'
+
+
+class Histogram:
+    """Bucketed observations per label set, with their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # One count per bucket plus +Inf, then the sum.
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, list(series)) for labels, series in self._values.items())
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", bound)])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Registry:
+    """The app's metrics, rendered together at /metrics."""
+
+    def __init__(self):
+        self.requests = Counter(
+            'http_requests_total', 'Requests handled.', ('endpoint', 'method', 'status')
+        )
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'Time to build the response.',
+            LATENCY_BUCKETS, ('endpoint',)
+        )
+        self.queries = Histogram(
+            'http_request_sql_queries', 'SQL statements run per request.',
+            QUERY_BUCKETS, ('endpoint',)
+        )
+        self.sql_time = Histogram(
+            'http_request_sql_seconds', 'Time spent in SQL statements per request.',
+            LATENCY_BUCKETS, ('endpoint',)
+        )
+        self.render_time = Histogram(
+            'http_request_template_seconds', 'Time spent rendering templates per request.',
+            LATENCY_BUCKETS, ('endpoint',)
+        )
+        self.size = Histogram(
+            'http_response_size_bytes', 'Response body size.', SIZE_BUCKETS, ('endpoint',)
+        )
+        self.slow = Counter(
+            'http_slow_requests_total', 'Requests slower than the slow-request threshold.',
+            ('endpoint',)
+        )
+
+    def metrics(self):
+        return [self.requests, self.latency, self.queries, self.sql_time,
+                self.render_time, self.size, self.slow]
+
+    def render(self):
+        """Return every metric in Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class _RequestStats:
+    __slots__ = ('start', 'queries', 'sql_time', 'render_time', 'render_start', 'slowest', 'keep')
+
+    def __init__(self, keep):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.render_start = None
+        # Min-heap of (seconds, sequence, statement), at most `keep` long.
+        self.slowest = []
+        self.keep = keep
+
+
+def _current():
+    return g.get('_metrics') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current() is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None:
+        return
+    stats = _current()
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats.queries += 1
+    stats.sql_time += elapsed
+    if stats.keep:
+        item = (elapsed, stats.queries, statement)
+        if len(stats.slowest) < stats.keep:
+            heapq.heappush(stats.slowest, item)
+        elif elapsed > stats.slowest[0][0]:
+            heapq.heapreplace(stats.slowest, item)
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None:
+        stats.render_start = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None and stats.render_start is not None:
+        stats.render_time += time.perf_counter() - stats.render_start
+        stats.render_start = None
+
+
+def _listen(engine):
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_app(app, db):
+    """
+    Record request metrics for the app and serve them at /metrics.
+
+    Does nothing when METRICS_ENABLED is false. If METRICS_TOKEN is set,
+    /metrics requires an "Authorization: Bearer <token>" header.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension bound to the app
+    """
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_SLOW_REQUEST', 0.5)
+    app.config.setdefault('METRICS_SLOW_QUERIES', 5)
+    app.config.setdefault('METRICS_TOKEN', None)
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    registry = app.extensions['metrics'] = Registry()
+    with app.app_context():
+        for engine in db.engines.values():
+            _listen(engine)
+        replica = dbconfig.replica_engine()
+        if replica is not None:
+            _listen(replica)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    slow_request = app.config['METRICS_SLOW_REQUEST']
+    slow_queries = app.config['METRICS_SLOW_QUERIES']
+
+    @app.before_request
+    def start_request_metrics():
+        g._metrics = _RequestStats(slow_queries)
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = g.pop('_metrics', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.start
+        # Unmatched URLs share one label so 404 scans cannot add series.
+        endpoint = (request.endpoint or 'unmatched',)
+        registry.requests.inc(endpoint + (request.method, str(response.status_code)))
+        registry.latency.observe(endpoint, elapsed)
+        registry.queries.observe(endpoint, stats.queries)
+        registry.sql_time.observe(endpoint, stats.sql_time)
+        registry.render_time.observe(endpoint, stats.render_time)
+        if not response.is_streamed and response.content_length is not None:
+            registry.size.observe(endpoint, response.content_length)
+        if elapsed >= slow_request:
+            registry.slow.inc(endpoint)
+            slowest = sorted(stats.slowest, reverse=True)
+            logger.warning(
+                'Slow request: %s %s -> %s took %.3fs (%d SQL statements, %.3fs SQL, %.3fs templates)%s',
+                request.method, request.path, response.status_code, elapsed,
+                stats.queries, stats.sql_time, stats.render_time,
+                ''.join(f'\n  {seconds * 1000:.1f}ms  {" ".join(statement.split())[:500]}'
+                        for seconds, _, statement in slowest)
+            )
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+def metrics_view():
+    """Serve the app's metrics in Prometheus text format."""
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(current_app.extensions['metrics'].render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,131 @@
+# serve.py
+"""
+Production server: N worker processes x M threads behind gunicorn.
+
+Each app's serve.py runs main() from its own folder. The server builds
+the app with app.create_app() and serves it with gunicorn's threaded
+workers, so one box can use every core:
+
+- --workers processes (default: WEB_CONCURRENCY, else the CPU count),
+  each running --threads request threads (default: WEB_THREADS, else 4)
+- every worker runs app.warmup() before it accepts requests, so the
+  first visitors do not pay for opening connections, compiling SQL and
+  filling the in-process caches
+- the database engines drop inherited connections after fork (see
+  dbconfig.py), so --preload is safe. It builds the app once in the
+  master and shares its memory with the workers.
+
+Graceful reload: `kill -HUP <master pid>` starts fresh workers with
+the current code and settings, then lets the old ones finish their
+in-flight requests (up to --graceful-timeout seconds) before they exit.
+With --preload the code was loaded by the master, so HUP only restarts
+the workers; deploy new code by restarting the master instead.
+--max-requests recycles each worker after that many requests.
+
+Usage:
+    python serve.py --bind 0.0.0.0:8000 --workers 4 --threads 8
+"""
+import argparse
+import logging
+import os
+import time
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.workers.gthread import ThreadWorker
+
+logger = logging.getLogger('serve')
+
+
+def warm(app):
+    """Run the app's warmup(), logging instead of failing the worker."""
+    import app as app_module
+
+    started = time.perf_counter()
+    try:
+        app_module.warmup(app)
+    except Exception:
+        logger.exception('Warmup failed in worker %s; serving anyway', os.getpid())
+        return
+    logger.info('Worker %s warmed up in %.0fms', os.getpid(), (time.perf_counter() - started) * 1000)
+
+
+class DrainingThreadWorker(ThreadWorker):
+    """
+    gthread worker that finishes the connections it has already accepted
+    before exiting on a graceful stop (SIGTERM, sent on reload and
+    shutdown). The stock worker closes its poller at once and resets them.
+    """
+
+    draining = False
+
+    def handle_exit(self, sig, frame):
+        if not self.draining:
+            self.draining = True
+            # Leave new connections in the listen queue for the other workers.
+            for sock in self.sockets:
+                self.poller.unregister(sock)
+
+    def murder_keepalived(self):
+        # Called once per pass of the worker loop.
+        super().murder_keepalived()
+        if self.draining and self.nr_conns == 0:
+            self.alive = False
+
+
+class Server(BaseApplication):
+    """gunicorn application serving app.create_app()."""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import create_app
+
+        return create_app()
+
+
+def post_worker_init(worker):
+    """gunicorn hook: warm each worker before it accepts connections."""
+    warm(worker.wsgi)
+
+
+def main():
+    """Parse command line arguments and run the server."""
+    parser = argparse.ArgumentParser(description="Serve the app with gunicorn worker processes and threads.")
+    parser.add_argument('--bind', default=os.environ.get('BIND', '127.0.0.1:8000'))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 4)))
+    parser.add_argument('--timeout', type=int, default=60, help='seconds before a stuck worker is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='seconds old workers get to finish their requests on reload or shutdown')
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help='recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--preload', action='store_true', help='build the app in the master before forking')
+    parser.add_argument('--access-log', default=None, help="access log file ('-' for stderr)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(process)d] %(levelname)s %(message)s')
+    Server({
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': DrainingThreadWorker,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        # Stagger recycling so workers do not all restart at once.
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': args.preload,
+        'accesslog': args.access_log,
+        'post_worker_init': post_worker_init,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# testing.py
+"""
+Helpers for the apps' tests/conftest.py files.
+
+Every app's tests build the app with create_app() on a throwaway SQLite
+file, create the tables, and dispose of the engines afterwards; the
+statement counter backs the tests that pin how many queries a request runs.
+"""
+import contextlib
+import threading
+
+from sqlalchemy import event
+
+
+def build_app(create_app, db, path, **config):
+    """
+    Build an app on a fresh SQLite database and create its tables.
+
+    Args:
+        create_app: The app module's factory
+        db: The app's Flask-SQLAlchemy instance
+        path: Directory for the database file (pytest's tmp_path)
+        **config: Settings that override the test defaults
+
+    Returns:
+        Flask application
+    """
+    app = create_app(dict({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path / 'test.db'}",
+    }, **config))
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def dispose_app(app, db):
+    """Drop the app's session and close its pooled connections."""
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@contextlib.contextmanager
+def statements(app, db):
+    """Collect the SQL statements this thread runs (not background threads')."""
+    collected = []
+    thread = threading.get_ident()
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            collected.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', collect)
+    try:
+        yield collected
+    finally:
+        event.remove(engine, 'before_cursor_execute', collect)